@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+"""Shared on-disk cache for the Sparkdock Python tools.
+
+One SQLite file holds JSON values grouped by namespace (for example
+"sparkdock-ai.answers" or "slack-notify.claude"). Entries can expire after
+a TTL, and every write that takes the file past its size budget evicts the
+least recently used entries across all namespaces. The database runs in
+WAL mode with a busy timeout and every write is a single short
+transaction, so the menu bar app, prewarm runs and digest jobs can share
+the file from several processes at once. Cache failures are logged and
+behave as misses: a broken cache never fails the caller.
+
+Usage:
+  cachestore.py [--db FILE] stats
+  cachestore.py [--db FILE] list [NAMESPACE] [--limit N]
+  cachestore.py [--db FILE] show NAMESPACE KEY
+  cachestore.py [--db FILE] purge [NAMESPACE] [--expired]
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, List, Optional
+
+LOGGER = logging.getLogger("sparkdock_cache")
+
+CACHE_PATH = Path(
+    os.getenv("SPARKDOCK_CACHE_DB", "~/.config/spark/sparkdock/cache.sqlite3")
+).expanduser()
+MAX_BYTES = int(os.getenv("SPARKDOCK_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+EVICT_TARGET = 0.9
+BUSY_TIMEOUT_SECONDS = 5.0
+# Reads refresh the LRU timestamp at most this often, so a hot entry does
+# not turn every lookup into a write.
+TOUCH_INTERVAL_SECONDS = 60
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    expires_at REAL,
+    accessed_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at);
+CREATE INDEX IF NOT EXISTS entries_expires ON entries (expires_at);
+"""
+MISSING = object()
+
+
+def content_key(*parts: Any) -> str:
+    """SHA-256 of the canonical JSON form of `parts`.
+
+    Use it for keys derived from content (a prompt, a request body, a file
+    and its size) so equal inputs map to the same entry in every tool.
+    """
+    encoded = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class CacheStore:
+    """Namespaced key-value store with TTLs and size-bounded LRU eviction."""
+
+    def __init__(self, path: Path = CACHE_PATH, max_bytes: int = MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(
+            str(path),
+            timeout=BUSY_TIMEOUT_SECONDS,
+            isolation_level=None,
+            check_same_thread=False,
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def get(self, namespace: str, key: str, default: Any = None) -> Any:
+        """Return the stored value, or `default` when missing or expired."""
+        now = time.time()
+        try:
+            with self._lock:
+                row = self._db.execute(
+                    "SELECT value, expires_at, accessed_at FROM entries "
+                    "WHERE namespace = ? AND key = ?",
+                    (namespace, key),
+                ).fetchone()
+                if row is None:
+                    return default
+                value, expires_at, accessed_at = row
+                if expires_at is not None and expires_at <= now:
+                    self._db.execute(
+                        "DELETE FROM entries WHERE namespace = ? AND key = ? "
+                        "AND expires_at <= ?",
+                        (namespace, key, now),
+                    )
+                    return default
+                if now - accessed_at >= TOUCH_INTERVAL_SECONDS:
+                    self._db.execute(
+                        "UPDATE entries SET accessed_at = ? "
+                        "WHERE namespace = ? AND key = ?",
+                        (now, namespace, key),
+                    )
+        except sqlite3.Error as err:
+            LOGGER.warning("Cache read failed for %s/%s: %s", namespace, key, err)
+            return default
+        return json.loads(value)
+
+    def set(
+        self, namespace: str, key: str, value: Any, ttl: Optional[float] = None
+    ) -> None:
+        """Store a JSON-serializable value, evicting old entries if needed."""
+        data = json.dumps(value, separators=(",", ":"))
+        size = len(data.encode("utf-8"))
+        if size > self.max_bytes:
+            LOGGER.debug("Not caching %s/%s: %d bytes", namespace, key, size)
+            return
+        now = time.time()
+        expires_at = now + ttl if ttl is not None else None
+        try:
+            with self._lock:
+                self._db.execute("BEGIN IMMEDIATE")
+                try:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO entries (namespace, key, value, "
+                        "size, created_at, expires_at, accessed_at) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (namespace, key, data, size, now, expires_at, now),
+                    )
+                    self._evict(now)
+                except BaseException:
+                    self._db.execute("ROLLBACK")
+                    raise
+                self._db.execute("COMMIT")
+        except sqlite3.Error as err:
+            LOGGER.warning("Cache write failed for %s/%s: %s", namespace, key, err)
+
+    def _evict(self, now: float) -> None:
+        self._db.execute("DELETE FROM entries WHERE expires_at <= ?", (now,))
+        (total,) = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM entries"
+        ).fetchone()
+        if total <= self.max_bytes:
+            return
+        target = self.max_bytes * EVICT_TARGET
+        stale = []
+        for rowid, size in self._db.execute(
+            "SELECT rowid, size FROM entries ORDER BY accessed_at"
+        ):
+            if total <= target:
+                break
+            stale.append((rowid,))
+            total -= size
+        self._db.executemany("DELETE FROM entries WHERE rowid = ?", stale)
+        LOGGER.debug("Cache evicted %d entries", len(stale))
+
+    def memoize(
+        self,
+        namespace: str,
+        key: str,
+        compute: Callable[[], Any],
+        ttl: Optional[float] = None,
+    ) -> Any:
+        """Return the cached value, or compute, store and return it."""
+        value = self.get(namespace, key, MISSING)
+        if value is MISSING:
+            value = compute()
+            self.set(namespace, key, value, ttl)
+        return value
+
+    def delete(self, namespace: str, key: str) -> None:
+        try:
+            with self._lock:
+                self._db.execute(
+                    "DELETE FROM entries WHERE namespace = ? AND key = ?",
+                    (namespace, key),
+                )
+        except sqlite3.Error as err:
+            LOGGER.warning("Cache delete failed for %s/%s: %s", namespace, key, err)
+
+    def purge(
+        self, namespace: Optional[str] = None, expired_only: bool = False
+    ) -> Optional[int]:
+        """Delete entries (optionally one namespace, only expired).
+
+        Returns how many were deleted, or None when the database could not be
+        written (for example while another process holds it locked).
+        """
+        clauses, params = [], []
+        if namespace is not None:
+            clauses.append("namespace = ?")
+            params.append(namespace)
+        if expired_only:
+            clauses.append("expires_at <= ?")
+            params.append(time.time())
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        try:
+            with self._lock:
+                cursor = self._db.execute(f"DELETE FROM entries{where}", params)
+        except sqlite3.Error as err:
+            LOGGER.warning("Cache purge failed for %s: %s", namespace or "*", err)
+            return None
+        if namespace is None and not expired_only:
+            try:
+                with self._lock:
+                    self._db.execute("VACUUM")
+            except sqlite3.Error as err:
+                LOGGER.warning("Cache vacuum failed: %s", err)
+        return cursor.rowcount
+
+    def stats(self) -> List[dict]:
+        """Entry count, bytes, expired count and last use per namespace."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT namespace, COUNT(*), SUM(size), "
+                "SUM(expires_at IS NOT NULL AND expires_at <= ?), MAX(accessed_at) "
+                "FROM entries GROUP BY namespace ORDER BY namespace",
+                (time.time(),),
+            ).fetchall()
+        return [
+            {
+                "namespace": namespace,
+                "entries": count,
+                "bytes": size,
+                "expired": expired,
+                "accessed_at": accessed_at,
+            }
+            for namespace, count, size, expired, accessed_at in rows
+        ]
+
+    def entries(self, namespace: Optional[str] = None, limit: int = 50) -> List[dict]:
+        """Metadata of the most recently used entries, newest first."""
+        where = " WHERE namespace = ?" if namespace is not None else ""
+        params = [namespace] if namespace is not None else []
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT namespace, key, size, created_at, expires_at, accessed_at "
+                f"FROM entries{where} ORDER BY accessed_at DESC LIMIT ?",
+                params + [limit],
+            ).fetchall()
+        columns = (
+            "namespace",
+            "key",
+            "size",
+            "created_at",
+            "expires_at",
+            "accessed_at",
+        )
+        return [dict(zip(columns, row)) for row in rows]
+
+
+def open_store(path: Optional[Path] = None) -> Optional[CacheStore]:
+    """Open the shared cache, or return None (with a warning) when unavailable."""
+    path = path or CACHE_PATH
+    try:
+        return CacheStore(path)
+    except (OSError, sqlite3.Error) as err:
+        LOGGER.warning("Unable to open cache at %s: %s", path, err)
+        return None
+
+
+def format_time(timestamp: Optional[float]) -> str:
+    if timestamp is None:
+        return "-"
+    return datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Inspect and purge the shared Sparkdock cache"
+    )
+    parser.add_argument(
+        "--db",
+        type=Path,
+        default=CACHE_PATH,
+        help=f"Cache database (default: {CACHE_PATH}, env SPARKDOCK_CACHE_DB)",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("stats", help="Entries and size per namespace")
+    list_parser = subparsers.add_parser("list", help="Most recently used entries")
+    list_parser.add_argument("namespace", nargs="?")
+    list_parser.add_argument("--limit", type=int, default=50)
+    show_parser = subparsers.add_parser("show", help="Print one stored value")
+    show_parser.add_argument("namespace")
+    show_parser.add_argument("key")
+    purge_parser = subparsers.add_parser("purge", help="Delete entries")
+    purge_parser.add_argument("namespace", nargs="?")
+    purge_parser.add_argument(
+        "--expired", action="store_true", help="Only delete expired entries"
+    )
+    args = parser.parse_args()
+
+    if args.command != "purge" and not args.db.exists():
+        print(f"No cache at {args.db}")
+        return 0
+    store = open_store(args.db)
+    if store is None:
+        return 1
+    if args.command == "stats":
+        rows = store.stats()
+        print(f"Cache: {args.db} (limit {store.max_bytes // 1024} KiB)")
+        print(f"{'NAMESPACE':<28} {'ENTRIES':>8} {'KIB':>9} {'EXPIRED':>8}  LAST USED")
+        for row in rows:
+            print(
+                f"{row['namespace']:<28} {row['entries']:>8} "
+                f"{row['bytes'] / 1024:>9.1f} {row['expired']:>8}  "
+                f"{format_time(row['accessed_at'])}"
+            )
+        total = sum(row["bytes"] for row in rows)
+        print(
+            f"Total: {sum(row['entries'] for row in rows)} entries, {total / 1024:.1f} KiB"
+        )
+    elif args.command == "list":
+        for row in store.entries(args.namespace, args.limit):
+            print(
+                f"{row['namespace']}  {row['key']}  {row['size']} B  "
+                f"used {format_time(row['accessed_at'])}  "
+                f"expires {format_time(row['expires_at'])}"
+            )
+    elif args.command == "show":
+        value = store.get(args.namespace, args.key, MISSING)
+        if value is MISSING:
+            print(f"No entry {args.namespace}/{args.key}", file=sys.stderr)
+            return 1
+        print(json.dumps(value, indent=2, ensure_ascii=False))
+    else:
+        removed = store.purge(args.namespace, args.expired)
+        if removed is None:
+            print(
+                f"Unable to purge {args.db}; retry once it is unlocked", file=sys.stderr
+            )
+            store.close()
+            return 1
+        print(f"Removed {removed} entries")
+    store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,33 +4,61 @@ Daily Slack digest script for Sparkdock changelog updates.
 
 Usage:
   notify-slack-on-merge.py daily [--date YYYY-MM-DD] [--timezone Europe/Rome] [--preview]
+                                 [--state FILE] [--index FILE] [--force]
+  notify-slack-on-merge.py serve --pending FILE --index FILE [--listen 127.0.0.1:8787]
+                                 [--ref REF] [--fetch] [--settle SECONDS] [--preview]
+                                 [--insecure]
   notify-slack-on-merge.py --dry-run
   notify-slack-on-merge.py --test
 
 Environment variables:
   ANTHROPIC_API_KEY - API key for Claude AI (required for daily runs)
   SLACK_WEBHOOK_URL - Slack webhook URL (required unless --preview is used)
+  DIGEST_STATE_FILE - Default for --state (watermark of processed commits)
+  DIGEST_INDEX_FILE - Default for --index (CHANGELOG.md entry timeline)
+  CLAUDE_API_URL    - Messages endpoint override (used by replay-harness.py)
+  DIGEST_PENDING_FILE - Default for serve --pending (digest awaiting the next flush)
+  DIGEST_WEBHOOK_SECRET - Secret for X-Hub-Signature-256 checks on serve requests
+                          (required by serve unless --insecure is used)
+  DIGEST_CACHE_FILE - Shared cache database (src/cache-store) for Claude responses,
+                      parsed CHANGELOG.md snapshots and commit lookups
 """
 
 from __future__ import annotations
 
 import argparse
 import difflib
+import functools
+import hashlib
+import hmac
+import io
 import json
+import math
 import os
 import subprocess
 import sys
+import threading
 import urllib.error
 import urllib.request
-from dataclasses import dataclass
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
 from datetime import date, datetime, time, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import islice
 from pathlib import Path
-from typing import Iterable
+from typing import IO, Iterable, Iterator
 from zoneinfo import ZoneInfo
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "cache-store"))
+
+from cachestore import CacheStore, content_key, open_store  # noqa: E402
+
 # Constants
 DEBUG = os.environ.get("DEBUG", "") == "1"
-CLAUDE_API_URL = "https://api.anthropic.com/v1/messages"
+CLAUDE_API_URL = os.environ.get(
+    "CLAUDE_API_URL", "https://api.anthropic.com/v1/messages"
+)
 CLAUDE_MODEL = "claude-haiku-4-5"
 CLAUDE_MODEL_TEMPERATURE = 0.2
 CLAUDE_MAX_TOKENS = 4096
@@ -40,6 +68,25 @@ CHANGELOG_PATH = "CHANGELOG.md"
 SUMMARY_PATH = os.environ.get("GITHUB_STEP_SUMMARY")
 DEFAULT_DIGEST_REF = "origin/master"
 ENTRY_SIMILARITY_THRESHOLD = 0.65
+COMMIT_LOG_FORMAT = "%H%x1f%an%x1f%cI%x1f%s%x1e"
+LOG_READ_CHARS = 64 * 1024
+MAP_REDUCE_THRESHOLD_CHARS = 20000
+CHUNK_CHARS = 8000
+MAX_CHUNKS = 8
+MAX_CHUNK_HIGHLIGHTS = 5
+MAX_REDUCE_COMMITS = 20
+TIMELINE_VERSION = 2
+STATE_VERSION = 1
+PENDING_VERSION = 1
+SERVICE_SETTLE_SECONDS = 60
+SERVICE_MAX_EVENT_BYTES = 5 * 1024 * 1024
+SERVICE_LOOPBACK_HOSTS = ("127.0.0.1", "localhost", "::1")
+STATE_MAX_WINDOWS = 90
+CACHE_FILE = os.environ.get("DIGEST_CACHE_FILE")
+CLAUDE_CACHE_NAMESPACE = "slack-notify.claude"
+CLAUDE_CACHE_TTL = 30 * 24 * 3600
+SNAPSHOT_CACHE_NAMESPACE = "slack-notify.unreleased"
+GIT_CACHE_NAMESPACE = "slack-notify.git"
 
 # Colors (only apply if output is a TTY)
 if sys.stdout.isatty():
@@ -57,6 +104,8 @@ else:
 SCRIPT_DIR = Path(__file__).parent
 REPO_ROOT = SCRIPT_DIR.parent.parent
 PROMPT_FILE = SCRIPT_DIR / "prompts" / "analyze-changelog.txt"
+WINDOW_PROMPT_FILE = SCRIPT_DIR / "prompts" / "analyze-changelog-window.txt"
+CHUNK_PROMPT_FILE = SCRIPT_DIR / "prompts" / "summarize-chunk.txt"
 
 # JSON Schema for structured output
 OUTPUT_SCHEMA = {
@@ -79,19 +128,119 @@ OUTPUT_SCHEMA = {
     "additionalProperties": False,
 }
 
+# Schema for one chunk of an oversized digest window (map step)
+CHUNK_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "highlights": {
+            "type": "array",
+            "items": {"type": "string"},
+            "description": "Entries worth announcing, one line each, most important first",
+        },
+        "omitted": {
+            "type": "integer",
+            "description": "Number of entries left out as low-signal",
+        },
+    },
+    "required": ["highlights", "omitted"],
+    "additionalProperties": False,
+}
+
 
-@dataclass
+@dataclass(slots=True)
 class CommitInfo:
     sha: str
     author: str
     committed_at: str
     subject: str
-    url: str
+    repo_url: str
 
     @property
     def short_sha(self) -> str:
         return self.sha[:7]
 
+    @property
+    def url(self) -> str:
+        return f"{self.repo_url}/commit/{self.sha}"
+
+
+@dataclass
+class TokenUsage:
+    """Token counts summed over the Claude calls of one digest run."""
+
+    calls: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    stored_responses: int = 0
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def add(self, usage: dict) -> None:
+        with self.lock:
+            self.calls += 1
+            self.input_tokens += usage.get("input_tokens", 0)
+            self.output_tokens += usage.get("output_tokens", 0)
+
+    def add_stored(self) -> None:
+        with self.lock:
+            self.stored_responses += 1
+
+
+@dataclass
+class DigestState:
+    """Watermark of the last processed commit and the digest windows handled.
+
+    `windows` maps a digest ID (ref and date range) to its final decision, so
+    reruns of a processed window neither re-analyze nor double-post it.
+    """
+
+    path: Path | None
+    last_commit: str = ""
+    changelog_blob: str = ""
+    windows: dict[str, str] = field(default_factory=dict)
+
+
+@dataclass(slots=True)
+class TimelineEntry:
+    section: str
+    text: str
+    commit: str
+    author: str
+    added_at: int
+    closed_commit: str = ""
+    closed_at: int | None = None
+    closed_reason: str = ""
+    release: str = ""
+
+
+@dataclass
+class PendingDigest:
+    """Entries merged since the last flush, and the analysis made for them.
+
+    `result` is the Claude decision for the entries as of `analyzed_commit`;
+    it is current when that equals `tip_commit`.
+    """
+
+    path: Path
+    ref: str
+    base_commit: str = ""
+    since: int = 0
+    tip_commit: str = ""
+    entries: dict[str, list[TimelineEntry]] = field(default_factory=dict)
+    result: dict | None = None
+    analyzed_commit: str = ""
+
+
+@dataclass(slots=True)
+class UnreleasedSection:
+    """Entries of the [Unreleased] section by subsection, and the release after it.
+
+    Each entry is one string: its bullet line followed by any continuation
+    lines (wrapped text and nested bullets), joined with newlines.
+    """
+
+    entries: dict[str, list[str]]
+    release: str = ""
+
 
 TEST_CASES = [
     {
@@ -219,6 +368,120 @@ TEST_CASES = [
 """,
         "expected": {"Added": ["- Added scheduled daily digest notifications"]},
     },
+    {
+        "name": "Continuation lines and nested bullets stay with their entry",
+        "before": """# Changelog
+
+## [Unreleased]
+
+### Added
+- Added previous feature
+
+## [1.0.0] - 2026-01-01
+
+### Added
+- Added released feature
+""",
+        "after": """# Changelog
+
+## [Unreleased]
+
+### Added
+- Added digest index with a description
+  that wraps onto a second line
+  - Nested detail about attribution
+
+  Indented paragraph after a blank line
+- Added previous feature
+
+## [1.0.0] - 2026-01-01
+
+### Added
+- Added released feature
+- Added released detail that must not leak into [Unreleased]
+""",
+        "expected": {
+            "Added": [
+                "- Added digest index with a description\n"
+                "  that wraps onto a second line\n"
+                "  - Nested detail about attribution\n"
+                "  Indented paragraph after a blank line"
+            ]
+        },
+    },
+]
+
+TIMELINE_UNRELEASED = """# Changelog
+
+## [Unreleased]
+
+### Added
+{added}
+"""
+
+TIMELINE_RELEASED = """# Changelog
+
+## [Unreleased]
+
+## [1.2.0] - 2026-01-03
+
+### Added
+- Added previous feature
+- Added digest index
+"""
+
+TIMELINE_TEST_CASES = [
+    {
+        "name": "Timeline keeps the introducing commit across edits",
+        "snapshots": [
+            (100, TIMELINE_UNRELEASED.format(added="- Added previous feature")),
+            (
+                200,
+                TIMELINE_UNRELEASED.format(
+                    added="- Added digest index\n- Added previous feature"
+                ),
+            ),
+            (
+                300,
+                TIMELINE_UNRELEASED.format(
+                    added="- Added digest index with attribution\n"
+                    "- Added previous feature"
+                ),
+            ),
+        ],
+        "window": (150, 400),
+        "expected": {"Added": [("- Added digest index with attribution", "c200")]},
+    },
+    {
+        "name": "Timeline drops entries removed within the window",
+        "snapshots": [
+            (100, TIMELINE_UNRELEASED.format(added="- Added previous feature")),
+            (
+                200,
+                TIMELINE_UNRELEASED.format(
+                    added="- Added short-lived experiment\n- Added previous feature"
+                ),
+            ),
+            (300, TIMELINE_UNRELEASED.format(added="- Added previous feature")),
+        ],
+        "window": (150, 400),
+        "expected": {},
+    },
+    {
+        "name": "Timeline keeps entries released within the window",
+        "snapshots": [
+            (100, TIMELINE_UNRELEASED.format(added="- Added previous feature")),
+            (
+                200,
+                TIMELINE_UNRELEASED.format(
+                    added="- Added digest index\n- Added previous feature"
+                ),
+            ),
+            (300, TIMELINE_RELEASED),
+        ],
+        "window": (150, 400),
+        "expected": {"Added": [("- Added digest index", "c200")]},
+    },
 ]
 
 
@@ -298,19 +561,51 @@ def build_repo_url() -> str:
     return remote_url.rstrip("/")
 
 
-def call_claude_api(prompt: str, schema: dict) -> dict:
-    if DEBUG:
-        debug(f"Prompt length: {len(prompt)} chars")
+@functools.cache
+def digest_cache() -> CacheStore | None:
+    """The shared cache store, opened on first use when DIGEST_CACHE_FILE is set."""
+    if not CACHE_FILE:
+        return None
+    return open_store(Path(CACHE_FILE))
 
-    payload = json.dumps(
-        {
-            "model": CLAUDE_MODEL,
-            "max_tokens": CLAUDE_MAX_TOKENS,
-            "temperature": CLAUDE_MODEL_TEMPERATURE,
-            "messages": [{"role": "user", "content": prompt}],
-            "output_format": {"type": "json_schema", "schema": schema},
-        }
-    ).encode()
+
+def call_claude_api(
+    prompt: str,
+    schema: dict,
+    instructions: str = "",
+    usage: TokenUsage | None = None,
+) -> dict:
+    """Send one structured-output request and return the parsed JSON result.
+
+    `instructions` are sent as a system block and `prompt` carries only the
+    per-window data. The block is not marked for prompt caching: the
+    instructions are far below the model's minimum cacheable prefix, so the
+    marker would never take effect. With DIGEST_CACHE_FILE
+    set, a response is stored under the hash of the request body, so
+    re-running a window with the same entries makes no call at all.
+    """
+    if DEBUG:
+        debug(f"Prompt length: {len(instructions) + len(prompt)} chars")
+
+    request_body = {
+        "model": CLAUDE_MODEL,
+        "max_tokens": CLAUDE_MAX_TOKENS,
+        "temperature": CLAUDE_MODEL_TEMPERATURE,
+        "messages": [{"role": "user", "content": prompt}],
+        "output_format": {"type": "json_schema", "schema": schema},
+    }
+    if instructions:
+        request_body["system"] = [{"type": "text", "text": instructions}]
+    cache = digest_cache()
+    cache_key = content_key(request_body)
+    if cache is not None:
+        stored = cache.get(CLAUDE_CACHE_NAMESPACE, cache_key)
+        if stored is not None:
+            debug("Claude response served from the cache")
+            if usage is not None:
+                usage.add_stored()
+            return stored
+    payload = json.dumps(request_body).encode()
 
     request = urllib.request.Request(
         CLAUDE_API_URL,
@@ -330,51 +625,65 @@ def call_claude_api(prompt: str, schema: dict) -> dict:
         body = error.read().decode()
         raise RuntimeError(f"HTTP {error.code}: {body}") from error
 
+    if usage is not None:
+        usage.add(data.get("usage", {}))
     content = data["content"][0]
     if content["type"] != "text":
         raise ValueError(f"Unexpected content type: {content['type']}")
-    return json.loads(content["text"])
-
-
-def extract_unreleased_section(changelog_text: str) -> list[str]:
-    lines = changelog_text.splitlines()
-    start_index = None
-    end_index = len(lines)
-
-    for index, line in enumerate(lines):
-        if line.strip() == "## [Unreleased]":
-            start_index = index + 1
-            break
-
-    if start_index is None:
-        return []
-
-    for index in range(start_index, len(lines)):
-        if lines[index].startswith("## "):
-            end_index = index
-            break
-
-    return lines[start_index:end_index]
+    result = json.loads(content["text"])
+    if cache is not None:
+        cache.set(CLAUDE_CACHE_NAMESPACE, cache_key, result, ttl=CLAUDE_CACHE_TTL)
+    return result
 
 
-def parse_unreleased_entries(changelog_text: str) -> dict[str, list[str]]:
-    entries: dict[str, list[str]] = {}
-    current_section = None
+def read_unreleased(lines: Iterable[str]) -> UnreleasedSection:
+    """Parse the [Unreleased] section, consuming `lines` only up to its end.
 
-    for raw_line in extract_unreleased_section(changelog_text):
+    Indented lines, and unindented lines directly below an entry, continue
+    that entry; after a blank line only indented lines do.
+    """
+    entries: dict[str, list[list[str]]] = {}
+    section: list[list[str]] | None = None
+    entry: list[str] | None = None
+    after_blank = False
+    in_unreleased = False
+    release = ""
+    for raw_line in lines:
         line = raw_line.rstrip()
+        if not in_unreleased:
+            in_unreleased = line.strip() == "## [Unreleased]"
+            continue
+        if line.startswith("## "):
+            release = line[3:].strip().split("]", 1)[0].lstrip("[")
+            break
         if line.startswith("### "):
-            current_section = line[4:].strip()
-            entries.setdefault(current_section, [])
+            section = entries.setdefault(line[4:].strip(), [])
+            entry = None
+        elif section is None:
             continue
-
-        if current_section is None:
+        elif line.startswith("- "):
+            entry = [line]
+            section.append(entry)
+        elif not line:
+            after_blank = True
             continue
+        elif entry is not None and (line[0].isspace() or not after_blank):
+            entry.append(line)
+        else:
+            entry = None
+        after_blank = False
+    return UnreleasedSection(
+        entries={
+            name: ["\n".join(entry_lines) for entry_lines in items]
+            for name, items in entries.items()
+            if items
+        },
+        release=release,
+    )
 
-        if line.startswith("- "):
-            entries[current_section].append(line)
 
-    return {section: values for section, values in entries.items() if values}
+def parse_unreleased_entries(changelog_text: str) -> dict[str, list[str]]:
+    return read_unreleased(io.StringIO(changelog_text)).entries
 
 
 def fallback_added_entries(before: list[str], after: list[str]) -> list[str]:
@@ -473,54 +782,543 @@ def get_last_commit_before(cutoff: datetime, digest_ref: str) -> str:
     return output.strip()
 
 
-def get_file_at_commit(commit_sha: str, path: str) -> str:
+def get_unreleased_at_commit(commit_sha: str, path: str) -> UnreleasedSection:
+    """Stream the file from git and stop reading at the end of [Unreleased].
+
+    With the shared cache enabled, parsed sections are stored by blob SHA,
+    so a snapshot is parsed once however many windows compare against it.
+    """
+    if not commit_sha:
+        return UnreleasedSection(entries={})
+    cache = digest_cache()
+    if cache is None:
+        return read_unreleased_at_commit(commit_sha, path)
+    blob_sha = get_blob_sha(commit_sha, path)
+    if not blob_sha:
+        return UnreleasedSection(entries={})
+    stored = cache.memoize(
+        SNAPSHOT_CACHE_NAMESPACE,
+        blob_sha,
+        lambda: asdict(read_unreleased_at_commit(commit_sha, path)),
+    )
+    return UnreleasedSection(**stored)
+
+
+def read_unreleased_at_commit(commit_sha: str, path: str) -> UnreleasedSection:
+    with subprocess.Popen(
+        ["git", "cat-file", "blob", f"{commit_sha}:{path}"],
+        cwd=REPO_ROOT,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True,
+        encoding="utf-8",
+        errors="replace",
+    ) as process:
+        section = read_unreleased(process.stdout)
+        process.kill()
+    return section
+
+
+def read_batch_blob(stream: IO[bytes], size: int) -> UnreleasedSection:
+    """Parse one `git cat-file --batch` CHANGELOG.md blob from `stream`.
+
+    Only the lines up to the end of [Unreleased] are decoded; the rest of
+    the blob is skipped so the stream is left at the next header.
+    """
+    remaining = size
+
+    def blob_lines() -> Iterator[str]:
+        nonlocal remaining
+        while remaining > 0:
+            line = stream.readline(remaining)
+            if not line:
+                return
+            remaining -= len(line)
+            yield line.decode("utf-8", "replace")
+
+    section = read_unreleased(blob_lines())
+    while remaining > 0:
+        chunk = stream.read(min(remaining, LOG_READ_CHARS))
+        if not chunk:
+            break
+        remaining -= len(chunk)
+    stream.read(1)
+    return section
+
+
+def get_blob_sha(commit_sha: str, path: str) -> str:
     if not commit_sha:
         return ""
+    return run_git(
+        ["rev-parse", "--verify", "--quiet", f"{commit_sha}:{path}"], check=False
+    ).strip()
+
+
+def is_ancestor(ancestor_sha: str, commit_sha: str) -> bool:
     result = subprocess.run(
-        ["git", "show", f"{commit_sha}:{path}"],
+        ["git", "merge-base", "--is-ancestor", ancestor_sha, commit_sha],
         cwd=REPO_ROOT,
         capture_output=True,
         text=True,
         check=False,
     )
-    if result.returncode != 0:
-        return ""
-    return result.stdout
+    return result.returncode == 0
+
+
+def load_state(path: Path | None) -> DigestState:
+    if path is None:
+        return DigestState(path=None)
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError):
+        return DigestState(path=path)
+    if data.get("version") != STATE_VERSION:
+        return DigestState(path=path)
+    return DigestState(
+        path=path,
+        last_commit=data.get("last_commit", ""),
+        changelog_blob=data.get("changelog_blob", ""),
+        windows=data.get("windows", {}),
+    )
+
+
+def save_state(state: DigestState) -> None:
+    if state.path is None:
+        return
+    state.path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = state.path.with_suffix(".tmp")
+    tmp_path.write_text(
+        json.dumps(
+            {
+                "version": STATE_VERSION,
+                "last_commit": state.last_commit,
+                "changelog_blob": state.changelog_blob,
+                "windows": state.windows,
+            },
+            indent=2,
+        ),
+        encoding="utf-8",
+    )
+    tmp_path.replace(state.path)
+
+
+def commit_exists(commit_sha: str) -> bool:
+    return bool(
+        run_git(
+            ["rev-parse", "--verify", "--quiet", f"{commit_sha}^{{commit}}"],
+            check=False,
+        ).strip()
+    )
+
+
+def get_commit_timestamp(commit_sha: str) -> int:
+    cache = digest_cache()
+    if cache is not None and len(commit_sha) == 40:
+        # A full SHA names an immutable commit, so its date never changes.
+        return cache.memoize(
+            GIT_CACHE_NAMESPACE,
+            f"timestamp:{commit_sha}",
+            lambda: read_commit_timestamp(commit_sha),
+        )
+    return read_commit_timestamp(commit_sha)
+
+
+def read_commit_timestamp(commit_sha: str) -> int:
+    output = run_git(["show", "-s", "--format=%ct", commit_sha], check=False)
+    return int(output.strip() or 0)
+
+
+def load_pending(path: Path, ref: str) -> PendingDigest:
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError):
+        return PendingDigest(path=path, ref=ref)
+    if data.get("version") != PENDING_VERSION or data.get("ref") != ref:
+        return PendingDigest(path=path, ref=ref)
+    return PendingDigest(
+        path=path,
+        ref=ref,
+        base_commit=data["base_commit"],
+        since=data["since"],
+        tip_commit=data["tip_commit"],
+        entries={
+            section: [TimelineEntry(**item) for item in items]
+            for section, items in data["entries"].items()
+        },
+        result=data["result"],
+        analyzed_commit=data["analyzed_commit"],
+    )
+
+
+def save_pending(pending: PendingDigest) -> None:
+    pending.path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = pending.path.with_suffix(".tmp")
+    tmp_path.write_text(
+        json.dumps(
+            {
+                "version": PENDING_VERSION,
+                "ref": pending.ref,
+                "base_commit": pending.base_commit,
+                "since": pending.since,
+                "tip_commit": pending.tip_commit,
+                "entries": {
+                    section: [asdict(entry) for entry in entries]
+                    for section, entries in pending.entries.items()
+                },
+                "result": pending.result,
+                "analyzed_commit": pending.analyzed_commit,
+            },
+            indent=2,
+        ),
+        encoding="utf-8",
+    )
+    tmp_path.replace(pending.path)
+
+
+def digest_id(digest_ref: str, start_date: date, end_date: date) -> str:
+    return f"{digest_ref}@{format_date_range(start_date, end_date)}"
+
+
+def record_window(
+    state: DigestState, window_id: str, decision: str, commit_sha: str
+) -> None:
+    """Store a final decision and advance the watermark to `commit_sha`.
+
+    The watermark never moves backwards, so replaying an old date keeps it.
+    """
+    if state.path is None:
+        return
+    state.windows.pop(window_id, None)
+    state.windows[window_id] = decision
+    for stale in list(state.windows)[:-STATE_MAX_WINDOWS]:
+        del state.windows[stale]
+    if commit_sha and (
+        not state.last_commit or is_ancestor(state.last_commit, commit_sha)
+    ):
+        state.last_commit = commit_sha
+        state.changelog_blob = get_blob_sha(commit_sha, CHANGELOG_PATH)
+    save_state(state)
+    debug(f"Digest state saved: {state.last_commit[:7]} ({window_id}: {decision})")
+
+
+class ChangelogTimeline:
+    """Index of every [Unreleased] entry with the commits that opened and closed it.
+
+    Built once by replaying the first-parent history of CHANGELOG.md and then
+    extended with the commits after `last_commit` on each run. Entries are
+    kept in the order they were added, so a window query is a range lookup on
+    `added_at`.
+    """
+
+    def __init__(self, path: Path, ref: str):
+        self.path = path
+        self.ref = ref
+        self.reset()
+
+    def reset(self) -> None:
+        self.last_commit = ""
+        self.last_release = ""
+        self.entries: list[TimelineEntry] = []
+        self.active: dict[str, list[int]] = {}
+
+    @classmethod
+    def load(cls, path: Path, ref: str) -> ChangelogTimeline:
+        timeline = cls(path, ref)
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            return timeline
+        if data.get("version") != TIMELINE_VERSION or data.get("ref") != ref:
+            return timeline
+        timeline.last_commit = data["last_commit"]
+        timeline.last_release = data["last_release"]
+        timeline.entries = [TimelineEntry(**item) for item in data["entries"]]
+        timeline.active = data["active"]
+        return timeline
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(
+            json.dumps(
+                {
+                    "version": TIMELINE_VERSION,
+                    "ref": self.ref,
+                    "last_commit": self.last_commit,
+                    "last_release": self.last_release,
+                    "entries": [asdict(entry) for entry in self.entries],
+                    "active": self.active,
+                }
+            ),
+            encoding="utf-8",
+        )
+        tmp_path.replace(self.path)
+
+    def apply_snapshot(
+        self, sha: str, author: str, timestamp: int, unreleased: UnreleasedSection
+    ) -> None:
+        """Diff one CHANGELOG.md snapshot against the active entries.
+
+        New entries are found with the same rules as the snapshot diff;
+        the other entries are matched to active ones exactly or by
+        similarity (edits keep their original commit). Active entries that
+        are gone were released when a new version heading appeared in the
+        same commit, and removed otherwise.
+        """
+        if self.entries and timestamp < self.entries[-1].added_at:
+            # Rewritten history can put an older committer date after a
+            # newer one; keep `added_at` sorted for the range lookup.
+            timestamp = self.entries[-1].added_at
+        sections = unreleased.entries
+        release = unreleased.release
+        released = bool(release) and release != self.last_release
+        active: dict[str, list[int]] = {}
+        for section, after_entries in sections.items():
+            before_ids = list(self.active.get(section, []))
+            added = find_new_entries(
+                [self.entries[index].text for index in before_ids], after_entries
+            )
+            pending_new = {text: added.count(text) for text in added}
+            section_ids: list[int] = []
+            for text in after_entries:
+                match = None
+                if pending_new.get(text, 0) > 0:
+                    pending_new[text] -= 1
+                else:
+                    match = next(
+                        (i for i in before_ids if self.entries[i].text == text), None
+                    )
+                    if match is None:
+                        match = next(
+                            (
+                                i
+                                for i in before_ids
+                                if entries_equivalent(self.entries[i].text, text)
+                            ),
+                            None,
+                        )
+                if match is None:
+                    self.entries.append(
+                        TimelineEntry(
+                            section=section,
+                            text=text,
+                            commit=sha,
+                            author=author,
+                            added_at=timestamp,
+                        )
+                    )
+                    section_ids.append(len(self.entries) - 1)
+                else:
+                    before_ids.remove(match)
+                    self.entries[match].text = text
+                    section_ids.append(match)
+            active[section] = section_ids
+        for section, before_ids in self.active.items():
+            still_active = set(active.get(section, []))
+            for index in before_ids:
+                if index not in still_active:
+                    entry = self.entries[index]
+                    entry.closed_commit = sha
+                    entry.closed_at = timestamp
+                    entry.closed_reason = "released" if released else "removed"
+                    entry.release = release if released else ""
+        self.active = active
+        self.last_release = release
+        self.last_commit = sha
+
+    def update(self, tip_sha: str) -> int:
+        """Replay the CHANGELOG.md commits up to `tip_sha`; return how many."""
+        if self.last_commit == tip_sha or not tip_sha:
+            return 0
+        if self.last_commit and is_ancestor(tip_sha, self.last_commit):
+            return 0
+        if self.last_commit and not is_ancestor(self.last_commit, tip_sha):
+            debug("Changelog timeline diverged from the ref, rebuilding")
+            self.reset()
+        revision = f"{self.last_commit}..{tip_sha}" if self.last_commit else tip_sha
+        output = run_git(
+            [
+                "log",
+                "--first-parent",
+                "--reverse",
+                "--format=%H%x1f%an%x1f%ct",
+                revision,
+                "--",
+                CHANGELOG_PATH,
+            ],
+            check=False,
+        )
+        commits = [line.split("\x1f") for line in output.splitlines() if line]
+        with subprocess.Popen(
+            ["git", "cat-file", "--batch"],
+            cwd=REPO_ROOT,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+        ) as batch:
+            for sha, author, timestamp in commits:
+                batch.stdin.write(f"{sha}:{CHANGELOG_PATH}\n".encode())
+                batch.stdin.flush()
+                header = batch.stdout.readline().split()
+                unreleased = UnreleasedSection(entries={})
+                if len(header) == 3 and header[1] == b"blob":
+                    unreleased = read_batch_blob(batch.stdout, int(header[2]))
+                self.apply_snapshot(sha, author, int(timestamp), unreleased)
+            batch.stdin.close()
+        self.last_commit = tip_sha
+        debug(f"Changelog timeline replayed {len(commits)} commit(s)")
+        return len(commits)
+
+    def query(self, after_ts: int, until_ts: int) -> dict[str, list[TimelineEntry]]:
+        """Entries added in (after_ts, until_ts] and not removed by until_ts.
+
+        Entries released within the window are kept: they shipped. Sections
+        and entries are ordered as in CHANGELOG.md, newest entries first.
+        """
+        keys = [entry.added_at for entry in self.entries]
+        first = bisect_right(keys, after_ts)
+        last = bisect_right(keys, until_ts)
+        window = sorted(self.entries[first:last], key=lambda entry: -entry.added_at)
+        result: dict[str, list[TimelineEntry]] = {}
+        for entry in window:
+            if (
+                entry.closed_reason == "removed"
+                and entry.closed_at is not None
+                and entry.closed_at <= until_ts
+            ):
+                continue
+            result.setdefault(entry.section, []).append(entry)
+        order = {section: position for position, section in enumerate(self.active)}
+        return dict(
+            sorted(result.items(), key=lambda item: order.get(item[0], len(order)))
+        )
+
+
+def parse_commit_record(record: str, repo_url: str) -> CommitInfo | None:
+    record = record.strip()
+    if not record:
+        return None
+    sha, author, committed_at, subject = record.split("\x1f")
+    return CommitInfo(
+        sha=sha,
+        author=author,
+        committed_at=committed_at,
+        subject=subject,
+        repo_url=repo_url,
+    )
+
+
+def iter_commit_log(range_args: list[str], repo_url: str) -> Iterator[CommitInfo]:
+    """Yield commits from `git log` as its output arrives on the pipe.
+
+    Only one read chunk and one partial record are held at a time; closing
+    the generator early stops the git process.
+    """
+    args = ["log", f"--pretty=format:{COMMIT_LOG_FORMAT}", *range_args]
+    debug(f"git {' '.join(args)}")
+    process = subprocess.Popen(
+        ["git", *args],
+        cwd=REPO_ROOT,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True,
+        encoding="utf-8",
+        errors="replace",
+    )
+    pending = ""
+    try:
+        while chunk := process.stdout.read(LOG_READ_CHARS):
+            *records, pending = (pending + chunk).split("\x1e")
+            for record in records:
+                commit = parse_commit_record(record, repo_url)
+                if commit is not None:
+                    yield commit
+        commit = parse_commit_record(pending, repo_url)
+        if commit is not None:
+            yield commit
+    finally:
+        if process.poll() is None:
+            process.kill()
+        process.stdout.close()
+        process.wait()
+
+
+class CommitLog:
+    """First-parent commits in a revision range, read with one `git log` pass.
+
+    The pass runs on first use and keeps commits while their formatted block
+    fits in MAP_REDUCE_THRESHOLD_CHARS. Once it is exceeded, git is stopped,
+    only the first MAX_REDUCE_COMMITS are kept (`complete` is False), and
+    `len()` asks `git rev-list --count`. Iterating yields the kept commits,
+    so every consumer in a run shares the same bounded pass.
+    """
+
+    __slots__ = ("range_args", "repo_url", "_commits", "_complete", "_count")
+
+    def __init__(self, range_args: list[str], repo_url: str):
+        self.range_args = ["--first-parent", *range_args]
+        self.repo_url = repo_url
+        self._commits: list[CommitInfo] | None = None
+        self._complete = True
+        self._count: int | None = None
+
+    def _read(self) -> list[CommitInfo]:
+        if self._commits is not None:
+            return self._commits
+        commits: list[CommitInfo] = []
+        block_chars = 0
+        stream = iter_commit_log(self.range_args, self.repo_url)
+        try:
+            for commit in stream:
+                block_chars += len(format_commit_line(commit)) + 1
+                if block_chars > MAP_REDUCE_THRESHOLD_CHARS:
+                    self._complete = False
+                    break
+                commits.append(commit)
+        finally:
+            stream.close()
+        if self._complete:
+            self._count = len(commits)
+        else:
+            del commits[MAX_REDUCE_COMMITS:]
+        self._commits = commits
+        return commits
+
+    @property
+    def complete(self) -> bool:
+        """Whether every commit in the range was kept."""
+        self._read()
+        return self._complete
+
+    def __iter__(self) -> Iterator[CommitInfo]:
+        return iter(self._read())
+
+    def __bool__(self) -> bool:
+        return bool(self._read())
+
+    def __len__(self) -> int:
+        self._read()
+        if self._count is None:
+            output = run_git(["rev-list", "--count", *self.range_args], check=False)
+            self._count = int(output.strip() or 0)
+        return self._count
 
 
 def get_commits_for_window(
     start: datetime, end: datetime, repo_url: str, digest_ref: str
-) -> list[CommitInfo]:
+) -> CommitLog:
     inclusive_end = end - timedelta(seconds=1)
-    log_format = "%H%x1f%an%x1f%cI%x1f%s%x1e"
-    output = run_git(
+    return CommitLog(
         [
-            "log",
-            "--first-parent",
             f"--since={start.isoformat()}",
             f"--until={inclusive_end.isoformat()}",
-            f"--pretty=format:{log_format}",
             digest_ref,
         ],
-        check=False,
+        repo_url,
     )
 
-    commits: list[CommitInfo] = []
-    for record in output.strip("\x1e\n").split("\x1e"):
-        record = record.strip()
-        if not record:
-            continue
-        sha, author, committed_at, subject = record.split("\x1f")
-        commits.append(
-            CommitInfo(
-                sha=sha,
-                author=author,
-                committed_at=committed_at,
-                subject=subject,
-                url=f"{repo_url}/commit/{sha}",
-            )
-        )
-    return commits
+
+def get_commits_since(base_sha: str, tip_sha: str, repo_url: str) -> CommitLog:
+    return CommitLog([f"{base_sha}..{tip_sha}"], repo_url)
 
 
 def format_entries_block(entries_by_section: dict[str, list[str]]) -> str:
@@ -532,13 +1330,28 @@ def format_entries_block(entries_by_section: dict[str, list[str]]) -> str:
     return "\n".join(blocks).strip()
 
 
-def format_commits_block(commits: list[CommitInfo]) -> str:
-    if not commits:
-        return "- No commits in this window"
-    return "\n".join(
-        f"- {commit.short_sha} by {commit.author} at {commit.committed_at}: {commit.subject}"
-        for commit in commits
-    )
+def format_attributed_entries_block(
+    timeline_entries: dict[str, list[TimelineEntry]],
+) -> str:
+    blocks = []
+    for section, entries in timeline_entries.items():
+        lines = "\n".join(
+            f"{entry.text} ({entry.commit[:7]} by {entry.author})" for entry in entries
+        )
+        blocks.append(f"### {section}\n{lines}")
+    return "\n\n".join(blocks)
+
+
+def format_commit_line(commit: CommitInfo) -> str:
+    return f"- {commit.short_sha} by {commit.author} at {commit.committed_at}: {commit.subject}"
+
+
+def format_commits_block(commits: CommitLog | list[CommitInfo]) -> str:
+    """List every commit, or the compact block when the log was cut short."""
+    if isinstance(commits, CommitLog) and not commits.complete:
+        return format_compact_commits_block(commits)
+    block = "\n".join(format_commit_line(commit) for commit in commits)
+    return block or "- No commits in this window"
 
 
 def format_date_range(start_date: date, end_date: date) -> str:
@@ -547,19 +1360,53 @@ def format_date_range(start_date: date, end_date: date) -> str:
     return f"{start_date.isoformat()} .. {end_date.isoformat()}"
 
 
-def build_prompt(
+def render_prompt(
     start_date: date,
     end_date: date,
     timezone_name: str,
-    entries_by_section: dict[str, list[str]],
-    commits: list[CommitInfo],
+    commit_block: str,
+    entries_block: str,
 ) -> str:
-    return PROMPT_FILE.read_text(encoding="utf-8").format(
+    return WINDOW_PROMPT_FILE.read_text(encoding="utf-8").format(
         target_date=format_date_range(start_date, end_date),
         timezone_name=timezone_name,
-        commit_block=format_commits_block(commits),
-        entries_block=format_entries_block(entries_by_section),
+        commit_block=commit_block,
+        entries_block=entries_block,
+    )
+
+
+def format_compact_commits_block(commits: CommitLog | list[CommitInfo]) -> str:
+    shown = list(islice(commits, MAX_REDUCE_COMMITS))
+    block = format_commits_block(shown)
+    remaining = len(commits) - len(shown)
+    if remaining > 0:
+        block += f"\n- ... and {remaining} more commits"
+    return block
+
+
+def chunk_entries(
+    entries_by_section: dict[str, list[str]], chunk_count: int
+) -> list[dict[str, list[str]]]:
+    """Split entries into at most `chunk_count` contiguous chunks of similar size.
+
+    Each chunk keeps the section headings of the entries it holds.
+    """
+    total = sum(
+        len(entry) + 1 for entries in entries_by_section.values() for entry in entries
     )
+    chunks: list[dict[str, list[str]]] = []
+    current: dict[str, list[str]] = {}
+    size = 0
+    for section, entries in entries_by_section.items():
+        for entry in entries:
+            if current and size >= total * (len(chunks) + 1) / chunk_count:
+                chunks.append(current)
+                current = {}
+            current.setdefault(section, []).append(entry)
+            size += len(entry) + 1
+    if current:
+        chunks.append(current)
+    return chunks
 
 
 def create_digest_title(start_date: date, end_date: date, timezone_name: str) -> str:
@@ -571,14 +1418,35 @@ def create_digest_title(start_date: date, end_date: date, timezone_name: str) ->
     return f"What shipped in Sparkdock ({start_date.isoformat()} \u2013 {end_date.isoformat()})"
 
 
-def build_commit_context(commits: list[CommitInfo], limit: int = 3) -> str:
-    if not commits:
+def build_commit_context(commits: Iterable[CommitInfo], limit: int = 3) -> str:
+    parts: list[str] = []
+    remaining = 0
+    for commit in commits:
+        if len(parts) < limit:
+            parts.append(f"<{commit.url}|{commit.short_sha}>")
+        else:
+            remaining += 1
+    if not parts:
         return "No commits in this window"
+    if remaining:
+        parts.append(f"+{remaining} more")
+    return ", ".join(parts)
+
 
-    preview = commits[:limit]
-    parts = [f"<{commit.url}|{commit.short_sha}>" for commit in preview]
-    if len(commits) > limit:
-        parts.append(f"+{len(commits) - limit} more")
+def build_entry_context(
+    timeline_entries: dict[str, list[TimelineEntry]], repo_url: str, limit: int = 3
+) -> str:
+    """Link the commits that introduced the digest entries, with their authors."""
+    introduced: dict[str, str] = {}
+    for entries in timeline_entries.values():
+        for entry in entries:
+            introduced.setdefault(entry.commit, entry.author)
+    parts = [
+        f"<{repo_url}/commit/{sha}|{sha[:7]}> by {author}"
+        for sha, author in islice(introduced.items(), limit)
+    ]
+    if len(introduced) > limit:
+        parts.append(f"+{len(introduced) - limit} more")
     return ", ".join(parts)
 
 
@@ -587,7 +1455,9 @@ def create_slack_payload(
     message: str,
     start_date: date,
     end_date: date,
-    commits: list[CommitInfo],
+    commits: Iterable[CommitInfo],
+    timeline_entries: dict[str, list[TimelineEntry]] | None = None,
+    repo_url: str = "",
 ) -> dict:
     blocks = [
         {
@@ -612,6 +1482,16 @@ def create_slack_payload(
             ],
         },
     ]
+    if timeline_entries:
+        blocks[-1]["elements"].append(
+            {
+                "type": "mrkdwn",
+                "text": (
+                    f"*Entries from:* "
+                    f"{build_entry_context(timeline_entries, repo_url)}"
+                ),
+            }
+        )
     return {"text": title, "blocks": blocks}
 
 
@@ -631,13 +1511,18 @@ def write_digest_summary(
     end_date: date,
     timezone_name: str,
     digest_ref: str,
-    commits: list[CommitInfo],
+    commits: CommitLog | list[CommitInfo],
     entries_by_section: dict[str, list[str]],
     decision: str,
     reason: str,
     message: str = "",
+    timeline_entries: dict[str, list[TimelineEntry]] | None = None,
+    usage: TokenUsage | None = None,
 ) -> None:
-    entry_block = format_entries_block(entries_by_section) or "_None_"
+    if timeline_entries:
+        entry_block = format_attributed_entries_block(timeline_entries)
+    else:
+        entry_block = format_entries_block(entries_by_section) or "_None_"
     lines = [
         "## Daily Slack digest",
         "",
@@ -647,6 +1532,18 @@ def write_digest_summary(
         f"- **Commits considered:** {len(commits)}",
         f"- **Decision:** {decision}",
         f"- **Reason:** {reason}",
+    ]
+    if usage is not None and usage.calls:
+        lines.append(
+            f"- **Claude tokens:** {usage.input_tokens} input, "
+            f"{usage.output_tokens} output ({usage.calls} call(s))"
+        )
+    if usage is not None and usage.stored_responses:
+        lines.append(
+            f"- **Stored responses:** {usage.stored_responses} "
+            "served from the shared cache"
+        )
+    lines += [
         "",
         "### Commits",
         format_commits_block(commits),
@@ -661,17 +1558,109 @@ def write_digest_summary(
     append_summary(lines)
 
 
+def summarize_chunk(
+    chunk: dict[str, list[str]],
+    index: int,
+    count: int,
+    target_date: str,
+    usage: TokenUsage | None = None,
+) -> dict:
+    prompt = CHUNK_PROMPT_FILE.read_text(encoding="utf-8").format(
+        target_date=target_date,
+        chunk_index=index,
+        chunk_count=count,
+        max_highlights=MAX_CHUNK_HIGHLIGHTS,
+        entries_block=format_entries_block(chunk),
+    )
+    result = call_claude_api(prompt, CHUNK_SCHEMA, usage=usage)
+    debug(f"Chunk {index}/{count} response: {json.dumps(result, indent=2)}")
+    return result
+
+
+def reduce_entries_block(
+    entries_by_section: dict[str, list[str]],
+    target_date: str,
+    usage: TokenUsage | None = None,
+) -> str:
+    """Summarize oversized additions chunk by chunk into one highlights block.
+
+    The chunk count is capped at MAX_CHUNKS (chunks grow instead), and all
+    chunks are summarized concurrently, so the map step costs about one call
+    whatever the window size, and the reduce step sees at most
+    MAX_CHUNKS * MAX_CHUNK_HIGHLIGHTS lines.
+    """
+    entry_count = sum(len(entries) for entries in entries_by_section.values())
+    total_chars = len(format_entries_block(entries_by_section))
+    chunks = chunk_entries(
+        entries_by_section, min(MAX_CHUNKS, math.ceil(total_chars / CHUNK_CHARS))
+    )
+    print(
+        f"Large digest window ({entry_count} entries), "
+        f"summarizing {len(chunks)} chunks concurrently..."
+    )
+    with ThreadPoolExecutor(max_workers=len(chunks)) as pool:
+        partials = list(
+            pool.map(
+                lambda item: summarize_chunk(
+                    item[1], item[0], len(chunks), target_date, usage
+                ),
+                enumerate(chunks, start=1),
+            )
+        )
+
+    highlights: list[str] = []
+    omitted = 0
+    for partial in partials:
+        for highlight in partial.get("highlights", [])[:MAX_CHUNK_HIGHLIGHTS]:
+            highlight = highlight.strip().lstrip("-•* ").strip()
+            if highlight:
+                highlights.append(f"- {highlight}")
+        omitted += int(partial.get("omitted", 0))
+
+    lines = [
+        f"### Highlights (summarized from {entry_count} entries in {len(chunks)} parts)"
+    ]
+    lines.extend(highlights or ["- No entry was judged worth announcing"])
+    if omitted:
+        lines.extend(["", f"({omitted} low-signal entries were left out)"])
+    return "\n".join(lines)
+
+
 def analyze_digest(
     start_date: date,
     end_date: date,
     timezone_name: str,
     entries_by_section: dict[str, list[str]],
-    commits: list[CommitInfo],
+    commits: CommitLog | list[CommitInfo],
+    usage: TokenUsage | None = None,
 ) -> dict:
-    prompt = build_prompt(
-        start_date, end_date, timezone_name, entries_by_section, commits
+    """Ask Claude for the digest decision and message.
+
+    Windows larger than MAP_REDUCE_THRESHOLD_CHARS are analyzed
+    hierarchically: the commit list is shortened, and when the changelog
+    additions themselves are too large they are summarized in concurrent
+    chunks whose highlights replace the entries in the final prompt. A
+    commit log cut short by its bounded read is always over the threshold.
+    """
+    entries_block = format_entries_block(entries_by_section)
+    commit_block = format_commits_block(commits)
+    if (isinstance(commits, CommitLog) and not commits.complete) or (
+        len(entries_block) + len(commit_block) > MAP_REDUCE_THRESHOLD_CHARS
+    ):
+        commit_block = format_compact_commits_block(commits)
+        if len(entries_block) > CHUNK_CHARS:
+            entries_block = reduce_entries_block(
+                entries_by_section, format_date_range(start_date, end_date), usage
+            )
+    prompt = render_prompt(
+        start_date, end_date, timezone_name, commit_block, entries_block
+    )
+    result = call_claude_api(
+        prompt,
+        OUTPUT_SCHEMA,
+        instructions=PROMPT_FILE.read_text(encoding="utf-8"),
+        usage=usage,
     )
-    result = call_claude_api(prompt, OUTPUT_SCHEMA)
     debug(f"Claude response: {json.dumps(result, indent=2)}")
     return result
 
@@ -685,11 +1674,12 @@ def dry_run_mode() -> int:
     print(f"   ✓ Repository root: {REPO_ROOT}")
 
     print("\n2. Checking prompt and schema...")
-    if not PROMPT_FILE.exists():
-        print(f"   ✗ Prompt file missing: {PROMPT_FILE}")
-        return 1
-    prompt_text = PROMPT_FILE.read_text(encoding="utf-8")
-    print(f"   ✓ Prompt file exists ({len(prompt_text)} characters)")
+    for prompt_file in (PROMPT_FILE, WINDOW_PROMPT_FILE):
+        if not prompt_file.exists():
+            print(f"   ✗ Prompt file missing: {prompt_file}")
+            return 1
+        prompt_text = prompt_file.read_text(encoding="utf-8")
+        print(f"   ✓ {prompt_file.name} exists ({len(prompt_text)} characters)")
     json.dumps(OUTPUT_SCHEMA)
     print("   ✓ Structured output schema is valid")
 
@@ -745,6 +1735,27 @@ def test_mode() -> int:
             all_passed = False
             print(f"  Expected: {json.dumps(test_case['expected'], indent=2)}")
             print(f"  Got:      {json.dumps(result, indent=2)}")
+    for test_case in TIMELINE_TEST_CASES:
+        timeline = ChangelogTimeline(Path(os.devnull), "test")
+        for timestamp, changelog_text in test_case["snapshots"]:
+            timeline.apply_snapshot(
+                f"c{timestamp}",
+                "Tester",
+                timestamp,
+                read_unreleased(io.StringIO(changelog_text)),
+            )
+        result = {
+            section: [(entry.text, entry.commit) for entry in entries]
+            for section, entries in timeline.query(*test_case["window"]).items()
+        }
+        passed = result == test_case["expected"]
+        color = GREEN if passed else RED
+        status = "PASSED" if passed else "FAILED"
+        print(f"{color}{status}{NC}: {test_case['name']}")
+        if not passed:
+            all_passed = False
+            print(f"  Expected: {test_case['expected']}")
+            print(f"  Got:      {result}")
     return 0 if all_passed else 1
 
 
@@ -753,12 +1764,80 @@ def daily_mode(
     timezone_name: str,
     preview: bool,
     requested_ref: str | None,
+    state_path: Path | None = None,
+    force: bool = False,
+    index_path: Path | None = None,
 ) -> int:
+    """Build the digest for one window.
+
+    With a state file, only commits after the stored watermark are compared,
+    the run stops early when CHANGELOG.md is unchanged since the watermark,
+    and windows already sent or skipped are not processed again unless
+    `force` is set. Preview runs never update the state.
+
+    With an index file, the window's entries come from the CHANGELOG.md
+    timeline instead of a snapshot diff, and each entry is attributed to
+    the commit and author that introduced it.
+    """
     repo_url = build_repo_url()
     digest_ref = resolve_digest_ref(requested_ref)
     start_date, end_date = parse_target_date(target_date_raw, timezone_name)
     start, end = get_day_window(start_date, end_date, timezone_name)
-    commits = get_commits_for_window(start, end, repo_url, digest_ref)
+    state = load_state(None if preview else state_path)
+    window_id = digest_id(digest_ref, start_date, end_date)
+
+    previous_decision = state.windows.get(window_id)
+    if previous_decision and not force:
+        reason = (
+            f"Digest window already processed ({previous_decision}); "
+            "use --force to process it again"
+        )
+        print(reason)
+        write_digest_summary(
+            start_date=start_date,
+            end_date=end_date,
+            timezone_name=timezone_name,
+            digest_ref=digest_ref,
+            commits=[],
+            entries_by_section={},
+            decision="skipped",
+            reason=reason,
+        )
+        return 0
+
+    after_commit = get_last_commit_before(end, digest_ref)
+    use_watermark = bool(
+        state.last_commit
+        and after_commit
+        and is_ancestor(state.last_commit, after_commit)
+    )
+    if use_watermark and (
+        after_commit == state.last_commit
+        or get_blob_sha(after_commit, CHANGELOG_PATH) == state.changelog_blob
+    ):
+        reason = (
+            f"CHANGELOG.md is unchanged since the last processed commit "
+            f"({state.last_commit[:7]})"
+        )
+        print(reason)
+        write_digest_summary(
+            start_date=start_date,
+            end_date=end_date,
+            timezone_name=timezone_name,
+            digest_ref=digest_ref,
+            commits=[],
+            entries_by_section={},
+            decision="skipped",
+            reason=reason,
+        )
+        record_window(state, window_id, "skipped", after_commit)
+        return 0
+
+    if use_watermark:
+        debug(f"Resuming from watermark {state.last_commit[:7]}")
+        commits = get_commits_since(state.last_commit, after_commit, repo_url)
+    else:
+        commits = get_commits_for_window(start, end, repo_url, digest_ref)
 
     if not commits:
         reason = f"No commits landed on {digest_ref} during the digest window"
@@ -773,16 +1852,35 @@ def daily_mode(
             decision="skipped",
             reason=reason,
         )
+        record_window(state, window_id, "skipped", after_commit)
         return 0
 
-    before_commit = get_last_commit_before(start, digest_ref)
-    after_commit = get_last_commit_before(end, digest_ref)
-    before_text = get_file_at_commit(before_commit, CHANGELOG_PATH)
-    after_text = get_file_at_commit(after_commit, CHANGELOG_PATH)
-
-    before_sections = parse_unreleased_entries(before_text)
-    after_sections = parse_unreleased_entries(after_text)
-    entries_by_section = extract_daily_entries(before_sections, after_sections)
+    timeline_entries: dict[str, list[TimelineEntry]] | None = None
+    if index_path is not None:
+        timeline = ChangelogTimeline.load(index_path, digest_ref)
+        timeline.update(after_commit)
+        if not preview:
+            # Preview runs stay read-only, like the watermark state above.
+            timeline.save()
+        if use_watermark:
+            after_ts = get_commit_timestamp(state.last_commit)
+        else:
+            after_ts = int(start.timestamp()) - 1
+        timeline_entries = timeline.query(after_ts, int(end.timestamp()) - 1)
+        entries_by_section = {
+            section: [entry.text for entry in entries]
+            for section, entries in timeline_entries.items()
+        }
+    else:
+        if use_watermark:
+            before_commit = state.last_commit
+        else:
+            before_commit = get_last_commit_before(start, digest_ref)
+        before_sections = get_unreleased_at_commit(
+            before_commit, CHANGELOG_PATH
+        ).entries
+        after_sections = get_unreleased_at_commit(after_commit, CHANGELOG_PATH).entries
+        entries_by_section = extract_daily_entries(before_sections, after_sections)
 
     if not entries_by_section:
         reason = (
@@ -796,17 +1894,20 @@ def daily_mode(
             digest_ref=digest_ref,
             commits=commits,
             entries_by_section=entries_by_section,
+            timeline_entries=timeline_entries,
             decision="skipped",
             reason=reason,
         )
+        record_window(state, window_id, "skipped", after_commit)
         return 0
 
     check_env(require_anthropic=True, require_slack=not preview)
 
     print("Changelog additions detected, analyzing daily digest with Claude AI...")
+    usage = TokenUsage()
     try:
         result = analyze_digest(
-            start_date, end_date, timezone_name, entries_by_section, commits
+            start_date, end_date, timezone_name, entries_by_section, commits, usage
         )
     except Exception as error:
         reason = f"Claude analysis failed: {error}"
@@ -817,6 +1918,8 @@ def daily_mode(
             digest_ref=digest_ref,
             commits=commits,
             entries_by_section=entries_by_section,
+            timeline_entries=timeline_entries,
+            usage=usage,
             decision="failed",
             reason=reason,
         )
@@ -835,9 +1938,12 @@ def daily_mode(
             digest_ref=digest_ref,
             commits=commits,
             entries_by_section=entries_by_section,
+            timeline_entries=timeline_entries,
+            usage=usage,
             decision="skipped",
             reason=reason,
         )
+        record_window(state, window_id, "skipped", after_commit)
         return 0
 
     message = result.get("message", "").strip()
@@ -851,6 +1957,8 @@ def daily_mode(
             digest_ref=digest_ref,
             commits=commits,
             entries_by_section=entries_by_section,
+            timeline_entries=timeline_entries,
+            usage=usage,
             decision="failed",
             reason=reason,
         )
@@ -858,7 +1966,15 @@ def daily_mode(
         return 1
 
     title = create_digest_title(start_date, end_date, timezone_name)
-    payload = create_slack_payload(title, message, start_date, end_date, commits)
+    payload = create_slack_payload(
+        title,
+        message,
+        start_date,
+        end_date,
+        commits,
+        timeline_entries=timeline_entries,
+        repo_url=repo_url,
+    )
 
     if preview:
         print(f"{YELLOW}Preview mode enabled - Slack delivery skipped{NC}")
@@ -871,6 +1987,8 @@ def daily_mode(
             digest_ref=digest_ref,
             commits=commits,
             entries_by_section=entries_by_section,
+            timeline_entries=timeline_entries,
+            usage=usage,
             decision="previewed",
             reason=reason,
             message=message,
@@ -881,6 +1999,7 @@ def daily_mode(
     try:
         send_slack(payload)
         print("✅ Slack notification sent successfully")
+        record_window(state, window_id, "sent", after_commit)
         write_digest_summary(
             start_date=start_date,
             end_date=end_date,
@@ -888,6 +2007,8 @@ def daily_mode(
             digest_ref=digest_ref,
             commits=commits,
             entries_by_section=entries_by_section,
+            timeline_entries=timeline_entries,
+            usage=usage,
             decision="sent",
             reason=reason,
             message=message,
@@ -901,6 +2022,8 @@ def daily_mode(
             digest_ref=digest_ref,
             commits=commits,
             entries_by_section=entries_by_section,
+            timeline_entries=timeline_entries,
+            usage=usage,
             decision="failed",
             reason=f"Slack delivery failed: {error}",
             message=message,
@@ -909,6 +2032,358 @@ def daily_mode(
         return 1
 
 
+class DigestService:
+    """Keeps a pending digest current from push events, so a flush only sends it.
+
+    Each push replays just the new CHANGELOG.md commits into the timeline
+    index and refreshes the pending entries with a range lookup. Once no
+    event has arrived for `settle` seconds, the entries are analyzed in the
+    background and the result is stored with them for the next flush.
+    """
+
+    def __init__(
+        self,
+        pending_path: Path,
+        index_path: Path,
+        digest_ref: str,
+        timezone_name: str,
+        preview: bool,
+        fetch: bool,
+        settle: float,
+    ):
+        self.digest_ref = digest_ref
+        self.branch = digest_ref.removeprefix("origin/")
+        self.timezone_name = timezone_name
+        self.preview = preview
+        self.fetch = fetch
+        self.settle = settle
+        self.secret = os.environ.get("DIGEST_WEBHOOK_SECRET", "")
+        self.repo_url = build_repo_url()
+        self.lock = threading.Lock()
+        self.analysis_lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.changed = threading.Event()
+        self.commits: tuple[str, str, CommitLog] | None = None
+        self.timeline = ChangelogTimeline.load(index_path, digest_ref)
+        self.pending = load_pending(pending_path, digest_ref)
+        if not self.pending.base_commit:
+            tip = run_git(["rev-parse", digest_ref]).strip()
+            self.pending.base_commit = self.pending.tip_commit = tip
+            self.pending.since = get_commit_timestamp(tip)
+        self.timeline.update(self.pending.tip_commit)
+        self.timeline.save()
+        save_pending(self.pending)
+        if self.pending.analyzed_commit != self.pending.tip_commit:
+            self.changed.set()
+        threading.Thread(target=self.analyze_when_settled, daemon=True).start()
+
+    def verify_signature(self, body: bytes, signature: str) -> bool:
+        if not self.secret:
+            return True
+        expected = hmac.new(self.secret.encode(), body, hashlib.sha256).hexdigest()
+        return hmac.compare_digest(f"sha256={expected}", signature)
+
+    def handle_push(self, event: dict) -> tuple[int, str]:
+        if event.get("ref") != f"refs/heads/{self.branch}":
+            return 202, f"Ignored push to {event.get('ref')}"
+        after = str(event.get("after", ""))
+        if len(after) != 40 or after.strip("0123456789abcdef"):
+            return 400, "Push event has no valid `after` commit"
+        if self.fetch:
+            run_git(["fetch", "--quiet", "origin", self.branch], check=False)
+        if not commit_exists(after):
+            return 409, f"Commit {after[:7]} is not available locally"
+        with self.lock:
+            tip = self.pending.tip_commit
+            if after != tip and is_ancestor(after, tip):
+                return 202, f"Ignored push of {after[:7]}, already behind {tip[:7]}"
+            replayed = self.timeline.update(after)
+            self.timeline.save()
+            self.pending.tip_commit = after
+            self.pending.entries = self.timeline.query(
+                self.pending.since, get_commit_timestamp(after)
+            )
+            save_pending(self.pending)
+            entry_count = sum(len(items) for items in self.pending.entries.values())
+        self.changed.set()
+        debug(f"Push {after[:7]}: {replayed} CHANGELOG.md commit(s) replayed")
+        return 200, f"{entry_count} pending entries at {after[:7]}"
+
+    def digest_dates(
+        self, entries: dict[str, list[TimelineEntry]]
+    ) -> tuple[date, date]:
+        timezone = ZoneInfo(self.timezone_name)
+        stamps = [entry.added_at for items in entries.values() for entry in items]
+        if not stamps:
+            today = datetime.now(timezone).date()
+            return today, today
+        return (
+            datetime.fromtimestamp(min(stamps), timezone).date(),
+            datetime.fromtimestamp(max(stamps), timezone).date(),
+        )
+
+    def commit_log(self, base: str, tip: str) -> CommitLog:
+        """Commits between `base` and `tip`, shared by the analysis and flush."""
+        with self.lock:
+            if self.commits is None or self.commits[:2] != (base, tip):
+                self.commits = (base, tip, get_commits_since(base, tip, self.repo_url))
+            return self.commits[2]
+
+    def analyze_pending(self, usage: TokenUsage | None = None) -> None:
+        """Analyze the pending entries unless the stored result is current."""
+        with self.analysis_lock:
+            with self.lock:
+                tip = self.pending.tip_commit
+                if self.pending.analyzed_commit == tip:
+                    return
+                base = self.pending.base_commit
+                entries = self.pending.entries
+            entries_by_section = {
+                section: [entry.text for entry in items]
+                for section, items in entries.items()
+            }
+            if entries_by_section:
+                start_date, end_date = self.digest_dates(entries)
+                result = analyze_digest(
+                    start_date,
+                    end_date,
+                    self.timezone_name,
+                    entries_by_section,
+                    self.commit_log(base, tip),
+                    usage,
+                )
+            else:
+                result = {
+                    "should_notify": False,
+                    "message": "",
+                    "reason": "No CHANGELOG.md entries merged since the last digest",
+                }
+            with self.lock:
+                if self.pending.tip_commit == tip:
+                    self.pending.result = result
+                    self.pending.analyzed_commit = tip
+                    save_pending(self.pending)
+            debug(f"Pending digest analyzed at {tip[:7]}")
+
+    def analyze_when_settled(self) -> None:
+        while True:
+            self.changed.wait()
+            self.changed.clear()
+            while self.changed.wait(self.settle):
+                self.changed.clear()
+            try:
+                self.analyze_pending()
+            except Exception as error:
+                print(f"{RED}Background digest analysis failed: {error}{NC}")
+
+    def describe(self) -> dict:
+        with self.lock:
+            return {
+                "ref": self.digest_ref,
+                "base_commit": self.pending.base_commit,
+                "tip_commit": self.pending.tip_commit,
+                "entries": {
+                    section: [entry.text for entry in items]
+                    for section, items in self.pending.entries.items()
+                },
+                "analyzed": self.pending.analyzed_commit == self.pending.tip_commit,
+                "result": self.pending.result,
+            }
+
+    def flush(self, preview: bool) -> tuple[int, dict]:
+        """Send the pending digest and start a new one from the current tip.
+
+        Uses the precomputed analysis when it covers the tip; otherwise the
+        pending entries are analyzed first. Flushes run one at a time, so
+        concurrent requests cannot send the same digest twice; push events
+        are still handled while a flush waits on Claude or Slack.
+        """
+        with self.flush_lock:
+            return self._flush(preview)
+
+    def _flush(self, preview: bool) -> tuple[int, dict]:
+        usage = TokenUsage()
+        while True:
+            try:
+                self.analyze_pending(usage)
+            except Exception as error:
+                return 502, {
+                    "decision": "failed",
+                    "reason": f"Claude analysis failed: {error}",
+                }
+            with self.lock:
+                pending = self.pending
+                # A push handled during the analysis moves the tip; analyze
+                # again rather than flush entries without a result.
+                if pending.analyzed_commit != pending.tip_commit:
+                    continue
+                base, tip = pending.base_commit, pending.tip_commit
+                entries = pending.entries
+                result = pending.result or {}
+            break
+        start_date, end_date = self.digest_dates(entries)
+        entries_by_section = {
+            section: [entry.text for entry in items]
+            for section, items in entries.items()
+        }
+        commits = self.commit_log(base, tip)
+        message = result.get("message", "").strip()
+        reason = result.get("reason", "")
+        status = 200
+        if not result.get("should_notify") or not message:
+            decision = "skipped"
+        elif preview:
+            decision = "previewed"
+        else:
+            title = create_digest_title(start_date, end_date, self.timezone_name)
+            payload = create_slack_payload(
+                title,
+                message,
+                start_date,
+                end_date,
+                commits,
+                timeline_entries=entries,
+                repo_url=self.repo_url,
+            )
+            try:
+                send_slack(payload)
+                decision = "sent"
+            except Exception as error:
+                decision, status = "failed", 502
+                reason = f"Slack delivery failed: {error}"
+        write_digest_summary(
+            start_date=start_date,
+            end_date=end_date,
+            timezone_name=self.timezone_name,
+            digest_ref=self.digest_ref,
+            commits=commits,
+            entries_by_section=entries_by_section,
+            decision=decision,
+            reason=reason,
+            message=message,
+            timeline_entries=entries,
+            usage=usage,
+        )
+        if decision in ("sent", "skipped"):
+            with self.lock:
+                # Entries merged while the flush ran stay pending.
+                self.pending.base_commit = tip
+                self.pending.since = get_commit_timestamp(tip)
+                self.pending.entries = self.timeline.query(
+                    self.pending.since, get_commit_timestamp(self.pending.tip_commit)
+                )
+                self.pending.result = None
+                self.pending.analyzed_commit = ""
+                save_pending(self.pending)
+            self.changed.set()
+        print(f"Digest flush at {tip[:7]}: {decision} ({reason})")
+        return status, {"decision": decision, "reason": reason, "message": message}
+
+
+class DigestRequestHandler(BaseHTTPRequestHandler):
+    """POST /events (GitHub push webhooks), POST /flush, GET /pending."""
+
+    server: DigestServer
+
+    def do_GET(self) -> None:
+        if self.path == "/pending":
+            self.reply(200, self.server.service.describe())
+        else:
+            self.reply(404, {"message": "Not found"})
+
+    def do_POST(self) -> None:
+        service = self.server.service
+        length = int(self.headers.get("Content-Length", 0))
+        if length > SERVICE_MAX_EVENT_BYTES:
+            self.reply(413, {"message": "Event payload too large"})
+            return
+        body = self.rfile.read(length)
+        if not service.verify_signature(
+            body, self.headers.get("X-Hub-Signature-256", "")
+        ):
+            self.reply(401, {"message": "Invalid signature"})
+            return
+        path, _, query = self.path.partition("?")
+        try:
+            if path == "/events":
+                event_name = self.headers.get("X-GitHub-Event", "push")
+                if event_name == "ping":
+                    self.reply(200, {"message": "pong"})
+                elif event_name != "push":
+                    self.reply(202, {"message": f"Ignored {event_name} event"})
+                else:
+                    status, message = service.handle_push(json.loads(body))
+                    self.reply(status, {"message": message})
+            elif path == "/flush":
+                self.reply(*service.flush(service.preview or query == "preview=1"))
+            else:
+                self.reply(404, {"message": "Not found"})
+        except (json.JSONDecodeError, AttributeError):
+            self.reply(400, {"message": "Event payload is not a JSON object"})
+        except (RuntimeError, ValueError) as error:
+            self.reply(500, {"message": str(error)})
+
+    def reply(self, status: int, body: dict) -> None:
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format: str, *args) -> None:
+        debug(f"{self.address_string()} {format % args}")
+
+
+class DigestServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], service: DigestService):
+        super().__init__(address, DigestRequestHandler)
+        self.service = service
+
+
+def serve_mode(
+    listen: str,
+    pending_path: Path,
+    index_path: Path,
+    requested_ref: str | None,
+    timezone_name: str,
+    preview: bool,
+    fetch: bool,
+    settle: float,
+    insecure: bool,
+) -> int:
+    check_env(require_anthropic=True, require_slack=not preview)
+    host, _, port = listen.rpartition(":")
+    if not os.environ.get("DIGEST_WEBHOOK_SECRET"):
+        if not insecure:
+            raise ValueError(
+                "serve needs DIGEST_WEBHOOK_SECRET; use --insecure to accept "
+                "unsigned requests on a loopback address"
+            )
+        if host and host not in SERVICE_LOOPBACK_HOSTS:
+            raise ValueError(f"--insecure only listens on loopback, not {host}")
+        print(f"{YELLOW}Accepting unsigned requests (--insecure){NC}")
+    digest_ref = resolve_digest_ref(requested_ref)
+    service = DigestService(
+        pending_path, index_path, digest_ref, timezone_name, preview, fetch, settle
+    )
+    server = DigestServer((host or "127.0.0.1", int(port)), service)
+    print(
+        f"Digest service for {digest_ref} listening on "
+        f"http://{host or '127.0.0.1'}:{server.server_address[1]} "
+        "(POST /events, POST /flush, GET /pending)"
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
 def normalize_legacy_args(argv: list[str]) -> list[str]:
     if len(argv) == 2 and argv[1] == "--dry-run":
         return [argv[0], "dry-run"]
@@ -945,6 +2420,82 @@ def build_parser() -> argparse.ArgumentParser:
         dest="git_ref",
         help="Git ref to analyze. Defaults to origin/master when available, otherwise HEAD.",
     )
+    daily_parser.add_argument(
+        "--state",
+        dest="state_file",
+        default=os.environ.get("DIGEST_STATE_FILE"),
+        help="JSON file with the processed-commit watermark and handled digest windows",
+    )
+    daily_parser.add_argument(
+        "--index",
+        dest="index_file",
+        default=os.environ.get("DIGEST_INDEX_FILE"),
+        help="JSON file with the CHANGELOG.md entry timeline, updated on each run",
+    )
+    daily_parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Process the digest window even if the state file marks it as handled",
+    )
+
+    serve_parser = subparsers.add_parser(
+        "serve",
+        help="Keep a pending digest current from push events and send it on flush",
+    )
+    serve_parser.add_argument(
+        "--listen",
+        default="127.0.0.1:8787",
+        help="Address to listen on (default: 127.0.0.1:8787)",
+    )
+    serve_parser.add_argument(
+        "--pending",
+        dest="pending_file",
+        default=os.environ.get("DIGEST_PENDING_FILE"),
+        help="JSON file with the digest awaiting the next flush",
+    )
+    serve_parser.add_argument(
+        "--index",
+        dest="index_file",
+        default=os.environ.get("DIGEST_INDEX_FILE"),
+        help="JSON file with the CHANGELOG.md entry timeline",
+    )
+    serve_parser.add_argument(
+        "--ref",
+        dest="git_ref",
+        help="Git ref to follow. Defaults to origin/master when available, otherwise HEAD.",
+    )
+    serve_parser.add_argument(
+        "--timezone",
+        default=DEFAULT_TIMEZONE,
+        help=f"Digest time zone (default: {DEFAULT_TIMEZONE})",
+    )
+    serve_parser.add_argument(
+        "--fetch",
+        action="store_true",
+        help="Fetch the branch from origin before handling each push event",
+    )
+    serve_parser.add_argument(
+        "--settle",
+        type=float,
+        default=SERVICE_SETTLE_SECONDS,
+        help=(
+            "Seconds without events before the pending digest is analyzed "
+            f"(default: {SERVICE_SETTLE_SECONDS})"
+        ),
+    )
+    serve_parser.add_argument(
+        "--preview",
+        action="store_true",
+        help="Never post to Slack on flush",
+    )
+    serve_parser.add_argument(
+        "--insecure",
+        action="store_true",
+        help=(
+            "Accept unsigned requests when DIGEST_WEBHOOK_SECRET is not set "
+            "(loopback addresses only)"
+        ),
+    )
 
     subparsers.add_parser("dry-run", help="Validate script structure without API calls")
     subparsers.add_parser("test", help="Run offline changelog extraction tests")
@@ -968,6 +2519,27 @@ def main() -> None:
                     args.timezone,
                     args.preview,
                     args.git_ref,
+                    Path(args.state_file) if args.state_file else None,
+                    args.force,
+                    Path(args.index_file) if args.index_file else None,
+                )
+            )
+        if args.command == "serve":
+            if not args.pending_file or not args.index_file:
+                raise ValueError(
+                    "serve needs --pending and --index (or their env vars)"
+                )
+            sys.exit(
+                serve_mode(
+                    args.listen,
+                    Path(args.pending_file),
+                    Path(args.index_file),
+                    args.git_ref,
+                    args.timezone,
+                    args.preview,
+                    args.fetch,
+                    args.settle,
+                    args.insecure,
                 )
             )
     except ValueError as error:
@@ -0,0 +1,897 @@
+#!/usr/bin/env python3
+"""
+Offline record/replay harness for the daily Slack digest.
+
+Generates a fixture git repository with a CHANGELOG.md history, serves local
+stand-ins for the Anthropic messages endpoint and the Slack webhook, and runs
+`notify-slack-on-merge.py daily` against them for a range of dates.
+
+Usage:
+  replay-harness.py fixture DIR [--days 30] [--start 2026-01-05] [--seed 1]
+  replay-harness.py bench-parser [--lines 50000] [--repeat 20]
+  replay-harness.py stubs [--port 8788] [--latency 0.0] [--error-rate 0.0]
+  replay-harness.py events --upstream DIR --branch BRANCH --to REV --url URL
+                           [--interval 0.0] [--flush]
+  replay-harness.py run --repo DIR --from YYYY-MM-DD --to YYYY-MM-DD
+                        [--cassette FILE | --record FILE [--upstream URL]]
+                        [--latency 0.0] [--jitter 0.0] [--error-rate 0.0]
+                        [--error-status 529] [-- EXTRA_DAILY_ARGS...]
+
+Anthropic responses are synthesized from the prompt by default. With
+--record they are also written to a cassette, optionally fetched from a real
+endpoint with --upstream; Slack payloads are recorded but never forwarded.
+With --cassette, responses are replayed from the cassette, and any prompt or
+Slack payload that differs from the recording is reported as a regression.
+
+`stubs` serves the stand-ins on their own, for `notify-slack-on-merge.py
+serve`. `events` stands in for GitHub: it advances BRANCH in the upstream
+repository one first-parent commit at a time towards REV and posts a push
+event for each, signed with DIGEST_WEBHOOK_SECRET when it is set.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import hmac
+import importlib.util
+import json
+import os
+import random
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import urllib.error
+import urllib.request
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+CASSETTE_VERSION = 1
+DEFAULT_UPSTREAM_URL = "https://api.anthropic.com/v1/messages"
+FIXTURE_REMOTE_URL = "https://github.com/sparkfabrik/sparkdock.git"
+FIXTURE_AUTHORS = ["Ada Lovelace", "Grace Hopper", "Linus Torvalds", "Ken Thompson"]
+FIXTURE_SECTIONS = ["Added", "Changed", "Fixed", "Removed"]
+FIXTURE_TOPICS = [
+    "Lima VM defaults",
+    "Docker context switching",
+    "sjust recipes",
+    "menu bar app updates",
+    "Homebrew bundle",
+    "shell completions",
+    "HTTP proxy setup",
+    "Kubernetes tooling",
+]
+ENTRY_PATTERN = re.compile(r"^- (?:Added|Changed|Fixed|Removed|Deprecated|Security)\b")
+MESSAGES_PATH = "/v1/messages"
+SLACK_PATH = "/slack"
+
+# Colors (only apply if output is a TTY)
+if sys.stdout.isatty():
+    RED = "\033[0;31m"
+    GREEN = "\033[0;32m"
+    NC = "\033[0m"
+else:
+    RED = ""
+    GREEN = ""
+    NC = ""
+
+SCRIPT_DIR = Path(__file__).parent
+NOTIFIER = "notify-slack-on-merge.py"
+
+
+def request_key(body: bytes) -> str:
+    """Hash the parts of a messages request that decide the response."""
+    request = json.loads(body)
+    relevant = {
+        "model": request.get("model"),
+        "system": request.get("system"),
+        "messages": request.get("messages"),
+        "output_format": request.get("output_format"),
+    }
+    canonical = json.dumps(relevant, sort_keys=True).encode()
+    return hashlib.sha256(canonical).hexdigest()
+
+
+def payload_key(body: bytes) -> str:
+    canonical = json.dumps(json.loads(body), sort_keys=True).encode()
+    return hashlib.sha256(canonical).hexdigest()
+
+
+def synthesize_response(body: bytes) -> dict:
+    """Build a schema-valid messages response from the changelog entries in the prompt.
+
+    Token counts are estimated at four characters per token.
+    """
+    request = json.loads(body)
+    prompt = request["messages"][0]["content"]
+    system = sum(len(block["text"]) for block in request.get("system", []))
+    usage = {"input_tokens": (len(prompt) + system) // 4}
+    schema = request["output_format"]["schema"]
+    entries = [line for line in prompt.splitlines() if ENTRY_PATTERN.match(line)]
+    if "highlights" in schema["properties"]:
+        result = {"highlights": [entry[2:] for entry in entries[:5]], "omitted": 0}
+    elif entries:
+        result = {
+            "should_notify": True,
+            "message": "\n".join(f"• {entry[2:]}" for entry in entries),
+            "reason": f"{len(entries)} changelog entries in the window",
+        }
+    else:
+        result = {
+            "should_notify": False,
+            "message": "",
+            "reason": "No changelog entries in the window",
+        }
+    text = json.dumps(result)
+    usage["output_tokens"] = len(text) // 4
+    return {
+        "id": "msg_replay_harness",
+        "type": "message",
+        "role": "assistant",
+        "model": request.get("model"),
+        "content": [{"type": "text", "text": text}],
+        "stop_reason": "end_turn",
+        "usage": usage,
+    }
+
+
+@dataclass
+class Cassette:
+    """Recorded messages responses keyed by request, and the Slack payloads sent."""
+
+    path: Path
+    responses: dict[str, dict] = field(default_factory=dict)
+    payloads: dict[str, dict] = field(default_factory=dict)
+
+    @classmethod
+    def load(cls, path: Path) -> Cassette:
+        data = json.loads(path.read_text(encoding="utf-8"))
+        if data.get("version") != CASSETTE_VERSION:
+            raise ValueError(f"Unsupported cassette version in {path}")
+        return cls(path, data["responses"], data["payloads"])
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.write_text(
+            json.dumps(
+                {
+                    "version": CASSETTE_VERSION,
+                    "responses": self.responses,
+                    "payloads": self.payloads,
+                },
+                indent=1,
+                sort_keys=True,
+            ),
+            encoding="utf-8",
+        )
+
+
+@dataclass
+class StubBackend:
+    """Shared configuration and counters for the stand-in endpoints."""
+
+    latency: float = 0.0
+    jitter: float = 0.0
+    error_rate: float = 0.0
+    error_status: int = 529
+    cassette: Cassette | None = None
+    recording: bool = False
+    upstream_url: str = ""
+    seed: int = 1
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    rng: random.Random = field(init=False)
+    anthropic_calls: int = 0
+    anthropic_bytes: int = 0
+    slack_calls: int = 0
+    slack_bytes: int = 0
+    injected_errors: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    regressions: list[str] = field(default_factory=list)
+
+    def __post_init__(self) -> None:
+        self.rng = random.Random(self.seed)
+
+    def reset_counters(self) -> None:
+        with self.lock:
+            self.anthropic_calls = self.anthropic_bytes = 0
+            self.slack_calls = self.slack_bytes = 0
+            self.injected_errors = 0
+            self.input_tokens = self.output_tokens = 0
+
+    def delay_and_fail(self) -> bool:
+        """Sleep for the configured latency; return True to inject an error."""
+        with self.lock:
+            delay = self.latency + self.rng.uniform(-self.jitter, self.jitter)
+            fail = self.rng.random() < self.error_rate
+            if fail:
+                self.injected_errors += 1
+        time.sleep(max(0.0, delay))
+        return fail
+
+    def messages(self, body: bytes, headers: dict[str, str]) -> tuple[int, dict]:
+        with self.lock:
+            self.anthropic_calls += 1
+            self.anthropic_bytes += len(body)
+        if self.delay_and_fail():
+            return self.error_status, {
+                "type": "error",
+                "error": {"type": "overloaded_error", "message": "Injected error"},
+            }
+        key = request_key(body)
+        if self.cassette is not None and not self.recording:
+            response = self.cassette.responses.get(key)
+            if response is None:
+                with self.lock:
+                    self.regressions.append(f"prompt not in cassette ({key[:12]})")
+                return 500, {
+                    "type": "error",
+                    "error": {"type": "api_error", "message": "Not in cassette"},
+                }
+            status = 200
+        elif self.upstream_url:
+            status, response = forward_messages(self.upstream_url, body, headers)
+        else:
+            response = synthesize_response(body)
+            status = 200
+        if status == 200:
+            usage = response.get("usage", {})
+            with self.lock:
+                self.input_tokens += usage.get("input_tokens") or 0
+                self.output_tokens += usage.get("output_tokens") or 0
+                if self.recording and self.cassette is not None:
+                    self.cassette.responses[key] = response
+        return status, response
+
+    def slack(self, body: bytes) -> tuple[int, str]:
+        with self.lock:
+            self.slack_calls += 1
+            self.slack_bytes += len(body)
+        if self.delay_and_fail():
+            return 500, "internal_error"
+        if self.cassette is not None:
+            key = payload_key(body)
+            with self.lock:
+                if self.recording:
+                    self.cassette.payloads[key] = json.loads(body)
+                elif key not in self.cassette.payloads:
+                    title = json.loads(body).get("text", "")
+                    self.regressions.append(
+                        f"Slack payload changed ({title!r}, {key[:12]})"
+                    )
+        return 200, "ok"
+
+
+def forward_messages(
+    url: str, body: bytes, headers: dict[str, str]
+) -> tuple[int, dict]:
+    forwarded = {
+        name: value
+        for name, value in headers.items()
+        if name.lower()
+        in {"content-type", "x-api-key", "anthropic-version", "anthropic-beta"}
+    }
+    request = urllib.request.Request(url, data=body, headers=forwarded)
+    try:
+        with urllib.request.urlopen(request, timeout=180) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as error:
+        return error.code, json.loads(error.read() or b"{}")
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    server: StubServer
+
+    def do_POST(self) -> None:
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        backend = self.server.backend
+        if self.path == MESSAGES_PATH:
+            status, response = backend.messages(body, dict(self.headers))
+            self.reply(status, "application/json", json.dumps(response).encode())
+        elif self.path == SLACK_PATH:
+            status, text = backend.slack(body)
+            self.reply(status, "text/plain", text.encode())
+        else:
+            self.reply(404, "text/plain", b"not found")
+
+    def reply(self, status: int, content_type: str, data: bytes) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format: str, *args) -> None:
+        return
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, backend: StubBackend, port: int = 0):
+        super().__init__(("127.0.0.1", port), StubHandler)
+        self.backend = backend
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+def render_changelog(unreleased: dict[str, list[str]], releases: list[str]) -> str:
+    lines = [
+        "# Changelog",
+        "",
+        "All notable changes to this project will be documented in this file.",
+        "",
+        "## [Unreleased]",
+        "",
+    ]
+    for section in FIXTURE_SECTIONS:
+        if unreleased.get(section):
+            lines.extend([f"### {section}", "", *unreleased[section], ""])
+    return "\n".join(lines) + "".join(releases)
+
+
+def fast_import_commit(
+    mark: int, author: str, timestamp: int, message: str, path: str, content: str
+) -> bytes:
+    email = author.lower().replace(" ", ".") + "@example.com"
+    message_bytes = message.encode()
+    content_bytes = content.encode()
+    parts = [
+        b"commit refs/heads/master\n",
+        f"mark :{mark}\n".encode(),
+        f"author {author} <{email}> {timestamp} +0000\n".encode(),
+        f"committer {author} <{email}> {timestamp} +0000\n".encode(),
+        f"data {len(message_bytes)}\n".encode(),
+        message_bytes + b"\n",
+    ]
+    if mark > 1:
+        parts.append(f"from :{mark - 1}\n".encode())
+    parts.extend(
+        [
+            f"M 100644 inline {path}\n".encode(),
+            f"data {len(content_bytes)}\n".encode(),
+            content_bytes + b"\n",
+        ]
+    )
+    return b"".join(parts)
+
+
+def generate_fixture(
+    target: Path, days: int, start: date, seed: int, release_every: int
+) -> int:
+    """Create a repository with `days` weekdays of commits; return the commit count."""
+    rng = random.Random(seed)
+    unreleased: dict[str, list[str]] = {}
+    releases: list[str] = []
+    stream: list[bytes] = []
+    mark = 0
+    version = [1, 0, 0]
+    day = start
+    for day_number in range(days):
+        while day.weekday() >= 5:
+            day += timedelta(days=1)
+        base = int(datetime.combine(day, datetime.min.time(), timezone.utc).timestamp())
+        for slot in range(rng.randint(1, 5)):
+            mark += 1
+            author = rng.choice(FIXTURE_AUTHORS)
+            timestamp = base + (8 + slot * 2) * 3600 + rng.randint(0, 3599)
+            if mark == 1 or rng.random() < 0.6:
+                section = rng.choice(FIXTURE_SECTIONS)
+                entry = f"- {section} {rng.choice(FIXTURE_TOPICS)} (change {mark})"
+                unreleased.setdefault(section, []).insert(0, entry)
+                content = render_changelog(unreleased, releases)
+                stream.append(
+                    fast_import_commit(
+                        mark, author, timestamp, entry[2:], "CHANGELOG.md", content
+                    )
+                )
+            else:
+                stream.append(
+                    fast_import_commit(
+                        mark,
+                        author,
+                        timestamp,
+                        f"Refactor internals ({mark})",
+                        "src/app.txt",
+                        f"revision {mark}\n",
+                    )
+                )
+        if release_every and (day_number + 1) % release_every == 0 and unreleased:
+            mark += 1
+            version[1] += 1
+            heading = f"\n## [{'.'.join(map(str, version))}] - {day.isoformat()}\n"
+            body = "".join(
+                f"\n### {section}\n\n" + "\n".join(unreleased[section]) + "\n"
+                for section in FIXTURE_SECTIONS
+                if unreleased.get(section)
+            )
+            releases.insert(0, heading + body)
+            unreleased = {}
+            stream.append(
+                fast_import_commit(
+                    mark,
+                    FIXTURE_AUTHORS[0],
+                    base + 20 * 3600,
+                    f"Release {'.'.join(map(str, version))}",
+                    "CHANGELOG.md",
+                    render_changelog(unreleased, releases),
+                )
+            )
+        day += timedelta(days=1)
+
+    target.mkdir(parents=True, exist_ok=True)
+    subprocess.run(["git", "init", "-q", "-b", "master", str(target)], check=True)
+    subprocess.run(
+        ["git", "fast-import", "--quiet"],
+        cwd=target,
+        input=b"".join(stream),
+        check=True,
+    )
+    subprocess.run(["git", "reset", "-q", "--hard", "master"], cwd=target, check=True)
+    subprocess.run(
+        ["git", "remote", "add", "origin", FIXTURE_REMOTE_URL], cwd=target, check=True
+    )
+    return mark
+
+
+def install_notifier(repo: Path) -> Path:
+    """Copy the notifier, its prompts and the shared cache into the fixture.
+
+    Inside the fixture REPO_ROOT resolves to the fixture repository.
+    """
+    target = repo / "src" / "slack-notify"
+    if target.resolve() == SCRIPT_DIR.resolve():
+        return target / NOTIFIER
+    for source in (SCRIPT_DIR, SCRIPT_DIR.parent / "cache-store"):
+        copy = repo / "src" / source.name
+        shutil.rmtree(copy, ignore_errors=True)
+        shutil.copytree(source, copy, ignore=shutil.ignore_patterns("__pycache__"))
+    return target / NOTIFIER
+
+
+def read_decision(summary_path: Path) -> str:
+    try:
+        summary = summary_path.read_text(encoding="utf-8")
+    except OSError:
+        return "unknown"
+    match = re.search(r"\*\*Decision:\*\* (\S+)", summary)
+    return match.group(1) if match else "unknown"
+
+
+def run_digests(
+    repo: Path,
+    first: date,
+    last: date,
+    backend: StubBackend,
+    extra_args: list[str],
+) -> int:
+    notifier = install_notifier(repo)
+    server = StubServer(backend)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    env = {
+        name: value
+        for name, value in os.environ.items()
+        if not name.startswith("GITHUB_")
+    }
+    env.update(
+        {
+            "CLAUDE_API_URL": server.base_url + MESSAGES_PATH,
+            "SLACK_WEBHOOK_URL": server.base_url + SLACK_PATH,
+            "ANTHROPIC_API_KEY": env.get("ANTHROPIC_API_KEY") or "replay-harness",
+        }
+    )
+
+    timings: list[float] = []
+    failures = 0
+    print(
+        f"{'date':<12}{'exit':>5}{'decision':>11}{'seconds':>9}"
+        f"{'llm calls':>11}{'llm bytes':>11}{'tokens in/out':>15}"
+        f"{'slack bytes':>13}{'errors':>8}"
+    )
+    current = first
+    with tempfile.TemporaryDirectory() as scratch:
+        while current <= last:
+            summary_path = Path(scratch) / f"{current.isoformat()}.md"
+            env["GITHUB_STEP_SUMMARY"] = str(summary_path)
+            backend.reset_counters()
+            started = time.perf_counter()
+            result = subprocess.run(
+                [
+                    sys.executable,
+                    str(notifier),
+                    "daily",
+                    "--date",
+                    current.isoformat(),
+                    "--ref",
+                    "master",
+                    *extra_args,
+                ],
+                cwd=repo,
+                env=env,
+                capture_output=True,
+                text=True,
+                check=False,
+            )
+            elapsed = time.perf_counter() - started
+            timings.append(elapsed)
+            if result.returncode != 0:
+                failures += 1
+            print(
+                f"{current.isoformat():<12}{result.returncode:>5}"
+                f"{read_decision(summary_path):>11}{elapsed:>9.2f}"
+                f"{backend.anthropic_calls:>11}{backend.anthropic_bytes:>11}"
+                f"{f'{backend.input_tokens}/{backend.output_tokens}':>15}"
+                f"{backend.slack_bytes:>13}{backend.injected_errors:>8}"
+            )
+            current += timedelta(days=1)
+    server.shutdown()
+
+    if len(timings) > 1:
+        quantiles = statistics.quantiles(timings, n=20, method="inclusive")
+        print(
+            f"\n{len(timings)} run(s): median {statistics.median(timings):.2f}s, "
+            f"p95 {quantiles[-1]:.2f}s, max {max(timings):.2f}s, "
+            f"{failures} failed"
+        )
+    if backend.recording and backend.cassette is not None:
+        backend.cassette.save()
+        print(
+            f"Recorded {len(backend.cassette.responses)} response(s) and "
+            f"{len(backend.cassette.payloads)} Slack payload(s) to {backend.cassette.path}"
+        )
+    if backend.regressions:
+        print(
+            f"{RED}{len(backend.regressions)} regression(s) against the cassette:{NC}"
+        )
+        for regression in backend.regressions:
+            print(f"  - {regression}")
+        return 1
+    if backend.cassette is not None and not backend.recording:
+        print(f"{GREEN}All requests and Slack payloads match the cassette{NC}")
+    return 0
+
+
+def serve_stubs(port: int, backend: StubBackend) -> int:
+    server = StubServer(backend, port)
+    print(f"CLAUDE_API_URL={server.base_url}{MESSAGES_PATH}")
+    print(f"SLACK_WEBHOOK_URL={server.base_url}{SLACK_PATH}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+def post_event(url: str, body: bytes, event_name: str) -> tuple[int, dict, float]:
+    headers = {"Content-Type": "application/json", "X-GitHub-Event": event_name}
+    secret = os.environ.get("DIGEST_WEBHOOK_SECRET", "")
+    if secret:
+        digest = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+        headers["X-Hub-Signature-256"] = f"sha256={digest}"
+    request = urllib.request.Request(url, data=body, headers=headers)
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=600) as response:
+            status, data = response.status, response.read()
+    except urllib.error.HTTPError as error:
+        status, data = error.code, error.read()
+    return status, json.loads(data or b"{}"), time.perf_counter() - started
+
+
+def post_push_events(
+    upstream: Path, branch: str, target: str, url: str, interval: float, flush: bool
+) -> int:
+    """Advance `branch` towards `target` commit by commit, posting a push for each."""
+
+    def git(*args: str) -> str:
+        return subprocess.run(
+            ["git", *args], cwd=upstream, capture_output=True, text=True, check=True
+        ).stdout.strip()
+
+    current = git("rev-parse", f"refs/heads/{branch}")
+    log = git(
+        "log",
+        "--first-parent",
+        "--reverse",
+        "--format=%H%x1f%an%x1f%cI%x1f%s",
+        f"{current}..{target}",
+    )
+    base_url = url.rstrip("/")
+    failures = 0
+    for line in log.splitlines():
+        sha, author, committed_at, subject = line.split("\x1f")
+        git("update-ref", f"refs/heads/{branch}", sha, current)
+        event = {
+            "ref": f"refs/heads/{branch}",
+            "before": current,
+            "after": sha,
+            "commits": [
+                {
+                    "id": sha,
+                    "message": subject,
+                    "timestamp": committed_at,
+                    "author": {"name": author},
+                }
+            ],
+        }
+        status, reply, elapsed = post_event(
+            f"{base_url}/events", json.dumps(event).encode(), "push"
+        )
+        failures += status >= 400
+        print(
+            f"{sha[:7]} {status} {elapsed * 1000:7.1f} ms  {reply.get('message', '')}"
+        )
+        current = sha
+        time.sleep(interval)
+    if flush:
+        status, reply, elapsed = post_event(f"{base_url}/flush", b"", "flush")
+        failures += status >= 400
+        print(f"flush {status} {elapsed * 1000:7.1f} ms  {json.dumps(reply)}")
+    return 1 if failures else 0
+
+
+def load_notifier():
+    spec = importlib.util.spec_from_file_location("notifier", SCRIPT_DIR / NOTIFIER)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def build_long_changelog(line_count: int) -> str:
+    """A CHANGELOG.md with 30 unreleased entries and releases up to `line_count` lines."""
+    lines = ["# Changelog", "", "## [Unreleased]", "", "### Added", ""]
+    lines.extend(
+        f"- Added {FIXTURE_TOPICS[number % len(FIXTURE_TOPICS)]} (change {number})"
+        for number in range(30)
+    )
+    release = 0
+    while len(lines) < line_count:
+        release += 1
+        lines.extend(["", f"## [1.{release}.0] - 2020-01-01", "", "### Changed", ""])
+        lines.extend(
+            f"- Changed {topic} in release {release}\n  with a wrapped detail line"
+            for topic in FIXTURE_TOPICS
+        )
+    return "\n".join(lines[:line_count]) + "\n"
+
+
+def benchmark_parser(line_count: int, repeat: int) -> int:
+    """Compare reading the whole CHANGELOG.md blob with the streaming parser."""
+    notifier = load_notifier()
+    with tempfile.TemporaryDirectory() as scratch:
+        repo = Path(scratch)
+        subprocess.run(["git", "init", "-q", "-b", "master", scratch], check=True)
+        subprocess.run(
+            ["git", "fast-import", "--quiet"],
+            cwd=repo,
+            input=fast_import_commit(
+                1,
+                FIXTURE_AUTHORS[0],
+                0,
+                "Long changelog",
+                "CHANGELOG.md",
+                build_long_changelog(line_count),
+            ),
+            check=True,
+        )
+        notifier.REPO_ROOT = repo
+
+        def whole_file() -> dict[str, list[str]]:
+            text = subprocess.run(
+                ["git", "show", "master:CHANGELOG.md"],
+                cwd=repo,
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout
+            return notifier.parse_unreleased_entries(text)
+
+        def streamed() -> dict[str, list[str]]:
+            return notifier.get_unreleased_at_commit("master", "CHANGELOG.md").entries
+
+        if whole_file() != streamed():
+            print(f"{RED}Streaming and whole-file parsing disagree{NC}")
+            return 1
+        print(f"{line_count} CHANGELOG.md lines, {repeat} run(s) each")
+        for name, parse in (("whole file", whole_file), ("streaming", streamed)):
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                parse()
+                timings.append(time.perf_counter() - started)
+            tracemalloc.start()
+            parse()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(
+                f"  {name:<11} median {statistics.median(timings) * 1000:7.2f} ms, "
+                f"peak Python memory {peak / 1024:8.1f} KiB"
+            )
+    return 0
+
+
+def add_backend_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="Seconds added to every response"
+    )
+    parser.add_argument(
+        "--jitter", type=float, default=0.0, help="Random +/- seconds of latency"
+    )
+    parser.add_argument(
+        "--error-rate", type=float, default=0.0, help="Share of requests that fail"
+    )
+    parser.add_argument(
+        "--error-status", type=int, default=529, help="HTTP status of injected errors"
+    )
+    parser.add_argument("--seed", type=int, default=1)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Run the daily Slack digest offline against stand-in endpoints"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    fixture_parser = subparsers.add_parser(
+        "fixture", help="Generate a fixture repository with a CHANGELOG.md history"
+    )
+    fixture_parser.add_argument("directory", type=Path)
+    fixture_parser.add_argument(
+        "--days", type=int, default=30, help="Weekdays of history (default: 30)"
+    )
+    fixture_parser.add_argument(
+        "--start",
+        type=date.fromisoformat,
+        default=date(2026, 1, 5),
+        help="First day of history (default: 2026-01-05)",
+    )
+    fixture_parser.add_argument("--seed", type=int, default=1)
+    fixture_parser.add_argument(
+        "--release-every",
+        type=int,
+        default=10,
+        help="Cut a release every N days, 0 to never release (default: 10)",
+    )
+
+    bench_parser = subparsers.add_parser(
+        "bench-parser",
+        help="Benchmark the [Unreleased] parser on a long CHANGELOG.md",
+    )
+    bench_parser.add_argument(
+        "--lines", type=int, default=50000, help="CHANGELOG.md length (default: 50000)"
+    )
+    bench_parser.add_argument(
+        "--repeat", type=int, default=20, help="Runs per parser (default: 20)"
+    )
+
+    stubs_parser = subparsers.add_parser(
+        "stubs", help="Serve the Anthropic and Slack stand-ins until interrupted"
+    )
+    stubs_parser.add_argument("--port", type=int, default=8788)
+    add_backend_arguments(stubs_parser)
+
+    events_parser = subparsers.add_parser(
+        "events", help="Post GitHub-style push events while advancing a branch"
+    )
+    events_parser.add_argument("--upstream", type=Path, required=True)
+    events_parser.add_argument("--branch", required=True)
+    events_parser.add_argument(
+        "--to", dest="target", required=True, help="Commit to advance the branch to"
+    )
+    events_parser.add_argument(
+        "--url", default="http://127.0.0.1:8787", help="Digest service base URL"
+    )
+    events_parser.add_argument(
+        "--interval", type=float, default=0.0, help="Seconds between push events"
+    )
+    events_parser.add_argument(
+        "--flush", action="store_true", help="POST /flush after the last event"
+    )
+
+    run_parser = subparsers.add_parser(
+        "run", help="Run the digest for each date against the stand-in endpoints"
+    )
+    run_parser.add_argument("--repo", type=Path, required=True)
+    run_parser.add_argument(
+        "--from", dest="first", type=date.fromisoformat, required=True
+    )
+    run_parser.add_argument("--to", dest="last", type=date.fromisoformat)
+    source = run_parser.add_mutually_exclusive_group()
+    source.add_argument(
+        "--cassette", type=Path, help="Replay responses and check for regressions"
+    )
+    source.add_argument("--record", type=Path, help="Write a cassette of this run")
+    run_parser.add_argument(
+        "--upstream",
+        nargs="?",
+        const=DEFAULT_UPSTREAM_URL,
+        default="",
+        help=f"With --record, fetch real responses (default: {DEFAULT_UPSTREAM_URL})",
+    )
+    add_backend_arguments(run_parser)
+    run_parser.add_argument(
+        "daily_args",
+        nargs=argparse.REMAINDER,
+        help="Extra arguments for `daily` after --, e.g. -- --state state.json",
+    )
+    return parser
+
+
+def main() -> None:
+    args = build_parser().parse_args()
+    try:
+        if args.command == "fixture":
+            commits = generate_fixture(
+                args.directory, args.days, args.start, args.seed, args.release_every
+            )
+            print(f"Fixture repository with {commits} commit(s) at {args.directory}")
+            sys.exit(0)
+        if args.command == "bench-parser":
+            sys.exit(benchmark_parser(args.lines, args.repeat))
+        if args.command == "events":
+            sys.exit(
+                post_push_events(
+                    args.upstream,
+                    args.branch,
+                    args.target,
+                    args.url,
+                    args.interval,
+                    args.flush,
+                )
+            )
+        if args.command == "stubs":
+            sys.exit(
+                serve_stubs(
+                    args.port,
+                    StubBackend(
+                        latency=args.latency,
+                        jitter=args.jitter,
+                        error_rate=args.error_rate,
+                        error_status=args.error_status,
+                        seed=args.seed,
+                    ),
+                )
+            )
+        if args.upstream and not args.record:
+            raise ValueError("--upstream is only valid with --record")
+        cassette = None
+        if args.cassette:
+            cassette = Cassette.load(args.cassette)
+        elif args.record:
+            cassette = Cassette(args.record)
+        backend = StubBackend(
+            latency=args.latency,
+            jitter=args.jitter,
+            error_rate=args.error_rate,
+            error_status=args.error_status,
+            cassette=cassette,
+            recording=bool(args.record),
+            upstream_url=args.upstream,
+            seed=args.seed,
+        )
+        daily_args = [arg for arg in args.daily_args if arg != "--"]
+        sys.exit(
+            run_digests(
+                args.repo, args.first, args.last or args.first, backend, daily_args
+            )
+        )
+    except (OSError, ValueError, subprocess.CalledProcessError) as error:
+        print(f"{RED}Error: {error}{NC}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
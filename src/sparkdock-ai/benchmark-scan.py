@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""Benchmark the non-git repository scanner on a synthetic tree.
+
+Builds a temporary tree (default: 100k files) in which most files live in
+directories a real checkout would skip (`node_modules`, `.venv`, ignored build
+output), then compares the previous `rglob` walk with the scanner:
+
+  benchmark-scan.py [--files N] [--keep]
+"""
+
+import argparse
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from engine import MAX_CANDIDATES, SCAN_SUFFIXES
+from scanner import list_files, scan_files
+
+FILES_PER_DIR = 50
+SUFFIX_CYCLE = (".md", ".yml", ".sh", ".txt", ".json", ".zsh", ".py", ".just")
+
+
+def build_tree(root: Path, total: int) -> None:
+    """Spread `total` files over source, vendored, and ignored directories."""
+    (root / ".gitignore").write_text("build/\n*.log\n", encoding="utf-8")
+    areas = (("src", 0.2), ("node_modules", 0.4), (".venv", 0.2), ("build", 0.2))
+    written = 0
+    for area, share in areas:
+        count = int(total * share)
+        for index in range(count):
+            directory = (
+                root / area / f"pkg{index // 1000}" / f"mod{index // FILES_PER_DIR}"
+            )
+            if index % FILES_PER_DIR == 0:
+                directory.mkdir(parents=True, exist_ok=True)
+            suffix = SUFFIX_CYCLE[index % len(SUFFIX_CYCLE)]
+            (directory / f"file{index}{suffix}").write_bytes(b"x\n")
+        written += count
+    print(f"Synthetic tree: {written} files under {root}")
+
+
+def legacy_scan(root: Path) -> list:
+    """The walk used before the scanner existed."""
+    candidates = []
+    for path in root.rglob("*"):
+        if path.is_file() and path.suffix in SCAN_SUFFIXES:
+            candidates.append(str(path.relative_to(root)))
+    return candidates
+
+
+def timed(label: str, func) -> None:
+    started = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<34} {elapsed * 1000:9.1f} ms  {len(result):7d} files")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=100_000)
+    parser.add_argument(
+        "--keep", action="store_true", help="Keep the synthetic tree afterwards"
+    )
+    args = parser.parse_args()
+
+    root = Path(tempfile.mkdtemp(prefix="sparkdock-scan-"))
+    cache_path = root / ".sparkdock-ai" / "files.json"
+    try:
+        build_tree(root, args.files)
+        timed("rglob (previous fallback)", lambda: legacy_scan(root))
+        timed("scanner, full walk", lambda: scan_files(root, SCAN_SUFFIXES)[0])
+        timed(
+            f"scanner, stop at {MAX_CANDIDATES}",
+            lambda: scan_files(root, SCAN_SUFFIXES, MAX_CANDIDATES)[0],
+        )
+        timed(
+            "scanner, cold cache", lambda: list_files(root, SCAN_SUFFIXES, cache_path)
+        )
+        timed(
+            "scanner, warm cache", lambda: list_files(root, SCAN_SUFFIXES, cache_path)
+        )
+    finally:
+        if args.keep:
+            print(f"Tree kept at {root}")
+        else:
+            shutil.rmtree(root, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
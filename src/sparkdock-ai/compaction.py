@@ -0,0 +1,333 @@
+"""Meaning-preserving compaction of file excerpts before the answer prompt.
+
+Format-aware passes drop decorative comment banners, trailing whitespace,
+blank-line runs and table padding, fold simple YAML lists onto one line, and
+replace blocks already seen in an earlier file with a short reference.
+Regions where whitespace is content are left byte for byte: fenced and
+<pre> blocks in Markdown, heredoc bodies in scripts, and YAML block scalars.
+Markdown hard breaks (two trailing spaces) are kept.
+"""
+
+import hashlib
+import logging
+import re
+from typing import Callable, Dict, List, Set, Tuple
+
+LOGGER = logging.getLogger("sparkdock_ai")
+
+MIN_DUPLICATE_BLOCK_CHARS = 80
+YAML_BLOCK_KEY = re.compile(r"^(\s*)([A-Za-z0-9_.-]+):\s*$")
+YAML_LIST_ITEM = re.compile(r"^(\s*)- (\S.*)$")
+YAML_BLOCK_SCALAR = re.compile(r"^(\s*)\S.*[:-]\s+[|>][0-9+-]*\s*(#.*)?$")
+PLAIN_SCALAR = re.compile(r"^[A-Za-z0-9._/@+-][^#:{}\[\],]*$")
+QUOTED_SCALAR = re.compile(r"^(\"[^\"\\]*\"|'[^']*')$")
+BANNER_COMMENT = re.compile(r"^\s*(#|//)\s*[-=*#~_]{3,}\s*$")
+TABLE_CELL_PADDING = re.compile(r" {2,}\|")
+TABLE_RULE = re.compile(r"^\|?(\s*:?-{3,}:?\s*\|)+\s*:?-*:?\s*$")
+HEREDOC_START = re.compile(r"(?<!<)<<(?!<)(-?)\s*(['\"]?)([A-Za-z_][A-Za-z0-9_]*)\2")
+HARD_BREAK = "  "
+
+
+def _common_cleanup(lines: List[str], hard_breaks: bool = False) -> List[str]:
+    """Strip trailing whitespace and collapse runs of blank lines."""
+    cleaned: List[str] = []
+    for line in lines:
+        stripped = line.rstrip()
+        if hard_breaks and stripped and line.endswith(HARD_BREAK):
+            stripped += HARD_BREAK
+        if not stripped and cleaned and not cleaned[-1]:
+            continue
+        cleaned.append(stripped)
+    return cleaned
+
+
+def _compact_comments(lines: List[str]) -> List[str]:
+    """Drop banner lines made only of separator characters (`# ======`)."""
+    return [line for line in lines if not BANNER_COMMENT.match(line)]
+
+
+VerbatimFinder = Callable[[List[str]], Set[int]]
+LineCompactor = Callable[[List[str]], List[str]]
+
+
+def _compact_outside(
+    text: str, find_verbatim: VerbatimFinder, compact: LineCompactor
+) -> str:
+    """Apply `compact` to each run of lines outside the verbatim ones.
+
+    Verbatim lines are kept as they are, including blank lines at either end
+    of the file and the final line break when a verbatim region ends the file
+    (a YAML block scalar's value includes it).
+    """
+    lines = text.splitlines()
+    verbatim = find_verbatim(lines)
+    runs: List[Tuple[bool, List[str]]] = []
+    for index, line in enumerate(lines):
+        keep = index in verbatim
+        if runs and runs[-1][0] == keep:
+            runs[-1][1].append(line)
+        else:
+            runs.append((keep, [line]))
+    output: List[Tuple[bool, str]] = []
+    for keep, run in runs:
+        output.extend((keep, line) for line in (run if keep else compact(run)))
+    while output and not output[0][0] and not output[0][1].strip():
+        output.pop(0)
+    while output and not output[-1][0] and not output[-1][1].strip():
+        output.pop()
+    compacted = "\n".join(line for _keep, line in output)
+    if output and output[-1][0] and text.endswith("\n"):
+        compacted += "\n"
+    return compacted
+
+
+def _no_verbatim(lines: List[str]) -> Set[int]:
+    return set()
+
+
+def _markdown_verbatim(lines: List[str]) -> Set[int]:
+    """Indexes of fenced code and <pre> block lines, fences included."""
+    verbatim: Set[int] = set()
+    fence = ""
+    in_pre = False
+    for index, line in enumerate(lines):
+        stripped = line.lstrip()
+        if fence:
+            verbatim.add(index)
+            if stripped.startswith(fence):
+                fence = ""
+        elif stripped.startswith(("```", "~~~")):
+            fence = stripped[:3]
+            verbatim.add(index)
+        elif in_pre or stripped.lower().startswith("<pre"):
+            verbatim.add(index)
+            in_pre = "</pre>" not in line.lower()
+    return verbatim
+
+
+def _heredoc_verbatim(lines: List[str]) -> Set[int]:
+    """Indexes of heredoc body lines (between `<<EOF` and `EOF`)."""
+    verbatim: Set[int] = set()
+    index = 0
+    while index < len(lines):
+        start = HEREDOC_START.search(lines[index])
+        index += 1
+        if not start:
+            continue
+        strip_tabs, delimiter = start.group(1), start.group(3)
+        while index < len(lines):
+            body = lines[index].lstrip("\t") if strip_tabs else lines[index]
+            if body == delimiter:
+                break
+            verbatim.add(index)
+            index += 1
+    return verbatim
+
+
+def _yaml_verbatim(lines: List[str]) -> Set[int]:
+    """Indexes of block scalar bodies (`key: |` and `key: >` contents)."""
+    verbatim: Set[int] = set()
+    index = 0
+    while index < len(lines):
+        header = YAML_BLOCK_SCALAR.match(lines[index])
+        index += 1
+        if not header:
+            continue
+        indent = len(header.group(1))
+        while index < len(lines):
+            line = lines[index]
+            if line.strip() and len(line) - len(line.lstrip()) <= indent:
+                break
+            verbatim.add(index)
+            index += 1
+    return verbatim
+
+
+def _compact_markdown_lines(lines: List[str]) -> List[str]:
+    compacted = []
+    for line in lines:
+        if line.lstrip().startswith("|"):
+            if TABLE_RULE.match(line.strip()):
+                line = re.sub(r"-{3,}", "---", line.replace(" ", ""))
+            else:
+                line = TABLE_CELL_PADDING.sub(" |", line)
+        compacted.append(line)
+    return _common_cleanup(compacted, hard_breaks=True)
+
+
+def compact_markdown(text: str) -> str:
+    return _compact_outside(text, _markdown_verbatim, _compact_markdown_lines)
+
+
+def _flow_scalar(line: str) -> str:
+    """Return the list item as a flow scalar, or "" when it cannot be folded."""
+    match = YAML_LIST_ITEM.match(line)
+    if not match:
+        return ""
+    value = match.group(2).strip()
+    if value.startswith(("'", '"')):
+        return value if QUOTED_SCALAR.match(value) else ""
+    if PLAIN_SCALAR.match(value):
+        return value
+    return ""
+
+
+def compact_yaml(text: str) -> str:
+    """Fold block sequences of scalars into flow sequences.
+
+    `key:` followed by `- a`, `- b`, ... becomes `key: [a, b, ...]`; comments
+    inside the list stay on their own lines, which flow sequences allow, so
+    the document still parses to the same data.
+    """
+    return _compact_outside(text, _yaml_verbatim, _fold_yaml_lists)
+
+
+def _fold_yaml_lists(lines: List[str]) -> List[str]:
+    lines = _compact_comments(_common_cleanup(lines))
+    output: List[str] = []
+    index = 0
+    while index < len(lines):
+        line = lines[index]
+        key = YAML_BLOCK_KEY.match(line)
+        if not key:
+            output.append(line)
+            index += 1
+            continue
+        segments: List[List[str]] = []
+        items = 0
+        cursor = index + 1
+        while cursor < len(lines):
+            candidate = lines[cursor]
+            stripped = candidate.strip()
+            if stripped.startswith("#"):
+                segments.append(["#", stripped])
+            elif stripped:
+                scalar = _flow_scalar(candidate)
+                if not scalar:
+                    break
+                if not segments or segments[-1][0] == "#":
+                    segments.append([])
+                segments[-1].append(scalar)
+                items += 1
+            cursor += 1
+        while segments and segments[-1][0] == "#":
+            segments.pop()
+            cursor -= 1
+        key_indent = len(key.group(1))
+        if items < 3 or (
+            cursor < len(lines)
+            and len(lines[cursor]) - len(lines[cursor].lstrip()) > key_indent
+        ):
+            output.append(line)
+            index += 1
+            continue
+        indent = key.group(1) + "  "
+        output.append(f"{key.group(1)}{key.group(2)}: [")
+        remaining = items
+        for segment in segments:
+            if segment[0] == "#":
+                output.append(f"{indent}{segment[1]}")
+                continue
+            remaining -= len(segment)
+            separator = "," if remaining else ""
+            output.append(f"{indent}{', '.join(segment)}{separator}")
+        output.append(f"{key.group(1)}]")
+        index = cursor
+    return output
+
+
+def _compact_script_lines(lines: List[str]) -> List[str]:
+    return _compact_comments(_common_cleanup(lines))
+
+
+def compact_script(text: str) -> str:
+    """Compact shell, zsh and just sources while keeping indentation intact."""
+    return _compact_outside(text, _heredoc_verbatim, _compact_script_lines)
+
+
+def _format_passes(path: str) -> Tuple[VerbatimFinder, LineCompactor]:
+    if path.endswith(".md"):
+        return _markdown_verbatim, _compact_markdown_lines
+    if path.endswith((".yml", ".yaml")):
+        return _yaml_verbatim, _fold_yaml_lists
+    if (
+        path.endswith((".sh", ".zsh", ".just", ".bash"))
+        or "." not in path.rsplit("/", 1)[-1]
+    ):
+        return _heredoc_verbatim, _compact_script_lines
+    return _no_verbatim, _common_cleanup
+
+
+def compact_text(path: str, text: str) -> str:
+    return _compact_outside(text, *_format_passes(path))
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _dedupe_blocks(path: str, text: str, seen_blocks: Dict[str, str]) -> str:
+    """Compact `text` and replace blocks already seen in an earlier file."""
+    find_verbatim, compact = _format_passes(path)
+    lines = _compact_outside(text, find_verbatim, compact).split("\n")
+    verbatim = find_verbatim(lines)
+    output: List[str] = []
+    block: List[str] = []
+    dedupable = True
+
+    def flush() -> None:
+        content = "\n".join(block)
+        if dedupable and len(content) >= MIN_DUPLICATE_BLOCK_CHARS:
+            block_hash = _digest(content.strip())
+            if block_hash in seen_blocks:
+                output.append(f"[repeated block, see {seen_blocks[block_hash]}]")
+                return
+            seen_blocks[block_hash] = path
+        output.extend(block)
+
+    for index, line in enumerate(lines):
+        if index not in verbatim and not line.strip():
+            flush()
+            output.append(line)
+            block, dedupable = [], True
+            continue
+        block.append(line)
+        dedupable = dedupable and index not in verbatim
+    flush()
+    return "\n".join(output)
+
+
+def compact_files(
+    files: List[Tuple[str, str]],
+) -> Tuple[List[Tuple[str, str]], Dict[str, int]]:
+    """Compact each file and deduplicate repeated content across files.
+
+    Identical files are replaced by a pointer to the first copy, and blocks
+    (paragraphs separated by blank lines) already emitted by an earlier file
+    are replaced by a one-line reference. Blocks that touch a verbatim region
+    (code fences, heredocs, block scalars) are never replaced. Returns the
+    compacted files and before/after character counts.
+    """
+    seen_files: Dict[str, str] = {}
+    seen_blocks: Dict[str, str] = {}
+    compacted: List[Tuple[str, str]] = []
+    before = sum(len(text) for _path, text in files)
+
+    for path, text in files:
+        file_hash = _digest(text)
+        if file_hash in seen_files:
+            compacted.append((path, f"[identical to {seen_files[file_hash]}]"))
+            continue
+        seen_files[file_hash] = path
+
+        compacted.append((path, _dedupe_blocks(path, text, seen_blocks)))
+
+    after = sum(len(text) for _path, text in compacted)
+    stats = {"before": before, "after": after}
+    LOGGER.info(
+        "Context compaction: %d -> %d chars (ratio %.2f)",
+        before,
+        after,
+        after / before if before else 1.0,
+    )
+    return compacted, stats
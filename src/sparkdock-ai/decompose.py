@@ -0,0 +1,121 @@
+"""Local decomposition of compound questions into independent sub-questions.
+
+"How do I install Sparkdock, switch to Lima and enable the shell" asks three
+things that need different files. Splitting it lets each part get its own
+file selection and focused context, and the parts run concurrently. The
+split is conservative: every part must still read as a question of its own,
+otherwise the question is answered whole.
+"""
+
+import re
+from typing import List
+
+MAX_SUB_QUESTIONS = 4
+MIN_PART_WORDS = 3
+MIN_PREDICATE_WORDS = 2
+SENTENCE_SPLIT = re.compile(r"(?<=\?)\s+|\s*;\s*")
+CLAUSE_SPLIT = re.compile(
+    r"\s*,\s*(?:and\s+(?:then\s+)?|then\s+)?|\s+(?:and\s+then|and\s+also|and|then)\s+",
+    re.IGNORECASE,
+)
+QUESTION_PREFIX = re.compile(
+    r"^(how\s+(?:do|can|should|would)\s+(?:i|we|you)|how\s+to|"
+    r"(?:can|could|should)\s+(?:i|we|you)|where\s+(?:do|can)\s+(?:i|we|you)|"
+    r"what\s+(?:is|are|does|do))\b\s*",
+    re.IGNORECASE,
+)
+QUESTION_WORDS = frozenset(
+    "how what where why which when who can could should do does is are".split()
+)
+BACK_REFERENCES = frozenset("it its that this those these them there".split())
+# Words that continue a noun phrase rather than start a new verb phrase:
+# "install Docker and the Lima runtime" coordinates objects, not questions.
+NOUN_PHRASE_STARTS = frozenset(
+    "a an the my your our their all some any of in on for to with from".split()
+)
+WORD_PATTERN = re.compile(r"[A-Za-z0-9][A-Za-z0-9_.-]*")
+
+
+def _predicate_words(part: str) -> List[str]:
+    """Words of a part after its question prefix ("how do I", "what is")."""
+    prefix_match = QUESTION_PREFIX.match(part)
+    if prefix_match:
+        return WORD_PATTERN.findall(part[prefix_match.end() :])
+    words = WORD_PATTERN.findall(part)
+    if words and words[0].lower() in QUESTION_WORDS:
+        return words[1:]
+    return words
+
+
+def _split_clauses(sentence: str) -> List[str]:
+    """Split a sentence on conjunctions only where each side is a full clause.
+
+    Text after a conjunction starts a new clause when it opens with a question
+    word, or with a verb phrase after a "how do I"-style prefix. Coordinated
+    nouns ("the pros and cons of Lima") and verbs sharing one object ("copy
+    and paste in the terminal") leave the sentence whole.
+    """
+    sentence = sentence.strip().rstrip("?").strip()
+    if "`" in sentence or '"' in sentence:
+        # Quoted commands may contain commas or "and"; keep them intact.
+        return [sentence]
+    clauses = [part for part in CLAUSE_SPLIT.split(sentence) if part]
+    if len(clauses) < 2:
+        return [sentence]
+    prefix_match = QUESTION_PREFIX.match(clauses[0])
+    prefix = prefix_match.group(1) if prefix_match else ""
+    parts = [clauses[0]]
+    for clause in clauses[1:]:
+        first_word = clause.split(None, 1)[0].lower()
+        if first_word not in QUESTION_WORDS:
+            if prefix.lower().startswith("what") or first_word in NOUN_PHRASE_STARTS:
+                return [sentence]
+            if prefix:
+                clause = f"{prefix} {clause}"
+        parts.append(clause)
+    if any(
+        len(WORD_PATTERN.findall(part)) < MIN_PART_WORDS
+        or len(_predicate_words(part)) < MIN_PREDICATE_WORDS
+        for part in parts
+    ):
+        return [sentence]
+    return parts
+
+
+def _as_question(part: str) -> str:
+    part = f"{part[0].upper()}{part[1:]}"
+    if part.split(None, 1)[0].lower() in QUESTION_WORDS:
+        return f"{part}?"
+    return part
+
+
+def split_question(question: str, stopwords: frozenset = frozenset()) -> List[str]:
+    """Return the sub-questions of a compound question, or [question].
+
+    A split is kept only when there are at most MAX_SUB_QUESTIONS parts, no
+    later part refers back to an earlier one ("...and then enable it"), and
+    each part has a content word that the other parts do not share.
+    """
+    parts: List[str] = []
+    for sentence in SENTENCE_SPLIT.split(question.strip()):
+        if sentence.strip():
+            parts.extend(_split_clauses(sentence))
+    if not 2 <= len(parts) <= MAX_SUB_QUESTIONS:
+        return [question]
+
+    words = [[item.lower() for item in WORD_PATTERN.findall(part)] for part in parts]
+    if any(BACK_REFERENCES.intersection(part_words) for part_words in words[1:]):
+        return [question]
+    terms = [
+        {
+            word
+            for word in part_words
+            if word not in stopwords and word not in QUESTION_WORDS
+        }
+        for part_words in words
+    ]
+    for index, own in enumerate(terms):
+        others = set().union(*(terms[:index] + terms[index + 1 :]))
+        if not own - others:
+            return [question]
+    return [_as_question(part) for part in parts]
@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+"""Build the Sparkdock AI repository digest.
+
+The digest stores a compact summary and keyword list for every tracked file,
+keyed by git blob SHA so unchanged files are never summarized twice. Run it
+after a Sparkdock update; the engine picks the result up automatically.
+
+Usage:
+  digest.py [--root PATH] [--model MODEL] [--force]
+"""
+
+import argparse
+import asyncio
+import json
+import re
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from engine import (
+    LOGGER,
+    STOPWORDS,
+    SparkdockAIError,
+    determine_root,
+    digest_path,
+    ensure_dependency,
+    git_blob_sha,
+    invoke_llm,
+    load_prompt,
+    render_prompt,
+    run_subprocess,
+)
+
+DIGEST_VERSION = 1
+SUMMARY_CHARS = 240
+KEYWORD_COUNT = 8
+SUMMARY_SOURCE_CHARS = 12000
+MODEL_CONCURRENCY = 4
+TEXT_SUFFIXES = (
+    ".md",
+    ".yml",
+    ".yaml",
+    ".zsh",
+    ".sh",
+    ".swift",
+    ".just",
+    ".txt",
+    ".json",
+    ".toml",
+    ".mjs",
+    ".py",
+)
+SYNTAX_WORDS = frozenset("""
+    then else elif done esac echo local printf return def str self true false
+    none null http https www com org github alias function export set name
+    """.split())
+
+
+def list_tracked_files(root: Path) -> List[Tuple[str, str]]:
+    """Return (path, blob sha) pairs for every file worth summarizing."""
+    entries: List[Tuple[str, str]] = []
+    if (root / ".git").exists():
+        result = run_subprocess(["git", "ls-files", "-s"], cwd=root)
+        if result.returncode == 0:
+            for line in result.stdout.splitlines():
+                meta, _, path = line.partition("\t")
+                parts = meta.split()
+                if len(parts) == 3 and path:
+                    entries.append((path, parts[1]))
+    if not entries:
+        for path in sorted(root.rglob("*")):
+            if path.is_file() and ".git" not in path.parts:
+                entries.append(
+                    (str(path.relative_to(root)), git_blob_sha(path.read_bytes()))
+                )
+    return [
+        (path, sha)
+        for path, sha in entries
+        if path.endswith(TEXT_SUFFIXES) or "." not in path.rsplit("/", 1)[-1]
+    ]
+
+
+def extract_keywords(text: str, limit: int = KEYWORD_COUNT) -> List[str]:
+    words = re.findall(r"[A-Za-z][A-Za-z0-9_-]{2,}", text)
+    counts = Counter(
+        word.lower()
+        for word in words
+        if word.lower() not in STOPWORDS and word.lower() not in SYNTAX_WORDS
+    )
+    return [word for word, _count in counts.most_common(limit)]
+
+
+def _clip(text: str) -> str:
+    text = " ".join(text.split())
+    if len(text) > SUMMARY_CHARS:
+        return text[: SUMMARY_CHARS - 1].rstrip() + "…"
+    return text
+
+
+def _summarize_markdown(text: str) -> str:
+    headings = re.findall(r"^#{1,3}\s+(.+)$", text, flags=re.MULTILINE)
+    paragraph = ""
+    for block in re.split(r"\n\s*\n", text):
+        block = block.strip()
+        if block and not block.startswith(("#", "```", "|", "<", "!", "[!")):
+            paragraph = block
+            break
+    lead = headings[0] if headings else ""
+    sections = ", ".join(headings[1:6])
+    return " ".join(
+        part
+        for part in (
+            lead + ".",
+            paragraph,
+            f"Sections: {sections}." if sections else "",
+        )
+        if part != "."
+    )
+
+
+def _summarize_just(text: str) -> str:
+    recipes = []
+    lines = text.splitlines()
+    for index, line in enumerate(lines):
+        match = re.match(r"^([a-zA-Z0-9_-]+)(\s+[^:=]*)?:(?!=)", line)
+        if not match:
+            continue
+        doc = (
+            lines[index - 1].lstrip("# ").strip()
+            if index and lines[index - 1].startswith("#")
+            else ""
+        )
+        recipes.append(f"{match.group(1)} ({doc})" if doc else match.group(1))
+    if not recipes:
+        return _summarize_comments(text)
+    return f"Just recipes: {', '.join(recipes)}."
+
+
+def _summarize_yaml(text: str) -> str:
+    keys = re.findall(r"^([A-Za-z0-9_-]+):", text, flags=re.MULTILINE)
+    names = re.findall(r"^\s*-?\s*name:\s*[\"']?([^\"'\n]+)", text, flags=re.MULTILINE)
+    parts = []
+    if keys:
+        parts.append(f"Top-level keys: {', '.join(dict.fromkeys(keys))}.")
+    if names:
+        parts.append(f"Names: {', '.join(list(dict.fromkeys(names))[:12])}.")
+    return " ".join(parts) or _summarize_comments(text)
+
+
+def _summarize_shell(text: str) -> str:
+    functions = re.findall(
+        r"^(?:function\s+)?([A-Za-z_][A-Za-z0-9_-]*)\s*\(\)", text, flags=re.MULTILINE
+    )
+    aliases = re.findall(r"^\s*alias\s+([^=\s]+)=", text, flags=re.MULTILINE)
+    parts = [_summarize_comments(text)]
+    if functions:
+        parts.append(f"Functions: {', '.join(dict.fromkeys(functions))}.")
+    if aliases:
+        parts.append(f"Aliases: {', '.join(dict.fromkeys(aliases))}.")
+    return " ".join(part for part in parts if part)
+
+
+def _summarize_comments(text: str) -> str:
+    comments = []
+    for line in text.splitlines():
+        stripped = line.strip()
+        if stripped.startswith("#!"):
+            continue
+        if stripped.startswith(("#", "//")):
+            comment = stripped.lstrip("#/ ").strip()
+            if comment and not set(comment) <= set("-=*#"):
+                comments.append(comment)
+        elif stripped and comments:
+            break
+        if len(comments) >= 3:
+            break
+    return " ".join(comments)
+
+
+def summarize_locally(path: str, text: str) -> Dict[str, object]:
+    """Extractive summary that needs no model access."""
+    if path.endswith(".md"):
+        summary = _summarize_markdown(text)
+    elif path.endswith(".just"):
+        summary = _summarize_just(text)
+    elif path.endswith((".yml", ".yaml")):
+        summary = _summarize_yaml(text)
+    elif path.endswith((".sh", ".zsh")) or "." not in path.rsplit("/", 1)[-1]:
+        summary = _summarize_shell(text)
+    else:
+        summary = _summarize_comments(text)
+    if not summary.strip():
+        summary = next((line.strip() for line in text.splitlines() if line.strip()), "")
+    return {"summary": _clip(summary), "keywords": extract_keywords(text)}
+
+
+async def summarize_with_model(
+    path: str, text: str, model: str
+) -> Optional[Dict[str, object]]:
+    prompt_body = render_prompt(
+        load_prompt("file-summary-template.txt"),
+        PATH=path,
+        CONTENT=text[:SUMMARY_SOURCE_CHARS],
+    )
+    result = await invoke_llm(
+        model=model,
+        system_prompt=load_prompt("file-summary-system.txt"),
+        prompt_body=prompt_body,
+        max_tokens=256,
+        stage="summary",
+    )
+    if result.returncode != 0:
+        LOGGER.warning("Model summary failed for %s: %s", path, result.stderr.strip())
+        return None
+    try:
+        data = json.loads(result.stdout.strip())
+    except json.JSONDecodeError:
+        LOGGER.warning("Model summary for %s was not valid JSON", path)
+        return None
+    if not isinstance(data, dict) or not isinstance(data.get("summary"), str):
+        return None
+    keywords = [str(item).lower() for item in data.get("keywords", []) if item]
+    return {"summary": _clip(data["summary"]), "keywords": keywords[:KEYWORD_COUNT]}
+
+
+def load_existing(path: Path) -> Dict[str, dict]:
+    """Return previous digest entries indexed by blob SHA."""
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+    if data.get("version") != DIGEST_VERSION:
+        return {}
+    return {entry["sha"]: entry for entry in data.get("files", {}).values()}
+
+
+async def build_digest(
+    root: Path, model: Optional[str] = None, force: bool = False
+) -> dict:
+    """Summarize new or changed files; model summaries run concurrently."""
+    output_path = digest_path(root)
+    previous = {} if force else load_existing(output_path)
+    files: Dict[str, dict] = {}
+    pending: List[Tuple[str, str, str]] = []
+    reused = 0
+    for relative, sha in list_tracked_files(root):
+        file_path = root / relative
+        if not file_path.is_file():
+            continue
+        cached = previous.get(sha)
+        if cached and (model is None or cached.get("model") == model):
+            stat = file_path.stat()
+            files[relative] = {
+                **cached,
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+            }
+            reused += 1
+            continue
+        pending.append(
+            (relative, sha, file_path.read_text(encoding="utf-8", errors="ignore"))
+        )
+
+    semaphore = asyncio.Semaphore(MODEL_CONCURRENCY)
+
+    async def _summarize(relative: str, text: str) -> Optional[Dict[str, object]]:
+        if not model:
+            return None
+        async with semaphore:
+            return await summarize_with_model(relative, text, model)
+
+    summaries = await asyncio.gather(
+        *(_summarize(relative, text) for relative, _sha, text in pending)
+    )
+    for (relative, sha, text), entry in zip(pending, summaries):
+        if entry is None:
+            entry = summarize_locally(relative, text)
+        stat = (root / relative).stat()
+        entry.update(
+            {
+                "sha": sha,
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+                "model": model if model else None,
+            }
+        )
+        files[relative] = entry
+
+    digest = {
+        "version": DIGEST_VERSION,
+        "generated_at": int(time.time()),
+        "files": files,
+    }
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = output_path.with_suffix(".tmp")
+    tmp_path.write_text(json.dumps(digest, indent=1, sort_keys=True), encoding="utf-8")
+    tmp_path.replace(output_path)
+    LOGGER.info(
+        "Repository digest written to %s (files=%d, reused=%d)",
+        output_path,
+        len(files),
+        reused,
+    )
+    return digest
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Build the Sparkdock AI repository digest"
+    )
+    parser.add_argument(
+        "--root",
+        default=None,
+        help="Root directory of the Sparkdock repository (defaults to auto-detect)",
+    )
+    parser.add_argument(
+        "--model",
+        default=None,
+        help="Summarize new files with this llm model instead of the local extractor",
+    )
+    parser.add_argument(
+        "--force", action="store_true", help="Ignore the existing digest and rebuild"
+    )
+    args = parser.parse_args()
+
+    try:
+        root = determine_root(args.root)
+        if args.model:
+            ensure_dependency("llm")
+        digest = asyncio.run(build_digest(root, model=args.model, force=args.force))
+    except SparkdockAIError as err:
+        print(err, file=sys.stderr)
+        return 1
+
+    print(f"Digest updated: {len(digest['files'])} files ({digest_path(root)})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
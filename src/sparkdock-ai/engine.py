@@ -1,28 +1,132 @@
 #!/usr/bin/env python3
 
 import argparse
+import asyncio
+import codecs
+import contextvars
+import fcntl
+import hashlib
+import io
 import json
 import logging
+import mmap
 import os
 import re
+import shlex
 import shutil
 import subprocess
 import sys
 import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache
 from pathlib import Path
-from typing import Iterable, List, Optional
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "cache-store"))
+
+from cachestore import CacheStore, open_store  # noqa: E402
+from compaction import compact_files, compact_yaml
+from decompose import split_question
+from extractive import find_extractive_answer
+from facts import build_fact_index, load_fact_index, match_facts
+from predictor import FilePredictor
+from router import choose_model, parse_model_tiers, required_tier
+from scanner import list_files
+from structured import (
+    ROUTING_FORMAT,
+    SELECTION_FORMAT,
+    FallbackCounter,
+    parse_routing,
+    parse_selection,
+    routing_schema,
+    selection_schema,
+)
 
 CLASSIFIER_MODEL = "gpt-3.5-turbo"
 CONTEXT_MODEL = "gpt-4.1-nano"
 DIRECT_MODEL = "gpt-4.1-nano"
 MAX_FILE_CHARS = int(os.getenv("SPARKDOCK_AI_MAX_FILE_CHARS", "30000"))
+READ_CHUNK_BYTES = 64 * 1024
+MMAP_THRESHOLD_BYTES = 1024 * 1024
+PREFETCH_FILES = 10
 MAX_CANDIDATES = int(os.getenv("SPARKDOCK_AI_MAX_CANDIDATES", "50"))
+SCAN_SUFFIXES = (".md", ".yml", ".yaml", ".zsh", ".sh", ".swift", ".just")
 MAX_TOKENS = int(os.getenv("SPARKDOCK_AI_MAX_TOKENS", "2048"))
+FULL_CONTEXT_FILES = int(os.getenv("SPARKDOCK_AI_FULL_CONTEXT_FILES", "5"))
+SELECTION_SUMMARY_CHARS = 120
 PROMPTS_DIR = Path(__file__).resolve().parent / "prompts"
+DIGEST_FILE = os.getenv("SPARKDOCK_AI_DIGEST_FILE")
+COMMON_QUESTIONS_FILE = Path(
+    os.getenv(
+        "SPARKDOCK_AI_COMMON_QUESTIONS_FILE",
+        str(Path(__file__).resolve().parent / "common-questions.txt"),
+    )
+).expanduser()
+BUNDLE_VERSION = 1
+FACTS_ENABLED = os.getenv("SPARKDOCK_AI_FACTS", "1") != "0"
+EXTRACTIVE_ENABLED = os.getenv("SPARKDOCK_AI_EXTRACTIVE", "1") != "0"
+DECOMPOSE_ENABLED = os.getenv("SPARKDOCK_AI_DECOMPOSE", "1") != "0"
+COMPACT_CONTEXT = os.getenv("SPARKDOCK_AI_COMPACT_CONTEXT", "1") != "0"
+STRUCTURED_OUTPUT = os.getenv("SPARKDOCK_AI_STRUCTURED", "1") != "0"
+STRUCTURED_STATS_PATH = Path(
+    os.getenv(
+        "SPARKDOCK_AI_STRUCTURED_STATS", "~/.config/spark/sparkdock/ai-structured.json"
+    )
+).expanduser()
+ROUTING_MAX_TOKENS = 20
+SELECTION_MAX_TOKENS = 400
+PLAIN_ROUTING_FORMAT = "Reply with only YES or NO."
+PLAIN_SELECTION_FORMAT = (
+    "Return a JSON array of relative file paths (strings) that should be read to "
+    "answer the question. Limit the list to the most relevant 10 items or fewer. "
+    "If none are required, return an empty array."
+)
+LLM_COMMAND = shlex.split(os.getenv("SPARKDOCK_AI_LLM_COMMAND", "llm"))
+HEDGE_ENABLED = os.getenv("SPARKDOCK_AI_HEDGE", "0") == "1"
+HEDGE_FALLBACK_MODEL = os.getenv("SPARKDOCK_AI_HEDGE_FALLBACK_MODEL")
+HEDGE_PERCENTILE = float(os.getenv("SPARKDOCK_AI_HEDGE_PERCENTILE", "90"))
+HEDGE_DEFAULT_DEADLINE = float(os.getenv("SPARKDOCK_AI_HEDGE_DEFAULT_DEADLINE", "8"))
+HEDGE_MAX_PER_RUN = int(os.getenv("SPARKDOCK_AI_HEDGE_MAX_PER_RUN", "2"))
+HEDGE_MAX_RATIO = float(os.getenv("SPARKDOCK_AI_HEDGE_MAX_RATIO", "0.25"))
+HEDGE_MIN_SAMPLES = 5
+HEDGE_MAX_SAMPLES = 50
+PREDICTOR_ENABLED = os.getenv("SPARKDOCK_AI_PREDICTOR", "1") != "0"
+PREDICTOR_PATH = Path(
+    os.getenv(
+        "SPARKDOCK_AI_PREDICTOR_FILE", "~/.config/spark/sparkdock/ai-predictor.json"
+    )
+).expanduser()
+ROUTER_ENABLED = os.getenv("SPARKDOCK_AI_ROUTER", "0") == "1"
+ROUTER_MODELS = parse_model_tiers(
+    os.getenv(
+        "SPARKDOCK_AI_ROUTER_MODELS",
+        f"{CLASSIFIER_MODEL}=1,{CONTEXT_MODEL}=2,gpt-4.1-mini=3",
+    )
+)
+ROUTER_OUTCOME_WINDOW = 50
+LATENCY_PATH = Path(
+    os.getenv("SPARKDOCK_AI_LATENCY_FILE", "~/.config/spark/sparkdock/ai-latency.json")
+).expanduser()
+DEADLINE_SECONDS = float(os.getenv("SPARKDOCK_AI_DEADLINE", "90"))
+MIN_STAGE_SECONDS = 1.0
+STAGE_BUDGET_SHARES = {"classify": 0.15, "select": 0.3, "answer": 1.0, "direct": 1.0}
+ANSWER_CACHE_NAMESPACE = "sparkdock-ai.answers"
+ANSWER_CACHE_TTL = 30 * 24 * 3600
+ANSWER_CONCURRENCY = 4
 LOG_PATH = Path(
     os.getenv("SPARKDOCK_AI_LOG_FILE", "~/.config/spark/sparkdock/ai.log")
 ).expanduser()
 LOG_LEVEL_NAME = os.getenv("SPARKDOCK_AI_LOG_LEVEL", "INFO").upper()
+SESSION_MAX_TURNS = int(os.getenv("SPARKDOCK_AI_SESSION_MAX_TURNS", "6"))
+SESSION_MAX_ANSWER_CHARS = 2000
+SESSION_MAX_CONTEXT_FILES = 10
+SESSION_TOPIC_OVERLAP = 0.5
+SESSION_SEPARATOR = "---"
+USAGE_PATTERN = re.compile(
+    r"Token usage: ([\d,]+) input, ([\d,]+) output(?:, (\{.*\}))?"
+)
 
 TRACE_LEVEL = 5
 logging.addLevelName(TRACE_LEVEL, "TRACE")
@@ -68,6 +172,11 @@ def _setup_logger() -> logging.Logger:
     handler.setFormatter(formatter)
     logger.addHandler(handler)
     logger.propagate = False
+    # The shared cache logs under its own name; keep its warnings in ai.log.
+    cache_logger = logging.getLogger("sparkdock_cache")
+    cache_logger.setLevel(level)
+    cache_logger.addHandler(handler)
+    cache_logger.propagate = False
     return logger
 
 
@@ -88,11 +197,56 @@ CURATED_FALLBACK = [
     "sjust/sjust.sh",
 ]
 
+FOLLOW_UP_MARKERS = (
+    "and ",
+    "also ",
+    "then ",
+    "but ",
+    "so ",
+    "what about ",
+    "how about ",
+)
+FOLLOW_UP_REFERENCES = {"it", "that", "this", "those", "them", "these", "there"}
+STOPWORDS = frozenset("""
+    the and for with does how what which can are about sparkdock use you that
+    this from into why when where should would could there have has its
+    """.split())
+
 
 class SparkdockAIError(RuntimeError):
     """Domain-specific error reported to the calling script."""
 
 
+class StageTimeout(SparkdockAIError):
+    """A pipeline stage ran out of its share of the question deadline."""
+
+
+class Deadline:
+    """Latency budget for one question, split across the pipeline stages.
+
+    Each stage gets a share of the time that is still left, so a fast
+    classifier leaves more room for the answer. Degradations applied when a
+    stage runs out of time are collected and reported with the result.
+    """
+
+    def __init__(self, seconds: float = DEADLINE_SECONDS):
+        self.expires = time.monotonic() + seconds
+        self.degradations: List[str] = []
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires - time.monotonic())
+
+    def stage_timeout(self, stage: str) -> float:
+        timeout = self.remaining() * STAGE_BUDGET_SHARES.get(stage, 1.0)
+        if timeout < MIN_STAGE_SECONDS:
+            raise StageTimeout(f"No time left for stage {stage}")
+        return timeout
+
+    def degrade(self, description: str) -> None:
+        LOGGER.warning("Degraded answer: %s", description)
+        self.degradations.append(description)
+
+
 def determine_root(explicit: Optional[str] = None) -> Path:
     if explicit:
         return Path(explicit).expanduser().resolve()
@@ -117,15 +271,21 @@ def run_subprocess(
     *,
     cwd: Optional[Path] = None,
     input_text: Optional[str] = None,
+    timeout: Optional[float] = None,
 ) -> subprocess.CompletedProcess:
-    LOGGER.trace("Running subprocess: args=%s cwd=%s", args, cwd)
-    result = subprocess.run(
-        args,
-        cwd=str(cwd) if cwd else None,
-        input=input_text,
-        text=True,
-        capture_output=True,
-    )
+    LOGGER.trace("Running subprocess: args=%s cwd=%s timeout=%s", args, cwd, timeout)
+    try:
+        result = subprocess.run(
+            args,
+            cwd=str(cwd) if cwd else None,
+            input=input_text,
+            text=True,
+            capture_output=True,
+            timeout=timeout,
+        )
+    except subprocess.TimeoutExpired as err:
+        LOGGER.warning("Subprocess timed out after %.1fs: %s", timeout, args[0])
+        raise StageTimeout(f"{args[0]} timed out after {timeout:.1f}s") from err
     LOGGER.trace(
         "Subprocess finished: returncode=%s stdout_len=%d stderr_len=%d",
         result.returncode,
@@ -135,6 +295,44 @@ def run_subprocess(
     return result
 
 
+async def run_llm_process(
+    args: List[str], *, timeout: Optional[float] = None
+) -> subprocess.CompletedProcess:
+    """Run an llm command without blocking the event loop.
+
+    The process is killed when the timeout expires (raising StageTimeout) or
+    when the awaiting task is cancelled.
+    """
+    LOGGER.trace("Running llm process: args=%s timeout=%s", args[:2], timeout)
+    proc = await asyncio.create_subprocess_exec(
+        *args, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+    )
+    try:
+        stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout)
+    except asyncio.TimeoutError as err:
+        LOGGER.warning("Subprocess timed out after %.1fs: %s", timeout, args[0])
+        raise StageTimeout(f"{args[0]} timed out after {timeout:.1f}s") from err
+    finally:
+        if proc.returncode is None:
+            proc.kill()
+            try:
+                await proc.wait()
+            except asyncio.CancelledError:
+                pass
+    LOGGER.trace(
+        "Subprocess finished: returncode=%s stdout_len=%d stderr_len=%d",
+        proc.returncode,
+        len(stdout),
+        len(stderr),
+    )
+    return subprocess.CompletedProcess(
+        args,
+        proc.returncode,
+        stdout.decode("utf-8", errors="replace"),
+        stderr.decode("utf-8", errors="replace"),
+    )
+
+
 def load_prompt(name: str) -> str:
     path = PROMPTS_DIR / name
     LOGGER.trace("Loading prompt: %s", path)
@@ -148,27 +346,417 @@ def _token_option_for_model(model: str) -> Optional[str]:
     return "max_tokens"
 
 
-def invoke_llm(
-    *,
+def _cache_option_for_model(model: str) -> Optional[str]:
+    """Return the llm option that enables explicit prompt caching, if any.
+
+    OpenAI models cache long shared prefixes automatically; Anthropic models
+    (via llm-anthropic) need an explicit cache-control hint.
+    """
+    if re.match(r"^(anthropic/)?claude", model):
+        return "cache"
+    return None
+
+
+def _find_usage_value(details: object, key: str) -> int:
+    if isinstance(details, dict):
+        total = 0
+        for name, value in details.items():
+            if name == key and isinstance(value, int):
+                total += value
+            else:
+                total += _find_usage_value(value, key)
+        return total
+    return 0
+
+
+def log_token_usage(model: str, stderr: str) -> None:
+    """Log token usage reported by `llm --usage`, including cached prompt tokens."""
+    match = USAGE_PATTERN.search(stderr or "")
+    if not match:
+        LOGGER.trace("No token usage reported for model=%s", model)
+        return
+    input_tokens = int(match.group(1).replace(",", ""))
+    output_tokens = int(match.group(2).replace(",", ""))
+    details: object = {}
+    if match.group(3):
+        try:
+            details = json.loads(match.group(3))
+        except json.JSONDecodeError:
+            details = {}
+    cached_tokens = _find_usage_value(details, "cached_tokens") + _find_usage_value(
+        details, "cache_read_input_tokens"
+    )
+    cache_write_tokens = _find_usage_value(details, "cache_creation_input_tokens")
+    LOGGER.info(
+        "Token usage model=%s input=%d cached=%d cache_write=%d output=%d",
+        model,
+        input_tokens,
+        cached_tokens,
+        cache_write_tokens,
+        output_tokens,
+    )
+
+
+def build_llm_command(
     model: str,
     system_prompt: str,
     prompt_body: str,
-    max_tokens: int = MAX_TOKENS,
-) -> subprocess.CompletedProcess:
-    LOGGER.trace("Invoking LLM model=%s", model)
+    max_tokens: int,
+    schema: Optional[dict] = None,
+) -> List[str]:
     token_option = _token_option_for_model(model)
-    cmd = ["llm", "prompt", "--no-log", "--no-stream"]
+    cmd = [*LLM_COMMAND, "prompt", "--no-log", "--no-stream", "--usage"]
     if token_option:
         LOGGER.trace("Using token option %s=%d", token_option, max_tokens)
         cmd.extend(["-o", token_option, str(max_tokens)])
     else:
         LOGGER.trace("Skipping token option for model=%s", model)
+    cache_option = _cache_option_for_model(model)
+    if cache_option:
+        LOGGER.trace("Using cache option %s for model=%s", cache_option, model)
+        cmd.extend(["-o", cache_option, "1"])
+    if schema is not None:
+        cmd.extend(["--schema", json.dumps(schema, separators=(",", ":"))])
     cmd.extend(["-m", model, "-s", system_prompt, prompt_body])
-    return run_subprocess(cmd)
+    return cmd
 
 
-def gather_candidate_files(root: Path) -> List[str]:
-    LOGGER.trace("Gathering candidate files from %s", root)
+async def invoke_llm(
+    *,
+    model: str,
+    system_prompt: str,
+    prompt_body: str,
+    max_tokens: int = MAX_TOKENS,
+    stage: str = "default",
+    timeout: Optional[float] = None,
+    schema: Optional[dict] = None,
+) -> subprocess.CompletedProcess:
+    LOGGER.trace("Invoking LLM model=%s stage=%s", model, stage)
+    cmd = build_llm_command(model, system_prompt, prompt_body, max_tokens, schema)
+    if HEDGE_ENABLED:
+        hedge_model = HEDGE_FALLBACK_MODEL or model
+        hedge_cmd = (
+            cmd
+            if hedge_model == model
+            else build_llm_command(
+                hedge_model, system_prompt, prompt_body, max_tokens, schema
+            )
+        )
+        try:
+            result, model = await run_hedged(
+                stage=stage,
+                primary=(model, cmd),
+                hedge=(hedge_model, hedge_cmd),
+                timeout=timeout,
+            )
+        except StageTimeout:
+            record_call(stage, model, None, False, 0)
+            raise
+        elapsed = None
+    else:
+        started = time.monotonic()
+        try:
+            result = await run_llm_process(cmd, timeout=timeout)
+        except StageTimeout:
+            record_call(stage, model, None, False, 0)
+            raise
+        elapsed = time.monotonic() - started
+    ok = result.returncode == 0
+    record_call(stage, model, elapsed, ok, len(result.stdout or ""))
+    if ok:
+        log_token_usage(model, result.stderr)
+    return result
+
+
+def route_model(
+    stage: str, default: str, *, context_chars: int = 0, question_words: int = 0
+) -> str:
+    """Pick the model for a stage; the fixed default unless routing is enabled."""
+    if not ROUTER_ENABLED:
+        return default
+    tier = required_tier(stage, context_chars, question_words)
+    model, reason = choose_model(
+        stage, default, tier, ROUTER_MODELS, LatencyStats(LATENCY_PATH)
+    )
+    LOGGER.info("Router stage=%s tier>=%d chose %s: %s", stage, tier, model, reason)
+    return model
+
+
+def record_call(
+    stage: str, model: str, seconds: Optional[float], ok: bool, output_chars: int
+) -> None:
+    """Store the outcome of one llm call for hedging deadlines and model routing.
+
+    Hedged calls pass `seconds=None` because run_hedged records the winner's
+    latency itself. Inside batched_call_stats the outcome is kept with the
+    question's other calls; otherwise it is written right away.
+    """
+    key = f"{stage}:{model}"
+    batch = CALL_STATS.get() or CallStats()
+    if ok and seconds is not None:
+        batch.samples.append((key, seconds))
+    batch.outcomes.append((key, ok, output_chars))
+    if CALL_STATS.get() is None:
+        batch.flush(LATENCY_PATH)
+
+
+class CallStats:
+    """Latency samples, outcomes and hedge counts of one question's llm calls.
+
+    The counts are merged into the latency file once per question, under a
+    lock, so concurrent processes (a background prewarm and a live query)
+    add to the file instead of overwriting each other's updates.
+    """
+
+    def __init__(self) -> None:
+        self.samples: List[Tuple[str, float]] = []
+        self.outcomes: List[Tuple[str, bool, int]] = []
+        self.hedges: Dict[str, int] = {"calls": 0, "fired": 0, "won": 0}
+
+    def flush(self, path: Path) -> None:
+        if not (self.samples or self.outcomes or self.hedges["calls"]):
+            return
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with path.with_suffix(".lock").open("w") as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                stats = LatencyStats(path)
+                for key, seconds in self.samples:
+                    stats.record(key, seconds)
+                for key, ok, output_chars in self.outcomes:
+                    stats.record_outcome(key, ok, output_chars)
+                for name, count in self.hedges.items():
+                    stats.hedges[name] = stats.hedges.get(name, 0) + count
+                stats.save()
+        except OSError as err:
+            LOGGER.warning("Unable to store latency stats at %s: %s", path, err)
+
+
+CALL_STATS: contextvars.ContextVar[Optional[CallStats]] = contextvars.ContextVar(
+    "sparkdock_ai_call_stats", default=None
+)
+
+
+@contextmanager
+def batched_call_stats() -> Iterator[CallStats]:
+    """Collect the llm call stats of one question and write them once at the end.
+
+    Tasks started inside inherit the batch, so sub-questions answered
+    concurrently share it.
+    """
+    if CALL_STATS.get() is not None:
+        yield CALL_STATS.get()
+        return
+    batch = CallStats()
+    token = CALL_STATS.set(batch)
+    try:
+        yield batch
+    finally:
+        CALL_STATS.reset(token)
+        batch.flush(LATENCY_PATH)
+
+
+class LatencyStats:
+    """Persisted per-stage/model latency samples, call outcomes, and hedge counters.
+
+    Keys are `stage:model`. Outcomes hold call and error counts plus the
+    average output length, which the model router reports alongside latency.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            data = {}
+        self.samples: Dict[str, List[float]] = data.get("samples", {})
+        self.hedges: Dict[str, int] = data.get(
+            "hedges", {"calls": 0, "fired": 0, "won": 0}
+        )
+        self.outcomes: Dict[str, Dict[str, float]] = data.get("outcomes", {})
+
+    def deadline(self, key: str) -> float:
+        samples = sorted(self.samples.get(key, []))
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return HEDGE_DEFAULT_DEADLINE
+        rank = min(len(samples) - 1, int(len(samples) * HEDGE_PERCENTILE / 100))
+        return samples[rank]
+
+    def record(self, key: str, seconds: float) -> None:
+        bucket = self.samples.setdefault(key, [])
+        bucket.append(round(seconds, 3))
+        del bucket[:-HEDGE_MAX_SAMPLES]
+
+    def median(self, key: str, min_samples: int = HEDGE_MIN_SAMPLES) -> Optional[float]:
+        samples = sorted(self.samples.get(key, []))
+        if len(samples) < min_samples:
+            return None
+        return samples[len(samples) // 2]
+
+    def record_outcome(self, key: str, ok: bool, output_chars: int) -> None:
+        outcome = self.outcomes.setdefault(
+            key, {"calls": 0, "errors": 0, "output_chars": 0.0}
+        )
+        if outcome["calls"] >= ROUTER_OUTCOME_WINDOW:
+            # Halve old counts so the error rate follows recent behaviour.
+            outcome["calls"] //= 2
+            outcome["errors"] //= 2
+        outcome["calls"] += 1
+        if not ok:
+            outcome["errors"] += 1
+            return
+        successes = outcome["calls"] - outcome["errors"]
+        outcome["output_chars"] = round(
+            outcome["output_chars"]
+            + (output_chars - outcome["output_chars"]) / successes,
+            1,
+        )
+
+    def hedge_allowed(self, pending: CallStats) -> bool:
+        """Check the question's hedges and the persisted overall hedge ratio.
+
+        `pending` holds the hedges of the current question that are not in
+        the file yet.
+        """
+        if pending.hedges["fired"] >= HEDGE_MAX_PER_RUN:
+            return False
+        calls = max(self.hedges.get("calls", 0) + pending.hedges["calls"], 1)
+        fired = self.hedges.get("fired", 0) + pending.hedges["fired"]
+        return fired / calls < HEDGE_MAX_RATIO
+
+    def save(self) -> None:
+        """Write the stats through a unique temporary file in the same directory."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            "w",
+            dir=self.path.parent,
+            prefix=f".{self.path.name}.",
+            suffix=".tmp",
+            delete=False,
+            encoding="utf-8",
+        ) as handle:
+            json.dump(
+                {
+                    "samples": self.samples,
+                    "hedges": self.hedges,
+                    "outcomes": self.outcomes,
+                },
+                handle,
+            )
+        os.replace(handle.name, self.path)
+
+
+async def _timed_attempt(
+    label: str, cmd: List[str], timeout: Optional[float]
+) -> Tuple[subprocess.CompletedProcess, float]:
+    LOGGER.trace("Starting %s attempt: %s", label, cmd[: len(LLM_COMMAND) + 1])
+    started = time.monotonic()
+    result = await run_llm_process(cmd, timeout=timeout)
+    return result, time.monotonic() - started
+
+
+async def run_hedged(
+    *,
+    stage: str,
+    primary: Tuple[str, List[str]],
+    hedge: Tuple[str, List[str]],
+    timeout: Optional[float] = None,
+) -> Tuple[subprocess.CompletedProcess, str]:
+    """Run an llm call, duplicating it when it outlives the learned deadline.
+
+    The deadline is the configured percentile of past latencies for the same
+    stage and model. The first successful attempt wins and the other one is
+    cancelled, which kills its process. Returns the result and the model that
+    produced it.
+    """
+    stats = LatencyStats(LATENCY_PATH)
+    batch = CALL_STATS.get() or CallStats()
+    models = {"primary": primary[0], "hedge": hedge[0]}
+    deadline = stats.deadline(f"{stage}:{primary[0]}")
+    expires = time.monotonic() + timeout if timeout is not None else None
+    if timeout is not None:
+        deadline = min(deadline, timeout)
+    attempts = {
+        "primary": asyncio.ensure_future(_timed_attempt("primary", primary[1], None))
+    }
+    batch.hedges["calls"] += 1
+
+    try:
+        done, _pending = await asyncio.wait(attempts.values(), timeout=deadline)
+        if not done:
+            if stats.hedge_allowed(batch):
+                batch.hedges["fired"] += 1
+                LOGGER.info(
+                    "Hedging stage=%s after %.2fs deadline (primary=%s, hedge=%s)",
+                    stage,
+                    deadline,
+                    primary[0],
+                    hedge[0],
+                )
+                attempts["hedge"] = asyncio.ensure_future(
+                    _timed_attempt("hedge", hedge[1], None)
+                )
+            else:
+                LOGGER.info(
+                    "Hedge budget exhausted, waiting for primary (stage=%s)", stage
+                )
+
+        labels = {task: label for label, task in attempts.items()}
+        pending = set(attempts.values())
+        winner: Optional[Tuple[str, subprocess.CompletedProcess]] = None
+        while pending and (winner is None or winner[1].returncode != 0):
+            wait = None if expires is None else max(0.0, expires - time.monotonic())
+            done, pending = await asyncio.wait(
+                pending, timeout=wait, return_when=asyncio.FIRST_COMPLETED
+            )
+            if not done:
+                if CALL_STATS.get() is None:
+                    batch.flush(LATENCY_PATH)
+                raise StageTimeout(f"llm timed out after {timeout:.1f}s")
+            for task in done:
+                label = labels[task]
+                result, elapsed = task.result()
+                if result.returncode == 0:
+                    batch.samples.append((f"{stage}:{models[label]}", elapsed))
+                    winner = (label, result)
+                    break
+                winner = winner or (label, result)
+                if pending:
+                    LOGGER.warning(
+                        "%s attempt failed, waiting for the other one", label
+                    )
+    finally:
+        for label, task in attempts.items():
+            if not task.done():
+                LOGGER.trace("Cancelling %s attempt", label)
+                task.cancel()
+        await asyncio.gather(*attempts.values(), return_exceptions=True)
+
+    label, result = winner
+    if label == "hedge":
+        batch.hedges["won"] += 1
+    if "hedge" in attempts:
+        fired = stats.hedges.get("fired", 0) + batch.hedges["fired"]
+        won = stats.hedges.get("won", 0) + batch.hedges["won"]
+        LOGGER.info(
+            "Hedge finished stage=%s winner=%s (win rate %d/%d = %.0f%%)",
+            stage,
+            label,
+            won,
+            fired,
+            100.0 * won / max(fired, 1),
+        )
+    if CALL_STATS.get() is None:
+        batch.flush(LATENCY_PATH)
+    return result, models[label]
+
+
+def list_repository_files(root: Path, limit: Optional[int] = None) -> List[str]:
+    """Return every tracked file, or the known text files outside a git checkout.
+
+    Non-git roots are walked by the ignore-aware scanner, which stops after
+    `limit` files and caches its listing under data_dir(root).
+    """
     candidates: List[str] = []
     git_dir = root / ".git"
     if git_dir.exists():
@@ -178,38 +766,254 @@ def gather_candidate_files(root: Path) -> List[str]:
                 line.strip() for line in result.stdout.splitlines() if line.strip()
             ]
     if not candidates:
-        exts = (".md", ".yml", ".yaml", ".zsh", ".sh", ".swift", ".just")
-        for path in root.rglob("*"):
-            if path.is_file() and path.suffix in exts:
-                candidates.append(str(path.relative_to(root)))
+        candidates = list_files(
+            root, SCAN_SUFFIXES, data_dir(root) / "files.json", limit=limit
+        )
     if "README.md" not in candidates and (root / "README.md").exists():
         candidates.append("README.md")
-    limited = candidates[:MAX_CANDIDATES]
+    return candidates
+
+
+def gather_candidate_files(root: Path) -> List[str]:
+    LOGGER.trace("Gathering candidate files from %s", root)
+    limited = list_repository_files(root, limit=MAX_CANDIDATES)[:MAX_CANDIDATES]
     LOGGER.info("Gathered %d candidate files", len(limited))
     LOGGER.trace("Candidate files: %s", limited)
     return limited
 
 
-def render_candidate_block(files: Iterable[str]) -> str:
-    return "\n".join(f"- {path}" for path in files)
+def data_dir(root: Path) -> Path:
+    """Directory next to the install holding generated Sparkdock AI data."""
+    return root / ".sparkdock-ai"
+
+
+def digest_path(root: Path) -> Path:
+    """Location of the repository digest built by digest.py."""
+    if DIGEST_FILE:
+        return Path(DIGEST_FILE).expanduser()
+    return data_dir(root) / "digest.json"
+
+
+@lru_cache(maxsize=None)
+def load_repo_digest(root: Path) -> Dict[str, dict]:
+    """Return per-file digest entries, or an empty mapping when no digest exists."""
+    path = digest_path(root)
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        LOGGER.trace("No repository digest at %s", path)
+        return {}
+    except (OSError, json.JSONDecodeError) as err:
+        LOGGER.warning("Ignoring unreadable repository digest %s: %s", path, err)
+        return {}
+    files = data.get("files", {})
+    LOGGER.info("Loaded repository digest (%d files)", len(files))
+    return files
+
+
+def git_blob_sha(data: bytes) -> str:
+    """Hash content the same way `git hash-object` does."""
+    header = f"blob {len(data)}\0".encode()
+    return hashlib.sha1(header + data).hexdigest()
+
+
+def digest_entry(root: Path, relative: str) -> Optional[dict]:
+    """Return the digest entry for a file if it still matches the file on disk.
+
+    The blob SHA the entry was summarized from is the authority; the stored
+    size and mtime only let an untouched file skip hashing.
+    """
+    entry = load_repo_digest(root).get(relative)
+    if not entry:
+        return None
+    file_path = root / relative
+    try:
+        stat = file_path.stat()
+        if stat.st_size != entry.get("size"):
+            LOGGER.trace("Digest entry for %s is stale (size)", relative)
+            return None
+        if stat.st_mtime_ns == entry.get("mtime_ns"):
+            return entry
+        if git_blob_sha(file_path.read_bytes()) != entry.get("sha"):
+            LOGGER.trace("Digest entry for %s is stale (content)", relative)
+            return None
+    except OSError:
+        return None
+    return entry
+
+
+def bundle_path(root: Path) -> Path:
+    """Location of the prewarmed answer bundle built by prewarm.py."""
+    return data_dir(root) / "answers-bundle.json"
+
+
+def current_revision(root: Path) -> Optional[str]:
+    """Return the checked-out commit, or None outside a git checkout."""
+    if not (root / ".git").exists():
+        return None
+    result = run_subprocess(["git", "rev-parse", "HEAD"], cwd=root)
+    if result.returncode != 0:
+        return None
+    return result.stdout.strip() or None
+
+
+def load_common_questions() -> List[str]:
+    """Canonical questions offered by the menu and answered ahead of time."""
+    try:
+        lines = COMMON_QUESTIONS_FILE.read_text(encoding="utf-8").splitlines()
+    except OSError:
+        return []
+    return [line.strip() for line in lines if line.strip() and not line.startswith("#")]
+
+
+def load_prewarmed_answer(question: str, root: Path) -> Optional[dict]:
+    """Return the bundled answer when it was built for the installed commit."""
+    try:
+        bundle = json.loads(bundle_path(root).read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError):
+        return None
+    if bundle.get("version") != BUNDLE_VERSION:
+        return None
+    entry = bundle.get("answers", {}).get(_normalize_question(question))
+    if entry is None:
+        return None
+    revision = current_revision(root)
+    if revision is None or bundle.get("commit") != revision:
+        LOGGER.info("Prewarmed answer bundle is stale, generating a live answer")
+        return None
+    LOGGER.info("Served prewarmed answer (commit=%s)", revision[:12])
+    return {
+        "question": question,
+        "answer": entry["answer"],
+        "selected_files": entry["selected_files"],
+    }
+
+
+def render_candidate_block(files: Iterable[str], root: Optional[Path] = None) -> str:
+    """List candidate paths, annotated with digest summaries when available."""
+    lines = []
+    for path in files:
+        entry = digest_entry(root, path) if root else None
+        if not entry:
+            lines.append(f"- {path}")
+            continue
+        summary = entry.get("summary", "")
+        if len(summary) > SELECTION_SUMMARY_CHARS:
+            summary = summary[: SELECTION_SUMMARY_CHARS - 1].rstrip() + "…"
+        keywords = ", ".join(entry.get("keywords", [])[:5])
+        lines.append(
+            f"- {path}: {summary} [{keywords}]" if keywords else f"- {path}: {summary}"
+        )
+    return "\n".join(lines)
+
+
+def render_repository_manifest(files: Iterable[str]) -> str:
+    """Summarize the candidate list by top-level directory.
+
+    The manifest only depends on the repository layout, so it belongs to the
+    static prompt prefix that providers can cache across questions.
+    """
+    counts: Dict[str, int] = {}
+    for path in files:
+        top = path.split("/", 1)[0] if "/" in path else "."
+        counts[top] = counts.get(top, 0) + 1
+    if not counts:
+        return "- (no repository files detected)"
+    return "\n".join(
+        f"- {name}/: {count} file(s)" if name != "." else f"- (root): {count} file(s)"
+        for name, count in sorted(counts.items())
+    )
+
+
+def render_prompt(template: str, **values: str) -> str:
+    """Fill `{{NAME}}` placeholders, substituting the question last.
 
+    Templates keep static blocks (manifest, file list) ahead of the per-question
+    part so the shared prefix stays byte-identical between calls.
+    """
+    question = values.pop("QUESTION", None)
+    for name, value in values.items():
+        template = template.replace(f"{{{{{name}}}}}", value)
+    if question is not None:
+        template = template.replace("{{QUESTION}}", question)
+    return template
 
-def select_files(
+
+async def invoke_structured(
+    *,
+    model: str,
+    system_prompt: str,
+    render_body: Callable[[bool], str],
+    schema: dict,
+    max_tokens: int,
+    stage: str,
+    timeout: Optional[float] = None,
+) -> Tuple[subprocess.CompletedProcess, bool]:
+    """Invoke the model with a JSON schema, retrying in plain mode if unsupported.
+
+    `render_body(structured)` builds the prompt with the matching response
+    format instructions. Returns the result and whether the schema was applied.
+    Models that rejected the schema are remembered in the structured stats
+    file, so later runs go straight to the plain prompt.
+    """
+    counter = FallbackCounter(STRUCTURED_STATS_PATH)
+    structured = STRUCTURED_OUTPUT and not counter.schema_unsupported(model)
+    result = await invoke_llm(
+        model=model,
+        system_prompt=system_prompt,
+        prompt_body=render_body(structured),
+        max_tokens=max_tokens if structured else MAX_TOKENS,
+        stage=stage,
+        timeout=timeout,
+        schema=schema if structured else None,
+    )
+    if (
+        structured
+        and result.returncode != 0
+        and "schema" in (result.stderr or "").lower()
+    ):
+        counter.mark_schema_unsupported(stage, model)
+        structured = False
+        result = await invoke_llm(
+            model=model,
+            system_prompt=system_prompt,
+            prompt_body=render_body(False),
+            stage=stage,
+            timeout=timeout,
+        )
+    return result, structured
+
+
+async def select_files(
     *,
     question: str,
     candidates: List[str],
     system_prompt: str,
     prompt_template: str,
+    root: Optional[Path] = None,
+    timeout: Optional[float] = None,
 ) -> List[str]:
-    block = render_candidate_block(candidates)
-    prompt_body = prompt_template.replace("{{QUESTION}}", question).replace(
-        "{{FILES}}", block
-    )
+    manifest = render_repository_manifest(candidates)
+    files_block = render_candidate_block(candidates, root)
+
+    def render_body(structured: bool) -> str:
+        return render_prompt(
+            prompt_template,
+            MANIFEST=manifest,
+            FILES=files_block,
+            RESPONSE_FORMAT=SELECTION_FORMAT if structured else PLAIN_SELECTION_FORMAT,
+            QUESTION=question,
+        )
+
     LOGGER.trace("Selecting files for question: %s", question)
-    result = invoke_llm(
-        model=CONTEXT_MODEL,
+    result, structured = await invoke_structured(
+        model=route_model("select", CONTEXT_MODEL),
         system_prompt=system_prompt,
-        prompt_body=prompt_body,
+        render_body=render_body,
+        schema=selection_schema(candidates),
+        max_tokens=SELECTION_MAX_TOKENS,
+        stage="select",
+        timeout=timeout,
     )
 
     tmp_dir = Path(tempfile.gettempdir())
@@ -226,27 +1030,84 @@ def select_files(
         )
         raise SparkdockAIError(f"Unable to select files. See {err_path!s} for details.")
 
-    selected = parse_file_selection(result.stdout, candidates)
+    selected = None
+    if structured:
+        selected = parse_selection(result.stdout, candidates)
+        FallbackCounter(STRUCTURED_STATS_PATH).record("select", selected is None)
+    if selected is None:
+        selected = parse_file_selection(result.stdout, candidates)
+    elif not selected and "README.md" in candidates:
+        selected = ["README.md"]
     LOGGER.info("Selected %d files for contextual answer", len(selected))
     LOGGER.trace("Selected files: %s", selected)
     return selected
 
 
-def ask_with_context(
+async def choose_files(
+    question: str, candidates: List[str], root: Path, deadline: Deadline
+) -> Tuple[List[str], str]:
+    """Select context files, returning them with their source.
+
+    The source is "predictor" when a confident local prediction replaced the
+    selection call, "model" for a model selection, or "curated" when the
+    selection stage ran out of time. Model selections are compared with the
+    local prediction for the same question to track its agreement.
+    """
+    predictor = FilePredictor(PREDICTOR_PATH) if PREDICTOR_ENABLED else None
+    prediction = predictor.predict(question, candidates) if predictor else None
+    if prediction is not None and predictor.can_replace(prediction[1]):
+        LOGGER.info(
+            "Selected %d files with the local predictor (confidence=%.2f)",
+            len(prediction[0]),
+            prediction[1],
+        )
+        return prediction[0], "predictor"
+
+    try:
+        selected = await select_files(
+            question=question,
+            candidates=candidates,
+            system_prompt=load_prompt("file-selection-system.txt"),
+            prompt_template=load_prompt("file-selection-template.txt"),
+            root=root,
+            timeout=deadline.stage_timeout("select"),
+        )
+    except StageTimeout:
+        deadline.degrade("file selection skipped, used the curated file list")
+        return [path for path in CURATED_FALLBACK if (root / path).is_file()], "curated"
+    if prediction is not None:
+        predictor.evaluate(prediction, selected)
+        predictor.save()
+    return selected, "model"
+
+
+def record_selection(
+    question: str, selected: List[str], source: str, accepted: bool
+) -> None:
+    """Feed a model selection and its answer outcome to the local predictor."""
+    if not PREDICTOR_ENABLED or source != "model":
+        return
+    predictor = FilePredictor(PREDICTOR_PATH)
+    predictor.record(question, selected, accepted)
+    predictor.save()
+
+
+async def ask_with_context(
     *,
     question: str,
     context: str,
     system_prompt: str,
     prompt_template: str,
+    timeout: Optional[float] = None,
 ) -> str:
     LOGGER.trace("Asking with context (context_chars=%d)", len(context))
-    prompt_body = prompt_template.replace("{{QUESTION}}", question).replace(
-        "{{CONTEXT}}", context
-    )
-    result = invoke_llm(
-        model=CONTEXT_MODEL,
+    prompt_body = render_prompt(prompt_template, CONTEXT=context, QUESTION=question)
+    result = await invoke_llm(
+        model=route_model("answer", CONTEXT_MODEL, context_chars=len(context)),
         system_prompt=system_prompt,
         prompt_body=prompt_body,
+        stage="answer",
+        timeout=timeout,
     )
     if result.returncode != 0:
         raise SparkdockAIError(result.stderr or "Unable to obtain answer from llm.")
@@ -254,16 +1115,23 @@ def ask_with_context(
     return result.stdout.strip()
 
 
-def ask_without_context(
-    *, question: str, system_prompt: str, prompt_template: str
+async def ask_without_context(
+    *,
+    question: str,
+    system_prompt: str,
+    prompt_template: str,
+    timeout: Optional[float] = None,
 ) -> str:
-    LOGGER.info("Answering without repository context using %s", DIRECT_MODEL)
+    model = route_model("direct", DIRECT_MODEL, question_words=len(question.split()))
+    LOGGER.info("Answering without repository context using %s", model)
     LOGGER.trace("Direct question: %s", question)
-    prompt_body = prompt_template.replace("{{QUESTION}}", question)
-    result = invoke_llm(
-        model=DIRECT_MODEL,
+    prompt_body = render_prompt(prompt_template, QUESTION=question)
+    result = await invoke_llm(
+        model=model,
         system_prompt=system_prompt,
         prompt_body=prompt_body,
+        stage="direct",
+        timeout=timeout,
     )
     if result.returncode != 0:
         raise SparkdockAIError(result.stderr or "Unable to obtain answer from llm.")
@@ -271,7 +1139,9 @@ def ask_without_context(
     return result.stdout.strip()
 
 
-def question_needs_repo(question: str, candidate_files: List[str]) -> bool:
+async def question_needs_repo(
+    question: str, candidate_files: List[str], timeout: Optional[float] = None
+) -> bool:
     LOGGER.info("Classifying question for repository context")
     LOGGER.trace("Classification question: %s", question)
     LOGGER.trace("Classifier candidate file count: %d", len(candidate_files))
@@ -280,14 +1150,25 @@ def question_needs_repo(question: str, candidate_files: List[str]) -> bool:
     block = render_candidate_block(candidate_files)
     if not block.strip():
         block = "- (no repository files detected)"
-    prompt_body = prompt_template.replace("{{QUESTION}}", question).replace(
-        "{{FILES}}", block
-    )
+    manifest = render_repository_manifest(candidate_files)
+
+    def render_body(structured: bool) -> str:
+        return render_prompt(
+            prompt_template,
+            MANIFEST=manifest,
+            FILES=block,
+            RESPONSE_FORMAT=ROUTING_FORMAT if structured else PLAIN_ROUTING_FORMAT,
+            QUESTION=question,
+        )
 
-    result = invoke_llm(
-        model=CLASSIFIER_MODEL,
+    result, structured = await invoke_structured(
+        model=route_model("classify", CLASSIFIER_MODEL),
         system_prompt=system_prompt,
-        prompt_body=prompt_body,
+        render_body=render_body,
+        schema=routing_schema(),
+        max_tokens=ROUTING_MAX_TOKENS,
+        stage="classify",
+        timeout=timeout,
     )
 
     if result.returncode != 0:
@@ -300,20 +1181,25 @@ def question_needs_repo(question: str, candidate_files: List[str]) -> bool:
             "Unable to classify question. Check log output for details."
         )
 
+    if structured:
+        routed = parse_routing(result.stdout)
+        FallbackCounter(STRUCTURED_STATS_PATH).record("classify", routed is None)
+        if routed is not None:
+            LOGGER.info(
+                "Classifier decision: %s",
+                "needs repository context" if routed else "direct answer",
+            )
+            return routed
+
     decision = result.stdout.strip().lower()
     LOGGER.trace("Classifier decision raw text: %s", decision)
-    if decision.startswith("yes"):
+    words = set(re.findall(r"[a-z]+", decision))
+    if "yes" in words and "no" not in words:
         LOGGER.info("Classifier decision: needs repository context")
         return True
-    if decision.startswith("no"):
+    if "no" in words and "yes" not in words:
         LOGGER.info("Classifier decision: direct answer")
         return False
-    if "yes" in decision and "no" not in decision:
-        LOGGER.info("Classifier decision (parsed): needs repository context")
-        return True
-    if "no" in decision and "yes" not in decision:
-        LOGGER.info("Classifier decision (parsed): direct answer")
-        return False
     LOGGER.warning(
         "Classifier response ambiguous, defaulting to repository context: %s", decision
     )
@@ -357,26 +1243,25 @@ def parse_file_selection(response: str, candidates: List[str]) -> List[str]:
 
 
 def _extract_json_array(response: str) -> List[str]:
+    """Decode the first JSON array in the response in a single pass.
+
+    Decoding starts at the first `[` (typically after a ```json fence or a
+    short preamble) and stops at the matching bracket, so trailing prose
+    cannot stretch the match the way a greedy regex did.
+    """
     text = response.strip()
     if not text:
         return []
+    start = text.find("[")
+    if start == -1:
+        raise ValueError("No JSON array found")
     try:
-        data = json.loads(text)
-        if isinstance(data, list):
-            return data
-    except json.JSONDecodeError:
-        pass
-
-    match = re.search(r"\[[\s\S]*\]", text)
-    if match:
-        try:
-            parsed = json.loads(match.group(0))
-            if isinstance(parsed, list):
-                return parsed
-        except json.JSONDecodeError:
-            pass
-
-    raise ValueError("No JSON array found")
+        parsed, _end = json.JSONDecoder().raw_decode(text, start)
+    except json.JSONDecodeError as err:
+        raise ValueError("No JSON array found") from err
+    if not isinstance(parsed, list):
+        raise ValueError("No JSON array found")
+    return parsed
 
 
 def _fallback_from_lines(response: str) -> List[str]:
@@ -394,52 +1279,346 @@ def _fallback_from_lines(response: str) -> List[str]:
     return lines
 
 
+def _decode_prefix(stream, limit: int) -> Tuple[str, bool]:
+    """Decode chunks from `stream` until more than `limit` characters are read.
+
+    Invalid UTF-8 sequences are dropped and newlines are translated, matching
+    `Path.read_text` with the old retry on decode errors, in a single pass.
+    """
+    decoder = io.IncrementalNewlineDecoder(
+        codecs.getincrementaldecoder("utf-8")(errors="ignore"), translate=True
+    )
+    pieces: List[str] = []
+    length = 0
+    while length <= limit:
+        chunk = stream.read(READ_CHUNK_BYTES)
+        if not chunk:
+            pieces.append(decoder.decode(b"", final=True))
+            break
+        text = decoder.decode(chunk)
+        pieces.append(text)
+        length += len(text)
+    content = "".join(pieces)
+    return content[:limit], len(content) > limit
+
+
 def read_file_excerpt(path: Path) -> str:
+    """Return at most MAX_FILE_CHARS characters from the start of a file.
+
+    Only the bytes needed for the character budget are read; files above
+    MMAP_THRESHOLD_BYTES are mapped instead of copied into a read buffer.
+    """
     try:
-        content = path.read_text(encoding="utf-8")
-    except UnicodeDecodeError:
-        content = path.read_text(encoding="utf-8", errors="ignore")
+        with path.open("rb") as handle:
+            size = os.fstat(handle.fileno()).st_size
+            if size >= MMAP_THRESHOLD_BYTES:
+                with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    content, truncated = _decode_prefix(mapped, MAX_FILE_CHARS)
+            else:
+                content, truncated = _decode_prefix(handle, MAX_FILE_CHARS)
     except FileNotFoundError:
         return "[file not found]"
-    if len(content) > MAX_FILE_CHARS:
-        return f"{content[:MAX_FILE_CHARS]}\n...[truncated]..."
+    if truncated:
+        return f"{content}\n...[truncated]..."
     return content
 
 
-def build_context(root: Path, selected: List[str]) -> str:
-    parts = []
+def read_file_excerpts(paths: List[Path]) -> List[str]:
+    """Read several excerpts concurrently, preserving the order of `paths`."""
+    if len(paths) < 2:
+        return [read_file_excerpt(path) for path in paths]
+    with ThreadPoolExecutor(max_workers=min(len(paths), PREFETCH_FILES + 1)) as pool:
+        return list(pool.map(read_file_excerpt, paths))
+
+
+def render_summary_part(relative: str, entry: dict) -> str:
+    keywords = ", ".join(entry.get("keywords", []))
+    return (
+        f"File: {relative} (summary only)\n{entry.get('summary', '')}\n"
+        f"Keywords: {keywords or '-'}\n"
+    )
+
+
+def build_context(root: Path, selected: List[str], include_readme: bool = True) -> str:
+    """Inline the selected files, most relevant first.
+
+    Files past the first FULL_CONTEXT_FILES selections, and the README appended
+    for orientation, are replaced by their digest summary when one exists.
+    Full excerpts go through the compaction pass before being fenced.
+    """
+    started = time.monotonic()
+    order: List[str] = []
+    summaries: Dict[str, str] = {}
+    to_read: List[str] = []
     readme_seen = False
-    for relative in selected:
+    for index, relative in enumerate(selected):
         file_path = root / relative
         if relative == "README.md":
             readme_seen = True
-        if not file_path.is_file():
+        if relative in order or not file_path.is_file():
             continue
-        parts.append(f"File: {relative}\n```\n{read_file_excerpt(file_path)}\n```\n")
+        order.append(relative)
+        entry = digest_entry(root, relative) if index >= FULL_CONTEXT_FILES else None
+        if entry:
+            summaries[relative] = render_summary_part(relative, entry)
+        else:
+            to_read.append(relative)
 
     readme_path = root / "README.md"
-    if readme_path.is_file() and not readme_seen:
-        parts.append(f"File: README.md\n```\n{read_file_excerpt(readme_path)}\n```\n")
+    if include_readme and readme_path.is_file() and not readme_seen:
+        order.append("README.md")
+        entry = digest_entry(root, "README.md")
+        if entry:
+            summaries["README.md"] = render_summary_part("README.md", entry)
+        else:
+            to_read.append("README.md")
+
+    contents = read_file_excerpts([root / relative for relative in to_read])
+    excerpts = list(zip(to_read, contents))
+    if COMPACT_CONTEXT and excerpts:
+        excerpts, _stats = compact_files(excerpts)
+    bodies = dict(excerpts)
+    parts = [
+        (
+            summaries[relative]
+            if relative in summaries
+            else f"File: {relative}\n```\n{bodies[relative]}\n```\n"
+        )
+        for relative in order
+    ]
     context = "\n".join(parts)
-    LOGGER.trace("Built context (chars=%d)", len(context))
+    LOGGER.trace(
+        "Built context (chars=%d, files=%d) in %.3fs",
+        len(context),
+        len(order),
+        time.monotonic() - started,
+    )
     return context
 
 
-def generate_answer(question: str, root: Path) -> dict:
+def _normalize_question(question: str) -> str:
+    return " ".join(re.findall(r"[a-z0-9]+", question.lower()))
+
+
+@lru_cache(maxsize=None)
+def cache_store() -> Optional[CacheStore]:
+    """The shared cache in src/cache-store, opened on first use."""
+    return open_store()
+
+
+def load_cached_answer(question: str) -> Optional[dict]:
+    """Return the last successful answer to the same question, if any."""
+    store = cache_store()
+    if store is None:
+        return None
+    return store.get(ANSWER_CACHE_NAMESPACE, _normalize_question(question))
+
+
+def store_cached_answer(result: dict) -> None:
+    store = cache_store()
+    if store is None:
+        return
+    store.set(
+        ANSWER_CACHE_NAMESPACE,
+        _normalize_question(result["question"]),
+        {
+            "answer": result["answer"],
+            "selected_files": result["selected_files"],
+            "stored_at": int(time.time()),
+        },
+        ttl=ANSWER_CACHE_TTL,
+    )
+
+
+async def answer_from_facts(
+    question: str, root: Path, deadline: Optional[Deadline] = None
+) -> Optional[dict]:
+    """Answer catalog questions from the recipe/package fact index.
+
+    Returns None when the index does not cover the question, so the caller
+    continues with the regular classification pipeline.
+    """
+    if not FACTS_ENABLED:
+        return None
+    index = load_fact_index(root, data_dir(root) / "facts.json")
+    match = match_facts(question, index, root)
+    if match is None:
+        return None
+    if "answer" in match:
+        LOGGER.info("Answered from fact index without model calls")
+        answer = match["answer"]
+    else:
+        LOGGER.info(
+            "Answering from fact sheet (chars=%d) instead of file selection",
+            len(match["fact_sheet"]),
+        )
+        answer = await ask_with_context(
+            question=question,
+            context=match["fact_sheet"],
+            system_prompt=load_prompt("answer-system.txt"),
+            prompt_template=load_prompt("answer-template.txt"),
+            timeout=deadline.stage_timeout("answer") if deadline else None,
+        )
+    return {
+        "question": question,
+        "answer": answer,
+        "selected_files": match["sources"],
+    }
+
+
+def answer_from_snippets(question: str, root: Path) -> Optional[dict]:
+    """Answer lookup questions with the matching definition and its line range.
+
+    Returns None unless the local ranking is confident, so the caller falls
+    through to the model pipeline.
+    """
+    if not EXTRACTIVE_ENABLED:
+        return None
+    match = find_extractive_answer(question, root, list_repository_files(root))
+    if match is None:
+        return None
+    return {
+        "question": question,
+        "answer": match["answer"],
+        "selected_files": match["sources"],
+    }
+
+
+async def generate_answer(
+    question: str, root: Path, deadline: Optional[Deadline] = None
+) -> dict:
+    """Answer a question within the deadline, degrading instead of failing.
+
+    Compound questions are split into sub-questions answered concurrently.
+    Classification falls back to the contextual pipeline, selection falls
+    back to CURATED_FALLBACK, and a timed-out answer is replaced by the last
+    cached answer to the same question when one exists. Cancelling the
+    awaiting task kills any llm process still running for it.
+    """
     LOGGER.trace("Generating answer for question: %s", question)
+    deadline = deadline or Deadline()
+    parts = split_question(question, STOPWORDS) if DECOMPOSE_ENABLED else [question]
+    with batched_call_stats():
+        try:
+            if len(parts) > 1:
+                result = await _answer_sub_questions(question, parts, root, deadline)
+            else:
+                result = await _generate_answer(question, root, deadline)
+        except StageTimeout:
+            cached = load_cached_answer(question)
+            if cached is None:
+                raise SparkdockAIError(
+                    "The assistant ran out of time answering this question. "
+                    "Please retry."
+                )
+            deadline.degrade("answer timed out, returned a cached answer")
+            result = {
+                "question": question,
+                "answer": cached["answer"],
+                "selected_files": cached["selected_files"],
+            }
+        else:
+            if not deadline.degradations:
+                store_cached_answer(result)
+    result["degradations"] = deadline.degradations
+    return result
+
+
+async def answer_questions(
+    questions: List[str],
+    root: Path,
+    *,
+    concurrency: int = ANSWER_CONCURRENCY,
+    deadline_seconds: float = DEADLINE_SECONDS,
+) -> List[Union[dict, SparkdockAIError]]:
+    """Answer several questions concurrently on the running event loop.
+
+    Each question gets its own deadline, started when it acquires one of the
+    `concurrency` slots. Failures are returned in place of the result so one
+    error does not cancel the others.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def _answer(question: str) -> Union[dict, SparkdockAIError]:
+        async with semaphore:
+            try:
+                return await generate_answer(question, root, Deadline(deadline_seconds))
+            except SparkdockAIError as err:
+                return err
+
+    return list(await asyncio.gather(*(_answer(question) for question in questions)))
+
+
+async def _answer_sub_questions(
+    question: str, parts: List[str], root: Path, deadline: Deadline
+) -> dict:
+    """Answer sub-questions concurrently and merge them under one answer.
+
+    Each part gets its own classification, file selection, and context.
+    Parts that fail are reported as degradations; the question only fails
+    when none of them could be answered.
+    """
+    LOGGER.info("Split compound question into %d sub-questions", len(parts))
+    started = time.monotonic()
+    results = await asyncio.gather(
+        *(_generate_answer(part, root, deadline) for part in parts),
+        return_exceptions=True,
+    )
+    sections: List[str] = []
+    sources: List[str] = []
+    failures: List[SparkdockAIError] = []
+    for part, result in zip(parts, results):
+        if isinstance(result, SparkdockAIError):
+            LOGGER.warning("Sub-question %r failed: %s", part, result)
+            deadline.degrade(f"sub-question not answered: {part}")
+            failures.append(result)
+            continue
+        if isinstance(result, BaseException):
+            raise result
+        sections.append(f"## {part}\n\n{result['answer'].strip()}")
+        sources.extend(path for path in result["selected_files"] if path not in sources)
+    if not sections:
+        raise failures[0]
+    LOGGER.info(
+        "Answered %d/%d sub-questions in %.2fs",
+        len(sections),
+        len(parts),
+        time.monotonic() - started,
+    )
+    return {
+        "question": question,
+        "answer": "\n\n".join(sections),
+        "selected_files": sources,
+    }
+
+
+async def _generate_answer(question: str, root: Path, deadline: Deadline) -> dict:
+    fact_answer = await answer_from_facts(question, root, deadline)
+    if fact_answer is not None:
+        return fact_answer
+    snippet_answer = answer_from_snippets(question, root)
+    if snippet_answer is not None:
+        return snippet_answer
 
     candidates = gather_candidate_files(root)
 
-    needs_repo = question_needs_repo(question, candidates)
+    try:
+        needs_repo = await question_needs_repo(
+            question, candidates, timeout=deadline.stage_timeout("classify")
+        )
+    except StageTimeout:
+        deadline.degrade("classifier skipped, used repository context")
+        needs_repo = True
 
     if not needs_repo:
-        LOGGER.info("Routing question to direct-answer model %s", DIRECT_MODEL)
+        LOGGER.info("Routing question to the direct-answer pipeline")
         direct_system = load_prompt("direct-answer-system.txt")
         direct_template = load_prompt("direct-answer-template.txt")
-        direct_answer = ask_without_context(
+        direct_answer = await ask_without_context(
             question=question,
             system_prompt=direct_system,
             prompt_template=direct_template,
+            timeout=deadline.stage_timeout("direct"),
         )
         return {
             "question": question,
@@ -447,28 +1626,27 @@ def generate_answer(question: str, root: Path) -> dict:
             "selected_files": [],
         }
 
-    LOGGER.info("Routing question to contextual pipeline using %s", CONTEXT_MODEL)
-    file_selection_system = load_prompt("file-selection-system.txt")
-    file_selection_template = load_prompt("file-selection-template.txt")
+    LOGGER.info("Routing question to the contextual pipeline")
     answer_system = load_prompt("answer-system.txt")
     answer_template = load_prompt("answer-template.txt")
 
-    selected_files = select_files(
-        question=question,
-        candidates=candidates,
-        system_prompt=file_selection_system,
-        prompt_template=file_selection_template,
-    )
+    selected_files, source = await choose_files(question, candidates, root, deadline)
     if not selected_files:
         selected_files = ["README.md"] if "README.md" in candidates else []
 
-    context = build_context(root, selected_files)
-    answer = ask_with_context(
-        question=question,
-        context=context,
-        system_prompt=answer_system,
-        prompt_template=answer_template,
-    )
+    context = await asyncio.to_thread(build_context, root, selected_files)
+    try:
+        answer = await ask_with_context(
+            question=question,
+            context=context,
+            system_prompt=answer_system,
+            prompt_template=answer_template,
+            timeout=deadline.stage_timeout("answer"),
+        )
+    except SparkdockAIError:
+        record_selection(question, selected_files, source, accepted=False)
+        raise
+    record_selection(question, selected_files, source, accepted=True)
     LOGGER.trace("Contextual answer completed for question")
     return {
         "question": question,
@@ -477,10 +1655,354 @@ def generate_answer(question: str, root: Path) -> dict:
     }
 
 
+class Session:
+    """In-memory state shared by the questions of one interactive session.
+
+    Keeps the files already read into context and the previous turns so that
+    follow-up questions on the same topic skip classification and selection.
+    """
+
+    def __init__(self, root: Path):
+        self.root = root
+        self.candidates: List[str] = []
+        self.context_files: List[str] = []
+        self.context = ""
+        self.turns: List[Tuple[str, str]] = []
+
+    @property
+    def has_context(self) -> bool:
+        return bool(self.context_files)
+
+    def reset_context(self) -> None:
+        self.context_files = []
+        self.context = ""
+
+    def set_files(self, files: List[str]) -> None:
+        """Rebuild the context from a new topic's selection."""
+        self.context_files = list(dict.fromkeys(files))[:SESSION_MAX_CONTEXT_FILES]
+        self.context = build_context(self.root, self.context_files)
+        LOGGER.info(
+            "Session context rebuilt with %d file(s) (chars=%d)",
+            len(self.context_files),
+            len(self.context),
+        )
+
+    def add_files(self, files: List[str]) -> List[str]:
+        """Add files a follow-up mentions that are not in the context yet."""
+        # The README is appended to the first context build for orientation.
+        known = self.context_files + (["README.md"] if self.context else [])
+        missing = [item for item in files if item not in known]
+        if not missing and self.context:
+            return []
+        if len(self.context_files) + len(missing) > SESSION_MAX_CONTEXT_FILES:
+            # Rebuild instead of appending so the context stays within the
+            # full-file and summary budgets of build_context.
+            self.set_files(missing + self.context_files)
+            return missing
+        addition = build_context(self.root, missing, include_readme=not self.context)
+        if addition:
+            self.context = f"{self.context}\n{addition}" if self.context else addition
+        self.context_files.extend(missing)
+        LOGGER.info(
+            "Session context extended with %d file(s) (total=%d, chars=%d)",
+            len(missing),
+            len(self.context_files),
+            len(self.context),
+        )
+        return missing
+
+    def record_turn(self, question: str, answer: str) -> None:
+        self.turns.append((question, answer))
+        del self.turns[:-SESSION_MAX_TURNS]
+
+    def render_history(self) -> str:
+        blocks = []
+        for question, answer in self.turns:
+            if len(answer) > SESSION_MAX_ANSWER_CHARS:
+                answer = f"{answer[:SESSION_MAX_ANSWER_CHARS]}\n...[truncated]..."
+            blocks.append(f"User: {question}\nAssistant: {answer}")
+        return "\n\n".join(blocks) or "(no previous turns)"
+
+
+def _question_terms(text: str) -> set:
+    return {
+        word
+        for word in re.findall(r"[a-z0-9][a-z0-9_-]+", text.lower())
+        if len(word) > 2 and word not in STOPWORDS
+    }
+
+
+def mentioned_files(question: str, candidates: List[str]) -> List[str]:
+    """Return candidate files whose path or basename appears in the question."""
+    lowered = question.lower()
+    matches = []
+    for path in candidates:
+        name = path.rsplit("/", 1)[-1].lower()
+        if path.lower() in lowered or (len(name) > 4 and name in lowered):
+            matches.append(path)
+    return matches
+
+
+def is_follow_up(question: str, session: Session) -> bool:
+    """Decide locally whether a question continues the current session topic."""
+    if not session.turns or not session.has_context:
+        return False
+    words = re.findall(r"[a-z']+", question.lower())
+    if not words:
+        return False
+    if question.lower().startswith(FOLLOW_UP_MARKERS) and len(words) <= 15:
+        LOGGER.trace("Follow-up detected by leading marker")
+        return True
+    if len(words) <= 8 and any(word in FOLLOW_UP_REFERENCES for word in words):
+        LOGGER.trace("Follow-up detected by short back-reference")
+        return True
+    terms = _question_terms(question)
+    if not terms:
+        # Nothing to compare ("and why?"); only a back-reference ties it to
+        # the current topic.
+        return any(word in FOLLOW_UP_REFERENCES for word in words)
+    known = set()
+    for previous, _answer in session.turns:
+        known |= _question_terms(previous)
+    for path in session.context_files:
+        known |= _question_terms(path.replace("/", " ").replace(".", " "))
+    overlap = len(terms & known) / len(terms)
+    LOGGER.trace("Follow-up term overlap: %.2f", overlap)
+    return overlap >= SESSION_TOPIC_OVERLAP
+
+
+async def answer_in_session(question: str, session: Session) -> dict:
+    """Answer a question, reusing the session's selection and context when possible."""
+    with batched_call_stats():
+        return await _answer_in_session(question, session)
+
+
+async def _answer_in_session(question: str, session: Session) -> dict:
+    LOGGER.trace("Session question: %s", question)
+    deadline = Deadline()
+    if not session.candidates:
+        session.candidates = gather_candidate_files(session.root)
+
+    if is_follow_up(question, session):
+        LOGGER.info("Follow-up on current topic, reusing selected files")
+        extra = mentioned_files(question, session.candidates)
+        if extra:
+            session.add_files(extra)
+        reused = True
+    else:
+        session.reset_context()
+        fact_answer = await answer_from_facts(question, session.root, deadline)
+        if fact_answer is None:
+            fact_answer = answer_from_snippets(question, session.root)
+        if fact_answer is not None:
+            session.record_turn(question, fact_answer["answer"])
+            return fact_answer
+        try:
+            needs_repo = await question_needs_repo(
+                question,
+                session.candidates,
+                timeout=deadline.stage_timeout("classify"),
+            )
+        except StageTimeout:
+            deadline.degrade("classifier skipped, used repository context")
+            needs_repo = True
+        if not needs_repo:
+            answer = await ask_without_context(
+                question=question,
+                system_prompt=load_prompt("direct-answer-system.txt"),
+                prompt_template=load_prompt("direct-answer-template.txt"),
+                timeout=deadline.stage_timeout("direct"),
+            )
+            session.record_turn(question, answer)
+            return {
+                "question": question,
+                "answer": answer,
+                "selected_files": [],
+                "degradations": deadline.degradations,
+            }
+        selected, source = await choose_files(
+            question, session.candidates, session.root, deadline
+        )
+        if not selected:
+            selected = ["README.md"] if "README.md" in session.candidates else []
+        session.set_files(selected)
+        reused = False
+        selection = (selected, source)
+
+    prompt_body = render_prompt(
+        load_prompt("answer-followup-template.txt"),
+        CONTEXT=session.context,
+        HISTORY=session.render_history(),
+        QUESTION=question,
+    )
+    try:
+        result = await invoke_llm(
+            model=route_model(
+                "answer", CONTEXT_MODEL, context_chars=len(session.context)
+            ),
+            system_prompt=load_prompt("answer-system.txt"),
+            prompt_body=prompt_body,
+            stage="answer",
+            timeout=deadline.stage_timeout("answer"),
+        )
+    except StageTimeout:
+        if not reused:
+            record_selection(question, *selection, accepted=False)
+        raise
+    if not reused:
+        record_selection(question, *selection, accepted=result.returncode == 0)
+    if result.returncode != 0:
+        raise SparkdockAIError(result.stderr or "Unable to obtain answer from llm.")
+    answer = result.stdout.strip()
+    session.record_turn(question, answer)
+    LOGGER.info(
+        "Session answer completed (reused_selection=%s, turns=%d)",
+        reused,
+        len(session.turns),
+    )
+    return {
+        "question": question,
+        "answer": answer,
+        "selected_files": list(session.context_files),
+        "degradations": deadline.degradations,
+    }
+
+
+def print_result(result: dict) -> None:
+    answer = result["answer"].strip()
+    if answer:
+        print(answer)
+    if result["selected_files"]:
+        print("\n## Sources\n")
+        for item in result["selected_files"]:
+            print(f"- {item}")
+    if result.get("degradations"):
+        print(f"\n> Answered under a time budget: {'; '.join(result['degradations'])}.")
+
+
+def run_session(root: Path) -> int:
+    """Read questions from stdin until EOF or `exit`, answering each in turn."""
+    session = Session(root)
+    interactive = sys.stdin.isatty()
+    while True:
+        try:
+            question = input("sparkdock-ai> " if interactive else "").strip()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if not question:
+            continue
+        if question.lower() in ("exit", "quit"):
+            break
+        if question.lower() == "reset":
+            session = Session(root)
+            print("Session reset.")
+            continue
+        try:
+            print_result(asyncio.run(answer_in_session(question, session)))
+        except SparkdockAIError as err:
+            print(err, file=sys.stderr)
+        print(SESSION_SEPARATOR, flush=True)
+    return 0
+
+
+FACT_TEST_CASES = [
+    ("Which packages does Sparkdock install?", "answer"),
+    ("What tasks are available in sjust?", "answer"),
+    ("List all brew packages", "answer"),
+    ("What package manager does Sparkdock use?", None),
+    ("How do I install a package that is not in the list?", None),
+    ("What is a cask?", None),
+    ("Show me all the brew packages that are outdated", None),
+    ("What should I do when a task fails?", None),
+]
+DECOMPOSE_TEST_CASES = [
+    (
+        "How do I install Sparkdock, switch to Lima and enable the shell?",
+        [
+            "How do I install Sparkdock?",
+            "How do I switch to Lima?",
+            "How do I enable the shell?",
+        ],
+    ),
+    ("What are the pros and cons of Lima?", ["What are the pros and cons of Lima?"]),
+    (
+        "How do I copy and paste in the terminal?",
+        ["How do I copy and paste in the terminal?"],
+    ),
+    (
+        "How do I install Docker and the Lima runtime?",
+        ["How do I install Docker and the Lima runtime?"],
+    ),
+]
+
+
+def test_mode(root: Path) -> int:
+    """Run the offline checks against the repository at `root`."""
+    print("=== Sparkdock AI Test Mode ===\n")
+    all_passed = True
+    index = build_fact_index(root, {})
+    for question, expected in FACT_TEST_CASES:
+        match = match_facts(question, index, root)
+        kind = None if match is None else next(iter(match))
+        passed = kind == expected
+        print(f"{'PASSED' if passed else 'FAILED'}: facts {question!r} -> {expected}")
+        if not passed:
+            all_passed = False
+            print(f"  Got: {kind}")
+    for question, expected in DECOMPOSE_TEST_CASES:
+        parts = split_question(question, STOPWORDS)
+        passed = parts == expected
+        print(f"{'PASSED' if passed else 'FAILED'}: decompose {question!r}")
+        if not passed:
+            all_passed = False
+            print(f"  Expected: {expected}")
+            print(f"  Got:      {parts}")
+    return 0 if test_compaction(root) and all_passed else 1
+
+
+def test_compaction(root: Path) -> bool:
+    """Check that compaction keeps YAML data and code blocks unchanged."""
+    all_passed = True
+    try:
+        import yaml
+    except ImportError:
+        print("SKIPPED: compaction YAML round-trip (PyYAML is not installed)")
+    else:
+        for path in list_repository_files(root):
+            if not path.endswith((".yml", ".yaml")):
+                continue
+            text = (root / path).read_text(encoding="utf-8", errors="ignore")
+            try:
+                expected = yaml.safe_load(text)
+            except yaml.YAMLError:
+                continue
+            passed = yaml.safe_load(compact_yaml(text)) == expected
+            print(f"{'PASSED' if passed else 'FAILED'}: compaction keeps {path} data")
+            all_passed = all_passed and passed
+
+    paragraph = "A paragraph long enough to be replaced when it repeats in a file. " * 2
+    fenced = f"```\n{paragraph}\n```\n"
+    files, _stats = compact_files([("a.md", paragraph), ("b.md", fenced)])
+    passed = files[1][1] == fenced
+    print(
+        f"{'PASSED' if passed else 'FAILED'}: compaction keeps repeated fenced blocks"
+    )
+    return all_passed and passed
+
+
 def main() -> int:
     parser = argparse.ArgumentParser(description="Sparkdock AI assistant backend")
-    parser.add_argument(
-        "--question", required=True, help="Question to ask the assistant"
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument("--question", help="Question to ask the assistant")
+    mode.add_argument(
+        "--session",
+        action="store_true",
+        help="Read questions from stdin, reusing selected files across follow-ups",
+    )
+    mode.add_argument(
+        "--test",
+        action="store_true",
+        help="Run the offline checks (no model calls) and exit",
     )
     parser.add_argument(
         "--root",
@@ -492,19 +2014,19 @@ def main() -> int:
     try:
         root = determine_root(args.root)
         os.chdir(root)
-        ensure_dependency("llm")
-        result = generate_answer(args.question, root)
+        if args.test:
+            return test_mode(root)
+        result = None if args.session else load_prewarmed_answer(args.question, root)
+        if result is None:
+            ensure_dependency(LLM_COMMAND[0])
+            if args.session:
+                return run_session(root)
+            result = asyncio.run(generate_answer(args.question, root))
     except SparkdockAIError as err:
         print(err, file=sys.stderr)
         return 1
 
-    answer = result["answer"].strip()
-    if answer:
-        print(answer)
-    if result["selected_files"]:
-        print("\n## Sources\n")
-        for item in result["selected_files"]:
-            print(f"- {item}")
+    print_result(result)
     return 0
 
 
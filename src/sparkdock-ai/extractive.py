@@ -0,0 +1,289 @@
+"""Extractive answers for lookup questions, without model calls.
+
+Questions such as "what does alias ff do" or "which recipe runs
+lima-quick-setup" are answered by the definition itself: an alias line, a
+shell function, or a just recipe. Definitions are split into snippets with
+their line ranges, ranked locally with BM25, and returned only when the best
+match is unambiguous; everything else goes through the model pipeline. Long
+definitions are cut after MAX_SNIPPET_LINES but cited with their full range.
+"""
+
+import logging
+import math
+import re
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+LOGGER = logging.getLogger("sparkdock_ai")
+
+SCRIPT_SUFFIXES = (".zsh", ".sh", ".bash")
+MAX_SNIPPET_LINES = 30
+MAX_QUESTION_WORDS = 14
+MIN_TERM_COVERAGE = 0.5
+SCORE_MARGIN = 1.5
+BM25_K1 = 1.2
+BM25_B = 0.75
+LOOKUP_PATTERN = re.compile(r"^(what|which|where|show)\b")
+KIND_WORDS = {
+    "alias": ("alias", "aliases", "shortcut"),
+    "function": ("function", "functions", "helper", "command"),
+    "recipe": ("recipe", "recipes", "task", "tasks", "sjust", "command"),
+}
+QUERY_NOISE = frozenset("""
+    what which where show does do is are the a an of in for to defined define
+    alias aliases function functions recipe recipes task tasks sjust command
+    commands helper shortcut sparkdock run runs mean means
+    """.split())
+ALIAS_PATTERN = re.compile(r"^\s*alias\s+([A-Za-z0-9_.:-]+)=")
+FUNCTION_PATTERN = re.compile(
+    r"^\s*(?:function\s+)?([A-Za-z_][A-Za-z0-9_:-]*)\s*\(\)\s*\{?\s*$"
+)
+RECIPE_PATTERN = re.compile(r"^@?([A-Za-z0-9_-]+)(?:\s+[^:]*?)?\s*:(?!=)")
+FENCE_LANGUAGES = {".just": "just", ".zsh": "zsh", ".sh": "bash", ".bash": "bash"}
+
+_SNIPPET_CACHE: Dict[str, Tuple[int, List[dict]]] = {}
+
+
+def _tokens(text: str) -> List[str]:
+    return re.findall(r"[a-z0-9][a-z0-9_-]*", text.lower())
+
+
+def _leading_comments(lines: List[str], index: int) -> int:
+    """Return the first line index of the comment block directly above `index`."""
+    start = index
+    while start > 0 and lines[start - 1].strip().startswith(("#", "[")):
+        if lines[start - 1].strip().startswith("#!"):
+            break
+        start -= 1
+    return start
+
+
+def _function_end(lines: List[str], index: int) -> int:
+    indent = len(lines[index]) - len(lines[index].lstrip())
+    if lines[index].rstrip().endswith("}"):
+        return index
+    for cursor in range(index + 1, len(lines)):
+        line = lines[cursor]
+        if line.strip() == "}" and len(line) - len(line.lstrip()) == indent:
+            return cursor
+    return index
+
+
+def _recipe_end(lines: List[str], index: int) -> int:
+    end = index
+    for cursor in range(index + 1, len(lines)):
+        line = lines[cursor]
+        if line.strip() and not line.startswith((" ", "\t")):
+            break
+        if line.strip():
+            end = cursor
+    return end
+
+
+def _snippet(kind: str, name: str, path: str, lines: List[str], start: int, end: int):
+    text = "\n".join(lines[start : end + 1])
+    return {
+        "kind": kind,
+        "name": name,
+        "path": path,
+        "start": start + 1,
+        "end": end + 1,
+        "text": text,
+        "terms": Counter(_tokens(text)),
+    }
+
+
+def split_snippets(path: str, text: str) -> List[dict]:
+    """Split a script or justfile into alias, function, and recipe snippets."""
+    lines = text.splitlines()
+    snippets: List[dict] = []
+    is_just = path.endswith(".just") or path.rsplit("/", 1)[-1] == "justfile"
+    for index, line in enumerate(lines):
+        if is_just:
+            match = RECIPE_PATTERN.match(line)
+            if not match or line.startswith(("set ", "import", "export ", "alias ")):
+                continue
+            snippets.append(
+                _snippet(
+                    "recipe",
+                    match.group(1),
+                    path,
+                    lines,
+                    _leading_comments(lines, index),
+                    _recipe_end(lines, index),
+                )
+            )
+            continue
+        alias = ALIAS_PATTERN.match(line)
+        if alias:
+            start = _leading_comments(lines, index)
+            snippets.append(
+                _snippet("alias", alias.group(1), path, lines, start, index)
+            )
+            continue
+        function = FUNCTION_PATTERN.match(line)
+        if function:
+            start = _leading_comments(lines, index)
+            end = _function_end(lines, index)
+            snippets.append(
+                _snippet("function", function.group(1), path, lines, start, end)
+            )
+    return snippets
+
+
+def snippet_sources(root: Path, files: List[str]) -> List[str]:
+    """Keep the files that can hold alias, function, or recipe definitions."""
+    sources = []
+    for relative in files:
+        name = relative.rsplit("/", 1)[-1]
+        if relative.endswith(SCRIPT_SUFFIXES + (".just",)) or name == "justfile":
+            sources.append(relative)
+        elif "." not in name:
+            try:
+                with (root / relative).open("rb") as handle:
+                    if handle.read(2) == b"#!":
+                        sources.append(relative)
+            except OSError:
+                continue
+    return sources
+
+
+def load_snippets(root: Path, files: List[str]) -> List[dict]:
+    """Return snippets for the given files, re-splitting only modified files."""
+    snippets: List[dict] = []
+    for relative in snippet_sources(root, files):
+        file_path = root / relative
+        try:
+            mtime = file_path.stat().st_mtime_ns
+        except OSError:
+            continue
+        key = str(file_path)
+        cached = _SNIPPET_CACHE.get(key)
+        if cached is None or cached[0] != mtime:
+            text = file_path.read_text(encoding="utf-8", errors="ignore")
+            cached = (mtime, split_snippets(relative, text))
+            _SNIPPET_CACHE[key] = cached
+        snippets.extend(cached[1])
+    return snippets
+
+
+def _bm25_scores(terms: List[str], snippets: List[dict]) -> List[float]:
+    total_length = sum(sum(snippet["terms"].values()) for snippet in snippets)
+    average_length = total_length / len(snippets) or 1.0
+    frequencies = Counter(
+        term for snippet in snippets for term in set(snippet["terms"]) if term in terms
+    )
+    scores = []
+    for snippet in snippets:
+        length = sum(snippet["terms"].values())
+        score = 0.0
+        for term in terms:
+            count = snippet["terms"].get(term, 0)
+            if not count:
+                continue
+            idf = math.log(
+                1
+                + (len(snippets) - frequencies[term] + 0.5) / (frequencies[term] + 0.5)
+            )
+            score += idf * (
+                count
+                * (BM25_K1 + 1)
+                / (count + BM25_K1 * (1 - BM25_B + BM25_B * length / average_length))
+            )
+        scores.append(score)
+    return scores
+
+
+def _anchor(snippet: dict, terms: List[str], question: str) -> int:
+    """2 when the question names the definition, 1 for a partial name match."""
+    name = snippet["name"].lower()
+    kind_named = any(word in question.split() for word in KIND_WORDS[snippet["kind"]])
+    if name in terms and (
+        kind_named or f"`{name}`" in question or re.search(r"[-_:]", name)
+    ):
+        return 2
+    parts = [part for part in re.split(r"[-_:]", name) if len(part) > 3]
+    if kind_named and parts and any(part in terms for part in parts):
+        return 1
+    return 0
+
+
+def line_range(snippet: dict) -> str:
+    if snippet["start"] == snippet["end"]:
+        return str(snippet["start"])
+    return f"{snippet['start']}-{snippet['end']}"
+
+
+def render_snippet_answer(snippet: dict) -> str:
+    """Render the definition, cutting long bodies after MAX_SNIPPET_LINES."""
+    suffix = "." + snippet["path"].rsplit(".", 1)[-1] if "." in snippet["path"] else ""
+    language = FENCE_LANGUAGES.get(suffix, "bash")
+    label = "line" if snippet["start"] == snippet["end"] else "lines"
+    location = f"`{snippet['path']}` ({label} {line_range(snippet)})"
+    if snippet["kind"] == "recipe":
+        lead = f"`sjust {snippet['name']}` is defined in {location}:"
+    else:
+        lead = f"The `{snippet['name']}` {snippet['kind']} is defined in {location}:"
+    lines = snippet["text"].splitlines()
+    body = "\n".join(lines[:MAX_SNIPPET_LINES])
+    if len(lines) > MAX_SNIPPET_LINES:
+        body += f"\n# ... {len(lines) - MAX_SNIPPET_LINES} more lines"
+    return f"{lead}\n\n```{language}\n{body}\n```"
+
+
+def find_extractive_answer(
+    question: str, root: Path, files: List[str]
+) -> Optional[dict]:
+    """Return {"answer", "sources"} for a confident lookup match, or None."""
+    lowered = question.lower().strip()
+    words = lowered.split()
+    if not LOOKUP_PATTERN.match(lowered) or len(words) > MAX_QUESTION_WORDS:
+        return None
+    terms = [
+        term for term in dict.fromkeys(_tokens(lowered)) if term not in QUERY_NOISE
+    ]
+    if not terms:
+        return None
+    snippets = load_snippets(root, files)
+    if not snippets:
+        return None
+
+    scores = _bm25_scores(terms, snippets)
+    ranked = sorted(
+        (
+            (_anchor(snippet, terms, lowered), score, snippet)
+            for snippet, score in zip(snippets, scores)
+        ),
+        key=lambda item: (item[0], item[1]),
+        reverse=True,
+    )
+    anchor, score, best = ranked[0]
+    runner_up = ranked[1] if len(ranked) > 1 else (0, 0.0, None)
+    coverage = sum(1 for term in terms if term in best["terms"]) / len(terms)
+    LOGGER.debug(
+        "Extractive candidate %s:%d-%d (anchor=%d, score=%.2f, coverage=%.2f)",
+        best["path"],
+        best["start"],
+        best["end"],
+        anchor,
+        score,
+        coverage,
+    )
+
+    if not anchor or coverage < MIN_TERM_COVERAGE:
+        return None
+    if runner_up[0] == anchor and runner_up[1] * SCORE_MARGIN > score:
+        return None
+
+    LOGGER.info(
+        "Answered extractively from %s:%d-%d (score=%.2f)",
+        best["path"],
+        best["start"],
+        best["end"],
+        score,
+    )
+    return {
+        "answer": render_snippet_answer(best),
+        "sources": [f"{best['path']}:{line_range(best)}"],
+    }
@@ -0,0 +1,341 @@
+"""Structured fact index over sjust recipes and the Sparkdock package list.
+
+Catalog questions ("which packages…", "what sjust tasks…") are answered from
+this index instead of shipping whole YAML and just files through the model.
+The index is cached on disk and rebuilt only when a source file hash changes.
+"""
+
+import hashlib
+import json
+import logging
+import re
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+LOGGER = logging.getLogger("sparkdock_ai")
+
+FACTS_VERSION = 1
+PACKAGES_FILE = "config/packages/all-packages.yml"
+RECIPES_GLOB = "sjust/recipes/**/*.just"
+PACKAGE_TYPES = {
+    "taps": "tap",
+    "cask_packages": "cask",
+    "homebrew_packages": "homebrew",
+    "npm_packages": "npm",
+    "linked_packages": "linked",
+}
+RECIPE_PATTERN = re.compile(r"^@?([A-Za-z0-9_-]+)((?:\s+[^:]*?)?)\s*:(?!=)")
+PARAM_PATTERN = re.compile(
+    r"([*+]?\$?[A-Za-z_][A-Za-z0-9_-]*)(?:=(\"[^\"]*\"|'[^']*'|\S+))?"
+)
+ATTRIBUTE_PATTERN = re.compile(r"^\[(\w[\w-]*)(?:\((.*)\))?\]$")
+PACKAGE_NOUNS = ("package", "packages", "brew", "cask", "casks", "formula", "formulae")
+PACKAGE_WORDS = PACKAGE_NOUNS + ("install", "installed", "installs")
+RECIPE_WORDS = ("sjust", "recipe", "recipes", "task", "tasks")
+MAX_FACT_SHEET_RECIPES = 20
+# Catalog questions get the whole list without a model call, so they must ask
+# for the list itself ("which packages does Sparkdock install?"), not merely
+# mention packages or tasks ("what is a cask?", "what if a task fails?").
+PACKAGE_CATALOG_PATTERNS = (
+    re.compile(
+        r"^(?:which|what)(?: \S+){0,3} (?:packages|casks|formulae|apps|tools)\b"
+        r".*\b(?:install|installs|installed|include|includes|ship|ships|provides)\b"
+    ),
+    re.compile(
+        r"^(?:list|show)(?: me)?(?: all)?(?: the)?"
+        r"(?: (?:sparkdock|installed|brew|homebrew|cask|npm))* "
+        r"(?:packages|casks|formulae)(?: (?:installed|provided) by sparkdock)?$"
+    ),
+)
+RECIPE_CATALOG_PATTERNS = (
+    re.compile(
+        r"^(?:which|what)(?: \S+){0,3} (?:tasks|recipes|commands)\b"
+        r".*\b(?:available|exist|provides|offers|sjust (?:have|has)|are there)\b"
+    ),
+    re.compile(
+        r"^(?:list|show)(?: me)?(?: all)?(?: the)?(?: available)?(?: sjust)? "
+        r"(?:tasks|recipes|commands)(?: (?:in|of|from) sjust)?$"
+    ),
+)
+
+
+def _hash_file(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def source_files(root: Path) -> List[Path]:
+    files = sorted(root.glob(RECIPES_GLOB))
+    packages = root / PACKAGES_FILE
+    if packages.is_file():
+        files.append(packages)
+    return files
+
+
+def _unquote(value: str) -> str:
+    value = value.strip()
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in "\"'":
+        return value[1:-1]
+    return value
+
+
+def parse_packages(text: str) -> List[dict]:
+    """Parse the package list into (name, type, group) records.
+
+    Single-line comments inside a list act as group headings; longer comment
+    blocks are treated as notes for the package that follows.
+    """
+    packages: List[dict] = []
+    package_type: Optional[str] = None
+    group = ""
+    comments: List[str] = []
+    for line_number, raw_line in enumerate(text.splitlines(), start=1):
+        line = raw_line.strip()
+        if not line:
+            comments = []
+            continue
+        if line.startswith("#"):
+            comments.append(line.lstrip("# ").strip())
+            continue
+        key_match = re.match(r"^([A-Za-z0-9_]+):", raw_line)
+        if key_match:
+            key = key_match.group(1)
+            package_type = PACKAGE_TYPES.get(key)
+            group = comments[0] if len(comments) == 1 else ""
+            comments = []
+            continue
+        if package_type and line.startswith("- "):
+            if len(comments) == 1:
+                group = comments[0]
+            note = " ".join(comments) if len(comments) > 1 else ""
+            comments = []
+            packages.append(
+                {
+                    "name": _unquote(line[2:]),
+                    "type": package_type,
+                    "group": group,
+                    "note": note,
+                    "line": line_number,
+                }
+            )
+    return packages
+
+
+def parse_recipes(text: str, relative: str) -> List[dict]:
+    """Parse public recipes with their docs, group, and parameters."""
+    recipes: List[dict] = []
+    comments: List[str] = []
+    attributes: Dict[str, str] = {}
+    for line_number, line in enumerate(text.splitlines(), start=1):
+        if not line.strip():
+            comments, attributes = [], {}
+            continue
+        if line.startswith((" ", "\t")):
+            continue
+        if line.startswith("#"):
+            comments.append(line.lstrip("# ").rstrip())
+            continue
+        attribute = ATTRIBUTE_PATTERN.match(line.strip())
+        if attribute:
+            attributes[attribute.group(1)] = _unquote(attribute.group(2) or "")
+            continue
+        match = RECIPE_PATTERN.match(line)
+        if not match or line.startswith(("set ", "import", "export ", "alias ")):
+            comments, attributes = [], {}
+            continue
+        name = match.group(1)
+        if not name.startswith("_") and "private" not in attributes:
+            params = [
+                {"name": param.lstrip("$"), "default": _unquote(default or "")}
+                for param, default in PARAM_PATTERN.findall(match.group(2) or "")
+            ]
+            recipes.append(
+                {
+                    "name": name,
+                    "doc": attributes.get("doc") or " ".join(comments).strip(),
+                    "group": attributes.get("group", ""),
+                    "params": params,
+                    "file": relative,
+                    "line": line_number,
+                }
+            )
+        comments, attributes = [], {}
+    return recipes
+
+
+def build_fact_index(root: Path, hashes: Dict[str, str]) -> dict:
+    recipes: List[dict] = []
+    packages: List[dict] = []
+    for path in source_files(root):
+        relative = str(path.relative_to(root))
+        text = path.read_text(encoding="utf-8", errors="ignore")
+        if relative == PACKAGES_FILE:
+            packages = parse_packages(text)
+        else:
+            recipes.extend(parse_recipes(text, relative))
+    return {
+        "version": FACTS_VERSION,
+        "hashes": hashes,
+        "recipes": recipes,
+        "packages": packages,
+    }
+
+
+def load_fact_index(root: Path, index_path: Path) -> dict:
+    """Return the fact index, rebuilding it only when a source file changed."""
+    hashes = {
+        str(path.relative_to(root)): _hash_file(path) for path in source_files(root)
+    }
+    try:
+        cached = json.loads(index_path.read_text(encoding="utf-8"))
+        if cached.get("version") == FACTS_VERSION and cached.get("hashes") == hashes:
+            LOGGER.debug("Fact index is up to date (%s)", index_path)
+            return cached
+    except (OSError, json.JSONDecodeError):
+        pass
+
+    index = build_fact_index(root, hashes)
+    try:
+        index_path.parent.mkdir(parents=True, exist_ok=True)
+        index_path.write_text(json.dumps(index, indent=1), encoding="utf-8")
+    except OSError as err:
+        LOGGER.warning("Unable to store fact index at %s: %s", index_path, err)
+    LOGGER.info(
+        "Rebuilt fact index (recipes=%d, packages=%d)",
+        len(index["recipes"]),
+        len(index["packages"]),
+    )
+    return index
+
+
+def _words(question: str) -> List[str]:
+    return re.findall(r"[a-z0-9@/._-]+", question.lower())
+
+
+def _has_any(words: List[str], vocabulary: Tuple[str, ...]) -> bool:
+    return any(word in vocabulary for word in words)
+
+
+def _recipe_signature(recipe: dict) -> str:
+    params = " ".join(
+        f"{param['name']}={param['default']}" if param["default"] else param["name"]
+        for param in recipe["params"]
+    )
+    return f"sjust {recipe['name']} {params}".strip()
+
+
+def _group_by(items: List[dict], key: str) -> Dict[str, List[dict]]:
+    grouped: Dict[str, List[dict]] = {}
+    for item in items:
+        grouped.setdefault(item[key] or "other", []).append(item)
+    return grouped
+
+
+def render_package_catalog(packages: List[dict], root: Path) -> str:
+    lines = ["## Packages installed by Sparkdock", ""]
+    for package_type, items in _group_by(packages, "type").items():
+        lines.append(f"**{package_type.capitalize()}:**")
+        for group, members in _group_by(items, "group").items():
+            names = ", ".join(f"`{item['name']}`" for item in members)
+            label = group if group != "other" else "General"
+            lines.append(f"  - {label}: {names}")
+        lines.append("")
+    lines.append(f"Defined in ({root / PACKAGES_FILE}).")
+    return "\n".join(lines)
+
+
+def render_recipe_catalog(recipes: List[dict]) -> str:
+    lines = ["## Tasks available in sjust", ""]
+    for group, items in sorted(_group_by(recipes, "group").items()):
+        lines.append(f"**{group}:**")
+        for recipe in items:
+            doc = f" — {recipe['doc']}" if recipe["doc"] else ""
+            lines.append(f"  - `{_recipe_signature(recipe)}`{doc}")
+        lines.append("")
+    lines.append("Run `sjust --list` for the live list, including your custom tasks.")
+    return "\n".join(lines)
+
+
+def find_packages(question: str, packages: List[dict]) -> List[dict]:
+    words = set(_words(question))
+    return [
+        package
+        for package in packages
+        if package["name"].lower() in words
+        or package["name"].lower().rsplit("/", 1)[-1] in words
+    ]
+
+
+def find_recipes(question: str, recipes: List[dict]) -> List[dict]:
+    words = set(_words(question))
+    exact = [recipe for recipe in recipes if recipe["name"] in words]
+    if exact:
+        return exact
+    return [
+        recipe
+        for recipe in recipes
+        if recipe["group"] in words
+        or any(part in words for part in recipe["name"].split("-") if len(part) > 3)
+    ]
+
+
+def render_fact_sheet(recipes: List[dict], packages: List[dict]) -> str:
+    """Compact context block used instead of whole source files."""
+    lines = []
+    for recipe in recipes:
+        lines.append(
+            f"- Recipe `{_recipe_signature(recipe)}` (group: {recipe['group'] or '-'}; "
+            f"{recipe['file']}:{recipe['line']}): {recipe['doc'] or 'no description'}"
+        )
+    for package in packages:
+        note = f"; {package['note']}" if package["note"] else ""
+        lines.append(
+            f"- Package `{package['name']}` (type: {package['type']}; "
+            f"group: {package['group'] or '-'}; {PACKAGES_FILE}:{package['line']}{note})"
+        )
+    return (
+        "File: fact-sheet (parsed from sjust recipes and package list)\n"
+        + "\n".join(lines)
+    )
+
+
+def _asks_catalog(words: List[str], patterns: Tuple[re.Pattern, ...]) -> bool:
+    text = " ".join(words)
+    return any(pattern.search(text) for pattern in patterns)
+
+
+def match_facts(question: str, index: dict, root: Path) -> Optional[dict]:
+    """Classify a question against the index of the repository at `root`.
+
+    Returns {"answer": ...} for catalog questions answered directly,
+    {"fact_sheet": ...} when a few indexed facts cover the question, or None.
+    """
+    words = _words(question)
+    asks_packages = _has_any(words, PACKAGE_WORDS)
+    asks_recipes = _has_any(words, RECIPE_WORDS)
+    packages = find_packages(question, index["packages"]) if asks_packages else []
+    recipes = find_recipes(question, index["recipes"]) if asks_recipes else []
+
+    if (
+        _asks_catalog(words, PACKAGE_CATALOG_PATTERNS)
+        and not packages
+        and not asks_recipes
+    ):
+        return {
+            "answer": render_package_catalog(index["packages"], root),
+            "sources": [PACKAGES_FILE],
+        }
+    if (
+        _asks_catalog(words, RECIPE_CATALOG_PATTERNS)
+        and not recipes
+        and not asks_packages
+    ):
+        return {
+            "answer": render_recipe_catalog(index["recipes"]),
+            "sources": sorted({recipe["file"] for recipe in index["recipes"]}),
+        }
+    if packages or (recipes and len(recipes) <= MAX_FACT_SHEET_RECIPES):
+        sources = sorted({recipe["file"] for recipe in recipes})
+        if packages:
+            sources.append(PACKAGES_FILE)
+        return {"fact_sheet": render_fact_sheet(recipes, packages), "sources": sources}
+    return None
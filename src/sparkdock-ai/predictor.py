@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""Local question-to-file predictor trained from past file selections.
+
+Every model file selection is recorded with the question and whether the
+answer built on it was accepted (the answer stage completed). Accepted
+selections train a one-vs-rest multinomial naive Bayes model over hashed
+question tokens: each file keeps token counts from the questions it was
+selected for, so training is a count update and the model retrains
+incrementally. Predictions are compared with the model's selections; once
+confident predictions have agreed with them often enough, a confident
+prediction replaces the selection call, and a share of those is still
+checked so the reported agreement stays current.
+
+Usage:
+  predictor.py [--rebuild]
+"""
+
+import argparse
+import json
+import logging
+import math
+import random
+import re
+import sys
+import time
+import zlib
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+LOGGER = logging.getLogger("sparkdock_ai")
+
+PREDICTOR_VERSION = 1
+HASH_BUCKETS = 1 << 14
+SMOOTHING = 0.1
+MAX_EXAMPLES = 500
+EVALUATION_WINDOW = 50
+MIN_EXAMPLES = 20
+MIN_EVALUATIONS = 10
+MIN_AGREEMENT = 0.8
+SELECT_PROBABILITY = 0.5
+CONFIDENT_PROBABILITY = 0.9
+AUDIT_RATE = 0.1
+MAX_PREDICTED_FILES = 10
+TOKEN_PATTERN = re.compile(r"[a-z0-9][a-z0-9_.-]*")
+
+
+def question_features(question: str) -> Dict[str, int]:
+    """Hash the question's words and word pairs into bucket counts."""
+    words = TOKEN_PATTERN.findall(question.lower())
+    tokens = words + [f"{first} {second}" for first, second in zip(words, words[1:])]
+    counts: Dict[str, int] = {}
+    for token in tokens:
+        bucket = str(zlib.crc32(token.encode("utf-8")) % HASH_BUCKETS)
+        counts[bucket] = counts.get(bucket, 0) + 1
+    return counts
+
+
+def jaccard(first: List[str], second: List[str]) -> float:
+    union = set(first) | set(second)
+    if not union:
+        return 1.0
+    return len(set(first) & set(second)) / len(union)
+
+
+class FilePredictor:
+    """Persisted training examples, model counts, and agreement history."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            data = {}
+        if data.get("version") != PREDICTOR_VERSION:
+            data = {}
+        self.examples: List[dict] = data.get("examples", [])
+        self.evaluations: List[dict] = data.get("evaluations", [])
+        self.trained = 0
+        self.token_totals: Dict[str, int] = {}
+        self.files: Dict[str, dict] = {}
+        self._load_model(data.get("model", {}))
+
+    def _load_model(self, model: dict) -> None:
+        self.trained = model.get("trained", 0)
+        self.token_totals = model.get("token_totals", {})
+        self.files = model.get("files", {})
+
+    def train(self, features: Dict[str, int], files: List[str]) -> None:
+        self.trained += 1
+        for bucket, count in features.items():
+            self.token_totals[bucket] = self.token_totals.get(bucket, 0) + count
+        for path in files:
+            entry = self.files.setdefault(
+                path, {"examples": 0, "tokens": 0, "counts": {}}
+            )
+            entry["examples"] += 1
+            entry["tokens"] += sum(features.values())
+            for bucket, count in features.items():
+                entry["counts"][bucket] = entry["counts"].get(bucket, 0) + count
+
+    def rebuild(self) -> int:
+        """Retrain from scratch on the stored accepted examples."""
+        self._load_model({})
+        for example in self.examples:
+            if example["accepted"]:
+                self.train(example["features"], example["files"])
+        return self.trained
+
+    def record(self, question: str, files: List[str], accepted: bool) -> None:
+        """Store a model selection; accepted ones also train the predictor."""
+        features = question_features(question)
+        self.examples.append(
+            {
+                "features": features,
+                "files": files,
+                "accepted": accepted,
+                "recorded_at": int(time.time()),
+            }
+        )
+        del self.examples[:-MAX_EXAMPLES]
+        if accepted:
+            self.train(features, files)
+
+    def _probability(
+        self, entry: dict, features: Dict[str, int], total_tokens: int
+    ) -> float:
+        vocabulary = len(self.token_totals) + 1
+        positive_tokens = entry["tokens"]
+        negative_tokens = total_tokens - positive_tokens
+        positive = entry["examples"]
+        log_odds = math.log((positive + 1) / (self.trained - positive + 1))
+        for bucket, count in features.items():
+            if bucket not in self.token_totals:
+                # Unseen tokens carry no evidence; smoothing alone would
+                # favour every file with fewer training tokens.
+                continue
+            in_file = entry["counts"].get(bucket, 0)
+            elsewhere = self.token_totals[bucket] - in_file
+            log_odds += count * (
+                math.log(
+                    (in_file + SMOOTHING) / (positive_tokens + SMOOTHING * vocabulary)
+                )
+                - math.log(
+                    (elsewhere + SMOOTHING) / (negative_tokens + SMOOTHING * vocabulary)
+                )
+            )
+        log_odds = max(-50.0, min(50.0, log_odds))
+        return 1.0 / (1.0 + math.exp(-log_odds))
+
+    def predict(
+        self, question: str, candidates: List[str]
+    ) -> Optional[Tuple[List[str], float]]:
+        """Return (files, confidence), or None before enough training.
+
+        Confidence is the weakest decision over all known candidates: a file
+        scored near 0.5 makes the whole prediction uncertain, whether or not
+        it was predicted.
+        """
+        if self.trained < MIN_EXAMPLES:
+            return None
+        features = question_features(question)
+        total_tokens = sum(self.token_totals.values())
+        scored = sorted(
+            (
+                (self._probability(self.files[path], features, total_tokens), path)
+                for path in candidates
+                if path in self.files
+            ),
+            reverse=True,
+        )
+        files = [path for score, path in scored if score >= SELECT_PROBABILITY]
+        files = files[:MAX_PREDICTED_FILES]
+        if not files:
+            return [], 0.0
+        confidence = min(max(score, 1.0 - score) for score, _path in scored)
+        return files, confidence
+
+    def agreement(self, confident_only: bool = False) -> Tuple[Optional[float], int]:
+        """Mean Jaccard overlap with the model's selections, and the sample count."""
+        scores = [
+            item["jaccard"]
+            for item in self.evaluations
+            if item["confident"] or not confident_only
+        ]
+        if not scores:
+            return None, 0
+        return sum(scores) / len(scores), len(scores)
+
+    def can_replace(self, confidence: float) -> bool:
+        """Whether a prediction with this confidence may skip the selection call."""
+        if confidence < CONFIDENT_PROBABILITY:
+            return False
+        score, count = self.agreement(confident_only=True)
+        if count < MIN_EVALUATIONS or score < MIN_AGREEMENT:
+            return False
+        return random.random() >= AUDIT_RATE
+
+    def evaluate(
+        self, prediction: Tuple[List[str], float], selected: List[str]
+    ) -> None:
+        files, confidence = prediction
+        overlap = jaccard(files, selected)
+        self.evaluations.append(
+            {
+                "jaccard": round(overlap, 3),
+                "exact": set(files) == set(selected),
+                "confident": confidence >= CONFIDENT_PROBABILITY,
+            }
+        )
+        del self.evaluations[:-EVALUATION_WINDOW]
+        overall, count = self.agreement()
+        confident, confident_count = self.agreement(confident_only=True)
+        LOGGER.info(
+            "Predictor vs model selection: jaccard=%.2f confidence=%.2f; "
+            "recent agreement %.2f over %d (confident: %s over %d)",
+            overlap,
+            confidence,
+            overall,
+            count,
+            f"{confident:.2f}" if confident is not None else "n/a",
+            confident_count,
+        )
+
+    def report(self) -> str:
+        accepted = sum(1 for example in self.examples if example["accepted"])
+        overall, count = self.agreement()
+        confident, confident_count = self.agreement(confident_only=True)
+        exact = sum(1 for item in self.evaluations if item["exact"])
+        lines = [
+            f"Stored selections: {len(self.examples)} ({accepted} accepted)",
+            f"Training examples: {self.trained} across {len(self.files)} files",
+            (
+                f"Agreement with model selections: {overall:.2f} mean Jaccard, "
+                f"{exact}/{count} exact"
+                if overall is not None
+                else "Agreement with model selections: no comparisons yet"
+            ),
+            (
+                f"Confident predictions: {confident:.2f} mean Jaccard over "
+                f"{confident_count}"
+                if confident is not None
+                else "Confident predictions: none compared yet"
+            ),
+        ]
+        return "\n".join(lines)
+
+    def save(self) -> None:
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(".tmp")
+            tmp_path.write_text(
+                json.dumps(
+                    {
+                        "version": PREDICTOR_VERSION,
+                        "examples": self.examples,
+                        "evaluations": self.evaluations,
+                        "model": {
+                            "trained": self.trained,
+                            "token_totals": self.token_totals,
+                            "files": self.files,
+                        },
+                    }
+                ),
+                encoding="utf-8",
+            )
+            tmp_path.replace(self.path)
+        except OSError as err:
+            LOGGER.warning("Unable to store file predictor at %s: %s", self.path, err)
+
+
+def main() -> int:
+    from engine import PREDICTOR_PATH
+
+    parser = argparse.ArgumentParser(
+        description="Report on the Sparkdock AI file predictor"
+    )
+    parser.add_argument(
+        "--rebuild",
+        action="store_true",
+        help="Retrain the predictor from the stored selections",
+    )
+    args = parser.parse_args()
+
+    predictor = FilePredictor(PREDICTOR_PATH)
+    if args.rebuild:
+        predictor.rebuild()
+        predictor.save()
+    print(predictor.report())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""Precompute Sparkdock AI answers for the canonical menu questions.
+
+Answers are stored in `.sparkdock-ai/answers-bundle.json`, keyed by the
+commit they were generated from; the engine serves them only while that
+commit is checked out. Run it after a Sparkdock update; it exits early when
+the bundle already covers the installed commit.
+
+Usage:
+  prewarm.py [--root PATH] [--force]
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Optional
+
+from engine import (
+    BUNDLE_VERSION,
+    LLM_COMMAND,
+    LOGGER,
+    SparkdockAIError,
+    _normalize_question,
+    answer_questions,
+    bundle_path,
+    current_revision,
+    determine_root,
+    ensure_dependency,
+    load_common_questions,
+)
+
+PREWARM_DEADLINE_SECONDS = 300.0
+
+
+def bundle_is_current(path: Path, revision: str, questions: list) -> bool:
+    try:
+        bundle = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError):
+        return False
+    answers = bundle.get("answers", {})
+    return (
+        bundle.get("version") == BUNDLE_VERSION
+        and bundle.get("commit") == revision
+        and all(_normalize_question(question) in answers for question in questions)
+    )
+
+
+async def build_bundle(root: Path, force: bool = False) -> Optional[int]:
+    """Answer every common question and write the bundle.
+
+    Returns the number of answers stored, or None when the bundle was current.
+    """
+    revision = current_revision(root)
+    if revision is None:
+        raise SparkdockAIError(
+            "Prewarmed answers need a git checkout to pin the bundle to a commit."
+        )
+    questions = load_common_questions()
+    output_path = bundle_path(root)
+    if not force and bundle_is_current(output_path, revision, questions):
+        LOGGER.info("Prewarmed answer bundle is current (commit=%s)", revision[:12])
+        return None
+
+    answers = {}
+    results = await answer_questions(
+        questions, root, deadline_seconds=PREWARM_DEADLINE_SECONDS
+    )
+    for question, result in zip(questions, results):
+        if isinstance(result, SparkdockAIError):
+            LOGGER.warning("Skipping prewarmed answer for %r: %s", question, result)
+            continue
+        if result["degradations"]:
+            LOGGER.warning("Skipping degraded prewarmed answer for %r", question)
+            continue
+        answers[_normalize_question(question)] = {
+            "question": question,
+            "answer": result["answer"],
+            "selected_files": result["selected_files"],
+        }
+
+    bundle = {
+        "version": BUNDLE_VERSION,
+        "commit": revision,
+        "generated_at": int(time.time()),
+        "answers": answers,
+    }
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = output_path.with_suffix(".tmp")
+    tmp_path.write_text(json.dumps(bundle, indent=1), encoding="utf-8")
+    tmp_path.replace(output_path)
+    LOGGER.info(
+        "Prewarmed answer bundle written to %s (commit=%s, answers=%d/%d)",
+        output_path,
+        revision[:12],
+        len(answers),
+        len(questions),
+    )
+    return len(answers)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Precompute Sparkdock AI answers for the common questions"
+    )
+    parser.add_argument(
+        "--root",
+        default=None,
+        help="Root directory of the Sparkdock repository (defaults to auto-detect)",
+    )
+    parser.add_argument(
+        "--force", action="store_true", help="Regenerate even if the bundle is current"
+    )
+    args = parser.parse_args()
+
+    try:
+        root = determine_root(args.root)
+        ensure_dependency(LLM_COMMAND[0])
+        stored = asyncio.run(build_bundle(root, force=args.force))
+    except SparkdockAIError as err:
+        print(err, file=sys.stderr)
+        return 1
+
+    if stored is None:
+        print(
+            f"Prewarmed answers already match the installed commit ({bundle_path(root)})"
+        )
+    else:
+        print(f"Prewarmed answers: {stored} stored ({bundle_path(root)})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+"""Latency-aware model routing for the Sparkdock AI pipeline stages.
+
+Every model is assigned a quality tier and every stage requires a minimum
+tier (raised for long questions and large contexts). Among the models that
+qualify, the router picks the one with the lowest median latency observed for
+that stage, skipping models whose error rate is too high. Models without
+enough samples, or excluded for errors, are tried now and then so their
+numbers stay current. Each decision is logged with the numbers behind it.
+"""
+
+import logging
+import random
+from typing import Dict, List, Optional, Tuple
+
+LOGGER = logging.getLogger("sparkdock_ai")
+
+STAGE_TIERS = {"classify": 1, "select": 2, "direct": 2, "answer": 2}
+LARGE_CONTEXT_CHARS = 60000
+LONG_QUESTION_WORDS = 40
+MAX_ERROR_RATE = 0.2
+MIN_OUTCOMES = 5
+MIN_LATENCY_SAMPLES = 3
+EXPLORE_RATE = 0.2
+
+
+def parse_model_tiers(spec: str) -> Dict[str, int]:
+    """Parse `model=tier,model=tier` into a mapping, ignoring malformed items."""
+    tiers: Dict[str, int] = {}
+    for item in spec.split(","):
+        name, _, value = item.partition("=")
+        if name.strip() and value.strip().isdigit():
+            tiers[name.strip()] = int(value)
+    return tiers
+
+
+def required_tier(stage: str, context_chars: int = 0, question_words: int = 0) -> int:
+    tier = STAGE_TIERS.get(stage, 1)
+    if stage == "answer" and context_chars >= LARGE_CONTEXT_CHARS:
+        tier += 1
+    if stage == "direct" and question_words >= LONG_QUESTION_WORDS:
+        tier += 1
+    return tier
+
+
+def _describe(model: str, median: Optional[float], outcome: dict) -> str:
+    latency = f"p50 {median:.2f}s" if median is not None else "p50 n/a"
+    return (
+        f"{model} ({latency}, errors {int(outcome.get('errors', 0))}/"
+        f"{int(outcome.get('calls', 0))}, ~{int(outcome.get('output_chars', 0))} chars)"
+    )
+
+
+def choose_model(
+    stage: str,
+    default: str,
+    tier: int,
+    tiers: Dict[str, int],
+    stats,
+) -> Tuple[str, str]:
+    """Return (model, reason) for a stage given the latency stats."""
+    eligible: List[str] = [
+        model for model, level in sorted(tiers.items()) if level >= tier
+    ]
+    if not eligible:
+        return default, f"no configured model meets tier {tier}, using default"
+
+    measured: List[Tuple[float, str]] = []
+    unmeasured: List[str] = []
+    excluded: List[str] = []
+    notes: List[str] = []
+    for model in eligible:
+        key = f"{stage}:{model}"
+        outcome = stats.outcomes.get(key, {})
+        median = stats.median(key, MIN_LATENCY_SAMPLES)
+        notes.append(_describe(model, median, outcome))
+        calls = outcome.get("calls", 0)
+        if calls >= MIN_OUTCOMES and outcome.get("errors", 0) / calls > MAX_ERROR_RATE:
+            notes[-1] += " excluded: error rate"
+            excluded.append(model)
+            continue
+        if median is None:
+            unmeasured.append(model)
+        else:
+            measured.append((median, model))
+
+    summary = "; ".join(notes)
+    if excluded and random.random() < EXPLORE_RATE / 4:
+        model = random.choice(excluded)
+        return model, f"re-checking {model} after errors [{summary}]"
+    if unmeasured and (not measured or random.random() < EXPLORE_RATE):
+        model = default if default in unmeasured else unmeasured[0]
+        return model, f"measuring {model} (not enough samples) [{summary}]"
+    if not measured:
+        return default, f"all eligible models excluded, using default [{summary}]"
+    median, model = min(measured)
+    return model, f"fastest eligible model [{summary}]"
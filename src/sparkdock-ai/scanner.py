@@ -0,0 +1,260 @@
+"""Repository scanner for Sparkdock roots that are not git checkouts.
+
+Tarball installs and exported trees have no `.git`, so `git ls-files` cannot
+list candidates. The scanner walks the tree with `os.scandir` on a thread
+pool, prunes vendored and cache directories before descending into them,
+honors `.gitignore` files, stops once enough candidates are found, and caches
+the listing keyed by the mtimes of the directories it visited.
+"""
+
+import json
+import logging
+import os
+import re
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+LOGGER = logging.getLogger("sparkdock_ai")
+
+SCAN_VERSION = 1
+SCAN_WORKERS = 8
+PRUNED_DIRS = frozenset(
+    {
+        ".git",
+        ".hg",
+        ".svn",
+        ".venv",
+        "venv",
+        "node_modules",
+        "__pycache__",
+        ".cache",
+        ".mypy_cache",
+        ".pytest_cache",
+        ".tox",
+        ".build",
+        ".sparkdock-ai",
+    }
+)
+
+
+def _glob_to_regex(pattern: str) -> str:
+    """Translate a gitignore glob into a regex matching a relative path."""
+    parts = []
+    index = 0
+    while index < len(pattern):
+        char = pattern[index]
+        if pattern.startswith("**/", index):
+            parts.append("(?:.*/)?")
+            index += 3
+            continue
+        if pattern.startswith("/**", index) and index + 3 == len(pattern):
+            parts.append("/.*")
+            index += 3
+            continue
+        if pattern.startswith("**", index):
+            parts.append(".*")
+            index += 2
+            continue
+        if char == "*":
+            parts.append("[^/]*")
+        elif char == "?":
+            parts.append("[^/]")
+        elif char == "[":
+            end = pattern.find("]", index + 1)
+            if end == -1:
+                parts.append(re.escape(char))
+            else:
+                body = pattern[index + 1 : end].replace("\\", "\\\\")
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                parts.append(f"[{body}]")
+                index = end
+        elif char == "\\" and index + 1 < len(pattern):
+            index += 1
+            parts.append(re.escape(pattern[index]))
+        else:
+            parts.append(re.escape(char))
+        index += 1
+    return "".join(parts)
+
+
+class IgnoreRule:
+    """One line of a `.gitignore` file, scoped to the directory holding it."""
+
+    def __init__(self, base: str, line: str):
+        self.base = base
+        self.negate = line.startswith("!")
+        pattern = line[1:] if self.negate else line
+        self.dir_only = pattern.endswith("/")
+        pattern = pattern.rstrip("/")
+        self.anchored = "/" in pattern
+        self.regex = re.compile(_glob_to_regex(pattern.lstrip("/")) + r"\Z")
+
+    def matches(self, relative: str, is_dir: bool) -> bool:
+        if self.dir_only and not is_dir:
+            return False
+        if self.base:
+            if not relative.startswith(self.base + "/"):
+                return False
+            relative = relative[len(self.base) + 1 :]
+        if self.anchored:
+            return bool(self.regex.match(relative))
+        return bool(self.regex.match(relative.rsplit("/", 1)[-1]))
+
+
+def parse_ignore_file(path: str, base: str) -> List[IgnoreRule]:
+    rules = []
+    try:
+        with open(path, encoding="utf-8", errors="ignore") as handle:
+            for raw_line in handle:
+                line = raw_line.rstrip("\n").rstrip()
+                if line and not line.startswith("#"):
+                    rules.append(IgnoreRule(base, line))
+    except OSError:
+        pass
+    return rules
+
+
+def is_ignored(rules: Sequence[IgnoreRule], relative: str, is_dir: bool) -> bool:
+    """Apply rules in order; the last matching rule decides, as in git."""
+    ignored = False
+    for rule in rules:
+        if rule.negate == ignored and rule.matches(relative, is_dir):
+            ignored = not rule.negate
+    return ignored
+
+
+def _scan_directory(
+    root: str,
+    relative: str,
+    rules: Tuple[IgnoreRule, ...],
+    suffixes: Tuple[str, ...],
+) -> Tuple[Dict[str, int], List[str], List[Tuple[str, Tuple[IgnoreRule, ...]]]]:
+    """List one directory: matching files, and subdirectories still to visit.
+
+    Also returns the mtimes that key the cached listing: the directory itself
+    and its `.gitignore`, whose edits do not always touch the directory.
+    """
+    path = os.path.join(root, relative) if relative else root
+    ignore_file = os.path.join(path, ".gitignore")
+    files: List[str] = []
+    subdirs: List[Tuple[str, Tuple[IgnoreRule, ...]]] = []
+    mtimes: Dict[str, int] = {}
+    try:
+        mtimes[relative] = os.stat(path).st_mtime_ns
+        if os.path.isfile(ignore_file):
+            mtimes[os.path.join(relative, ".gitignore")] = os.stat(
+                ignore_file
+            ).st_mtime_ns
+            rules = rules + tuple(parse_ignore_file(ignore_file, relative))
+        with os.scandir(path) as entries:
+            for entry in entries:
+                child = f"{relative}/{entry.name}" if relative else entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name not in PRUNED_DIRS and not is_ignored(
+                        rules, child, True
+                    ):
+                        subdirs.append((child, rules))
+                elif entry.name.endswith(suffixes) and entry.is_file():
+                    if not is_ignored(rules, child, False):
+                        files.append(child)
+    except OSError as err:
+        LOGGER.debug("Skipping unreadable directory %s: %s", path, err)
+        return {relative: 0}, [], []
+    return mtimes, sorted(files), sorted(subdirs, key=lambda item: item[0])
+
+
+def scan_files(
+    root: Path, suffixes: Tuple[str, ...], limit: Optional[int] = None
+) -> Tuple[List[str], Dict[str, int]]:
+    """Walk `root` breadth-first in parallel and return (files, mtimes).
+
+    Scanning stops once `limit` files have been found; shallower files are
+    found first, so the top of the tree is always represented.
+    """
+    base = str(root)
+    found: List[str] = []
+    mtimes: Dict[str, int] = {}
+    with ThreadPoolExecutor(max_workers=SCAN_WORKERS) as pool:
+        pending = {pool.submit(_scan_directory, base, "", (), suffixes)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                visited, files, subdirs = future.result()
+                mtimes.update(visited)
+                found.extend(files)
+                for child, rules in subdirs:
+                    pending.add(
+                        pool.submit(_scan_directory, base, child, rules, suffixes)
+                    )
+            if limit is not None and len(found) >= limit:
+                for future in pending:
+                    future.cancel()
+                break
+    found.sort(key=lambda item: (item.count("/"), item))
+    return (found[:limit] if limit is not None else found), mtimes
+
+
+def _cache_is_fresh(root: Path, cached: dict) -> bool:
+    for relative, mtime in cached.get("dirs", {}).items():
+        try:
+            if os.stat(root / relative).st_mtime_ns != mtime:
+                return False
+        except OSError:
+            return False
+    return True
+
+
+def list_files(
+    root: Path,
+    suffixes: Tuple[str, ...],
+    cache_path: Path,
+    limit: Optional[int] = None,
+) -> List[str]:
+    """Return candidate files under a non-git root, reusing the cached listing.
+
+    The cache is valid while every visited directory and `.gitignore` keeps
+    its mtime; a directory mtime changes whenever an entry is added, removed,
+    or renamed in it.
+    """
+    try:
+        cached = json.loads(cache_path.read_text(encoding="utf-8"))
+        if (
+            cached.get("version") == SCAN_VERSION
+            and cached.get("suffixes") == list(suffixes)
+            and (
+                cached.get("limit") is None
+                or (limit is not None and limit <= cached["limit"])
+            )
+            and _cache_is_fresh(root, cached)
+        ):
+            LOGGER.debug("Reusing cached file listing (%s)", cache_path)
+            return cached["files"][:limit] if limit is not None else cached["files"]
+    except (OSError, json.JSONDecodeError, KeyError):
+        pass
+
+    try:
+        # Created before scanning so the new directory does not bump the
+        # parent mtime recorded in the listing.
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+    except OSError:
+        pass
+    files, mtimes = scan_files(root, suffixes, limit)
+    LOGGER.info("Scanned %d paths, found %d files", len(mtimes), len(files))
+    try:
+        cache_path.write_text(
+            json.dumps(
+                {
+                    "version": SCAN_VERSION,
+                    "suffixes": list(suffixes),
+                    "limit": limit,
+                    "dirs": mtimes,
+                    "files": files,
+                }
+            ),
+            encoding="utf-8",
+        )
+    except OSError as err:
+        LOGGER.warning("Unable to store file listing at %s: %s", cache_path, err)
+    return files
@@ -0,0 +1,144 @@
+"""Schema-constrained outputs for question routing and file selection.
+
+With `llm --schema` the backend returns JSON matching a schema: a boolean for
+routing and a bounded array of paths restricted to the candidate list for
+selection. Responses are parsed strictly with a single `json.loads`; anything
+that does not match is counted as a fallback so the rate can be watched.
+"""
+
+import json
+import logging
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+LOGGER = logging.getLogger("sparkdock_ai")
+
+MAX_SELECTED_FILES = 10
+SCHEMA_UNSUPPORTED_KEY = "schema_unsupported"
+SCHEMA_RETRY_SECONDS = 7 * 24 * 3600
+ROUTING_FORMAT = (
+    'Reply with a JSON object: {"needs_repo": true} for YES, '
+    '{"needs_repo": false} for NO.'
+)
+SELECTION_FORMAT = (
+    'Return a JSON object {"files": [...]} listing the relative file paths that '
+    "should be read to answer the question, most relevant first, at most "
+    f"{MAX_SELECTED_FILES}. If none are required, return an empty list."
+)
+
+
+def routing_schema() -> dict:
+    return {
+        "type": "object",
+        "properties": {"needs_repo": {"type": "boolean"}},
+        "required": ["needs_repo"],
+        "additionalProperties": False,
+    }
+
+
+def selection_schema(candidates: List[str]) -> dict:
+    return {
+        "type": "object",
+        "properties": {
+            "files": {
+                "type": "array",
+                "items": {"type": "string", "enum": list(candidates)},
+                "maxItems": MAX_SELECTED_FILES,
+            }
+        },
+        "required": ["files"],
+        "additionalProperties": False,
+    }
+
+
+def _load_object(text: str) -> Optional[dict]:
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def parse_routing(text: str) -> Optional[bool]:
+    """Return the routing decision, or None when the response breaks the schema."""
+    data = _load_object(text.strip())
+    if data is None or not isinstance(data.get("needs_repo"), bool):
+        return None
+    return data["needs_repo"]
+
+
+def parse_selection(text: str, candidates: List[str]) -> Optional[List[str]]:
+    """Return the selected paths, or None when the response breaks the schema.
+
+    Paths outside the candidate list are dropped rather than rejecting the
+    whole response, and duplicates keep their first position.
+    """
+    data = _load_object(text.strip())
+    if data is None or not isinstance(data.get("files"), list):
+        return None
+    candidate_set = set(candidates)
+    selected: List[str] = []
+    for item in data["files"]:
+        if isinstance(item, str) and item in candidate_set and item not in selected:
+            selected.append(item)
+        if len(selected) >= MAX_SELECTED_FILES:
+            break
+    dropped = len(data["files"]) - len(selected)
+    if dropped > 0:
+        LOGGER.warning("Structured selection dropped %d unknown paths", dropped)
+    return selected
+
+
+class FallbackCounter:
+    """Persisted per-stage counts of structured calls and parse fallbacks.
+
+    The same file remembers models that rejected `--schema`, so later runs
+    skip the failing structured attempt for a week before trying again.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+
+    def _load(self) -> Dict[str, dict]:
+        try:
+            counts = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            return {}
+        return counts if isinstance(counts, dict) else {}
+
+    def _save(self, counts: Dict[str, dict]) -> None:
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.path.write_text(json.dumps(counts), encoding="utf-8")
+        except OSError as err:
+            LOGGER.warning("Unable to store structured output stats: %s", err)
+
+    def schema_unsupported(self, model: str) -> bool:
+        marked_at = self._load().get(SCHEMA_UNSUPPORTED_KEY, {}).get(model)
+        return (
+            isinstance(marked_at, (int, float))
+            and time.time() - marked_at < SCHEMA_RETRY_SECONDS
+        )
+
+    def mark_schema_unsupported(self, stage: str, model: str) -> None:
+        counts = self._load()
+        counts.setdefault(SCHEMA_UNSUPPORTED_KEY, {})[model] = time.time()
+        self._save(counts)
+        self.record(stage, True, f"schemas unsupported by {model}")
+
+    def record(self, stage: str, fallback: bool, reason: str = "") -> None:
+        counts = self._load()
+        entry = counts.setdefault(stage, {"calls": 0, "fallbacks": 0})
+        entry["calls"] += 1
+        if fallback:
+            entry["fallbacks"] += 1
+            LOGGER.warning(
+                "Structured %s output fell back (%s); fallback rate %d/%d (%.1f%%)",
+                stage,
+                reason or "invalid response",
+                entry["fallbacks"],
+                entry["calls"],
+                100.0 * entry["fallbacks"] / entry["calls"],
+            )
+        self._save(counts)
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""Local stand-in for `llm prompt` used to exercise the engine offline.
+
+Point the engine at it with:
+  SPARKDOCK_AI_LLM_COMMAND="python3 src/sparkdock-ai/stub-llm.py"
+
+Environment variables:
+  SPARKDOCK_AI_STUB_LATENCY       Seconds per call, either a single value
+                                  ("0.2") or per model ("gpt-4.1-nano=0.5,default=0.1")
+  SPARKDOCK_AI_STUB_SLOW_RATE     Probability (0-1) that a call hits the slow tail
+  SPARKDOCK_AI_STUB_SLOW_LATENCY  Seconds for slow-tail calls (default: 5)
+  SPARKDOCK_AI_STUB_FAIL_RATE     Probability (0-1) that a call exits with an error,
+                                  either a single value or per model like the latency
+  SPARKDOCK_AI_STUB_RESPONSE      Fixed response text (default: derived from the prompt)
+"""
+
+import json
+import os
+import random
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+
+def parse_args(argv: List[str]) -> Tuple[str, str, str, bool, Optional[dict]]:
+    model = "default"
+    system_prompt = ""
+    prompt = ""
+    usage = False
+    schema = None
+    index = 0
+    while index < len(argv):
+        arg = argv[index]
+        if arg in ("-m", "--model"):
+            model = argv[index + 1]
+            index += 2
+        elif arg in ("-s", "--system"):
+            system_prompt = argv[index + 1]
+            index += 2
+        elif arg == "--schema":
+            schema = json.loads(argv[index + 1])
+            index += 2
+        elif arg in ("-o", "--option"):
+            index += 3
+        elif arg in ("-u", "--usage"):
+            usage = True
+            index += 1
+        elif arg.startswith("-") or arg == "prompt":
+            index += 1
+        else:
+            prompt = arg
+            index += 1
+    return model, system_prompt, prompt, usage, schema
+
+
+def parse_per_model(spec: str) -> Dict[str, float]:
+    if "=" not in spec:
+        return {"default": float(spec or 0)}
+    values = {}
+    for item in spec.split(","):
+        name, _, value = item.partition("=")
+        values[name.strip()] = float(value)
+    return values
+
+
+def build_schema_response(schema: dict) -> str:
+    properties = schema.get("properties", {})
+    if "needs_repo" in properties:
+        return json.dumps({"needs_repo": True})
+    allowed = properties.get("files", {}).get("items", {}).get("enum", [])
+    files = ["README.md"] if "README.md" in allowed else allowed[:1]
+    return json.dumps({"files": files})
+
+
+def build_response(system_prompt: str, prompt: str, schema: Optional[dict]) -> str:
+    if os.getenv("SPARKDOCK_AI_STUB_RESPONSE"):
+        return os.environ["SPARKDOCK_AI_STUB_RESPONSE"]
+    if schema is not None:
+        return build_schema_response(schema)
+    if "YES or NO" in system_prompt or "YES or NO" in prompt:
+        return "YES"
+    if "JSON array" in prompt:
+        return '["README.md"]'
+    return "## Stub answer\n\nThis answer was produced by the local stub backend."
+
+
+def main() -> int:
+    model, system_prompt, prompt, usage, schema = parse_args(sys.argv[1:])
+    latencies = parse_per_model(os.getenv("SPARKDOCK_AI_STUB_LATENCY", "0"))
+    delay = latencies.get(model, latencies.get("default", 0.0))
+    if random.random() < float(os.getenv("SPARKDOCK_AI_STUB_SLOW_RATE", "0")):
+        delay = float(os.getenv("SPARKDOCK_AI_STUB_SLOW_LATENCY", "5"))
+    time.sleep(delay)
+
+    fail_rates = parse_per_model(os.getenv("SPARKDOCK_AI_STUB_FAIL_RATE", "0"))
+    if random.random() < fail_rates.get(model, fail_rates.get("default", 0.0)):
+        print(f"Error: injected failure for model {model}", file=sys.stderr)
+        return 1
+
+    response = build_response(system_prompt, prompt, schema)
+    print(response)
+    if usage:
+        input_tokens = (len(system_prompt) + len(prompt)) // 4
+        print(
+            f"Token usage: {input_tokens:,} input, {len(response) // 4:,} output",
+            file=sys.stderr,
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())